@@ -0,0 +1,357 @@
+"""Benchmarks of words-tui on synthetic databases.
+
+Every measurement drives `WordsTui` headlessly with Textual's pilot, on databases with a
+post for each of the last N days:
+
+- startup: a fresh process importing words-tui, opening the database and showing the app
+- keystroke: CPU time of pressing a key until the screen is updated, through `update_word_count`
+  (the pilot also waits for the next frame, which would only measure the frame rate)
+- update_word_count: the app's handler of every change of the editor, on its own
+- sidebar: reloading the sidebar's first page and rendering every visible row
+- wpm_tick: one `update_wpm` tick while writing
+
+The editor is also measured on its own, on documents of different sizes:
+
+- insert: `TextEditor.insert_text` of a character in the middle of the document
+- paste: pasting text into an empty editor until the next key is handled
+
+Results are written as JSON. With `--check` they're compared to a baseline and the
+script fails if the fastest sample got slower than the threshold allows, or if the editor got
+more than `SCALING_LIMIT` times slower on its largest document than on its smallest:
+
+    python benchmarks/bench.py --output results.json --check benchmarks/baseline.json
+    python benchmarks/bench.py --update-baseline benchmarks/baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SIZES = (30, 1_000, 10_000)
+"""Number of days with a post in the synthetic databases."""
+
+SCREEN_SIZE = (120, 40)
+
+REGRESSION_THRESHOLD = 0.5
+"""How much slower (as a fraction of the baseline) the fastest sample may get before the check fails."""
+
+NOISE_FLOOR = 0.001
+"""Slowdowns of less than this many seconds are ignored, sub-millisecond timings are too noisy."""
+
+EDITOR_SIZES = {"insert": (30, 100, 50_000), "paste": (5_000_000,)}
+"""Sizes of the measurements of the editor on its own."""
+
+UNITS = {"insert": "lines", "paste": "chars"}
+"""What the sizes of the measurements count, posts unless given here."""
+
+SCALING_LIMIT = 5.0
+"""How many times slower the editor may be on its largest size than on its smallest."""
+
+TARGETS = {("paste", "5000000"): 1.0}
+"""Medians that may not be exceeded whatever the baseline, in seconds."""
+
+REPEAT = {
+    "startup": 5,
+    "keystroke": 200,
+    "update_word_count": 200,
+    "sidebar": 50,
+    "wpm_tick": 200,
+    "insert": 100,
+    "paste": 3,
+}
+"""Number of samples of each measurement."""
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pra", "stri", "on", "el", "an", "ber", "do"]
+
+
+def make_content(rng: random.Random, words: int) -> str:
+    """Paragraphs of made up words, about as long as a paragraph of prose."""
+    paragraphs = []
+    while words > 0:
+        length = min(words, rng.randint(30, 120))
+        paragraphs.append(
+            " ".join("".join(rng.choices(SYLLABLES, k=rng.randint(1, 4))) for _ in range(length)).capitalize() + "."
+        )
+        words -= length
+    return "\n\n".join(paragraphs)
+
+
+def make_database(path: Path, days: int, seed: int = 0) -> None:
+    """A post for each of the last `days` days (today included) with their stats."""
+    from words_tui.tui.db import Post, PostStats, database_proxy, init_db
+
+    rng = random.Random(seed)
+    init_db(str(path))
+    today = dt.datetime.combine(dt.date.today(), dt.time(9))
+    with database_proxy.atomic():
+        for day in range(days - 1, -1, -1):
+            words = max(0, int(rng.gauss(450, 200)))
+            content = make_content(rng, words)
+            post = Post.create(
+                content=content, created_date=today - dt.timedelta(days=day), word_count=len(content.split())
+            )
+            PostStats.create(post=post, words_written=words, time_writing=words * 1.5)
+    database_proxy.close()
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "median": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, round(len(samples) * 0.95))],
+        "min": samples[0],
+        "samples": len(samples),
+    }
+
+
+def measure_startup(db_path: Path) -> float:
+    result = subprocess.run(
+        [sys.executable, __file__, "--startup-of", str(db_path)], capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.split()[-1])
+
+
+def run_startup(db_path: str) -> None:
+    """Print how long it takes this process to show the app."""
+    start = time.perf_counter()
+    from words_tui.tui.app import WordsTui
+    from words_tui.tui.db import init_db
+
+    init_db(db_path)
+    app = WordsTui()
+
+    async def run():
+        async with app.run_test(size=SCREEN_SIZE) as pilot:
+            await pilot.pause()
+            elapsed = time.perf_counter() - start
+        print(elapsed)
+
+    asyncio.run(run())
+
+
+async def measure_app(db_path: Path) -> dict[str, list[float]]:
+    from words_tui.tui.app import WordsTui
+    from words_tui.tui.db import database_proxy, init_db
+    from words_tui.tui.sidebar import Sidebar
+    from words_tui.tui.text_editor import Selection
+
+    init_db(str(db_path))
+    app = WordsTui()
+    samples: dict[str, list[float]] = {name: [] for name in REPEAT if name != "startup" and name not in EDITOR_SIZES}
+    async with app.run_test(size=SCREEN_SIZE) as pilot:
+        await pilot.pause()
+        # Write at the end of today's post
+        last_row = len(app.editor.document_lines) - 1
+        app.editor.selection = Selection.cursor((last_row, len(app.editor.document_lines[last_row])))
+
+        keys = "the quick brown fox jumps over the lazy dog "
+        for index in range(REPEAT["keystroke"]):
+            key = keys[index % len(keys)]
+            start = time.process_time()
+            await pilot.press("space" if key == " " else key)
+            samples["keystroke"].append(time.process_time() - start)
+
+        for _ in range(REPEAT["update_word_count"]):
+            start = time.perf_counter()
+            app.update_word_count()
+            samples["update_word_count"].append(time.perf_counter() - start)
+
+        sidebar = app.query_one(Sidebar)
+        for _ in range(REPEAT["sidebar"]):
+            start = time.perf_counter()
+            sidebar._pages.clear()
+            sidebar.on_mount()
+            for y in range(sidebar.size.height):
+                sidebar.render_line(y)
+            samples["sidebar"].append(time.perf_counter() - start)
+
+        # Keep the counter writing, as if a key was just pressed
+        counter = app.words_per_minute
+        for _ in range(REPEAT["wpm_tick"]):
+            counter.last_char_written = counter.keystrokes.last_change = time.monotonic()
+            start = time.perf_counter()
+            app.update_wpm()
+            samples["wpm_tick"].append(time.perf_counter() - start)
+    database_proxy.close()
+    return samples
+
+
+def measure_insert(line_count: int) -> list[float]:
+    from words_tui.tui.text_editor import TextEditor
+
+    line = make_content(random.Random(0), 60).replace("\n", " ")
+    editor = TextEditor()
+    editor.load_text("\n".join([line] * line_count))
+    row = line_count // 2
+    samples = []
+    for column in range(REPEAT["insert"]):
+        start = time.perf_counter()
+        editor.insert_text("a", (row, column))
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def measure_paste(size: int) -> list[float]:
+    from textual import events
+    from textual.app import App
+
+    from words_tui.tui.text_editor import TextEditor
+
+    paragraph = make_content(random.Random(0), 60) + "\n"
+    text = paragraph * (size // len(paragraph))
+
+    class EditorApp(App):
+        def compose(self):
+            editor = TextEditor()
+            editor.load_text("")
+            yield editor
+
+    samples = []
+    for _ in range(REPEAT["paste"]):
+        app = EditorApp()
+        async with app.run_test(size=SCREEN_SIZE) as pilot:
+            editor = app.query_one(TextEditor)
+            await pilot.pause()
+            start = time.perf_counter()
+            editor.post_message(events.Paste(text))
+            await pilot.press("x")
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def measure_editor(name: str, size: int) -> list[float]:
+    if name == "insert":
+        return measure_insert(size)
+    if name == "paste":
+        return asyncio.run(measure_paste(size))
+    raise ValueError(name)
+
+
+def run_benchmarks(sizes: tuple[int, ...], directory: Path) -> dict:
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    for size in sizes:
+        db_path = directory / f"posts-{size}.db"
+        make_database(db_path, size)
+        print(f"Measuring {size} posts", file=sys.stderr)
+
+        samples = {"startup": [measure_startup(db_path) for _ in range(REPEAT["startup"])]}
+        samples.update(asyncio.run(measure_app(db_path)))
+        for name, values in samples.items():
+            results.setdefault(name, {})[str(size)] = summarize(values)
+    for name, editor_sizes in EDITOR_SIZES.items():
+        for size in editor_sizes:
+            print(f"Measuring {name} with {size} {UNITS[name]}", file=sys.stderr)
+            results.setdefault(name, {})[str(size)] = summarize(measure_editor(name, size))
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": dt.datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+
+
+def find_regressions(report: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD) -> list[str]:
+    """Measurements whose fastest sample is more than `threshold` (and `NOISE_FLOOR`) slower than in the baseline.
+
+    Medians of short measurements move by more than the threshold whenever the machine is busy
+    with something else, while the fastest samples only get slower when the code does.
+    """
+    regressions = []
+    for name, sizes in baseline["results"].items():
+        for size, expected in sizes.items():
+            actual = report["results"].get(name, {}).get(size)
+            if actual is None:
+                continue
+            slowdown = actual["min"] - expected["min"]
+            if slowdown > expected["min"] * threshold and slowdown > NOISE_FLOOR:
+                regressions.append(
+                    f"{name} with {size} {UNITS.get(name, 'posts')}: fastest {actual['min'] * 1000:.2f}ms,"
+                    f" baseline {expected['min'] * 1000:.2f}ms"
+                )
+    return regressions
+
+
+def find_scaling_problems(report: dict, limit: float = SCALING_LIMIT) -> list[str]:
+    """Editor measurements whose median on the largest size is more than `limit` times the one on the smallest."""
+    problems = []
+    for name, sizes in EDITOR_SIZES.items():
+        results = report["results"].get(name, {})
+        smallest, largest = results.get(str(min(sizes))), results.get(str(max(sizes)))
+        if smallest is None or largest is None:
+            continue
+        if largest["median"] > smallest["median"] * limit:
+            problems.append(
+                f"{name} with {max(sizes)} {UNITS[name]}: {largest['median'] * 1000:.2f}ms,"
+                f" {largest['median'] / smallest['median']:.1f} times as long as with {min(sizes)}"
+            )
+    return problems
+
+
+def find_missed_targets(report: dict) -> list[str]:
+    """Measurements whose median is over its target in `TARGETS`."""
+    missed = []
+    for (name, size), target in TARGETS.items():
+        actual = report["results"].get(name, {}).get(size)
+        if actual is not None and actual["median"] > target:
+            missed.append(
+                f"{name} with {size} {UNITS.get(name, 'posts')}: {actual['median'] * 1000:.2f}ms,"
+                f" target {target * 1000:.2f}ms"
+            )
+    return missed
+
+
+def format_report(report: dict) -> str:
+    lines = []
+    for name, sizes in report["results"].items():
+        for size, result in sizes.items():
+            median, p95 = result["median"] * 1000, result["p95"] * 1000
+            unit = UNITS.get(name, "posts")
+            lines.append(f"{name:>17} {size:>6} {unit:<5}: median {median:8.2f}ms  p95 {p95:8.2f}ms")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="number of posts in each database")
+    parser.add_argument("--output", type=Path, help="write the results as JSON to this file")
+    parser.add_argument("--check", type=Path, metavar="BASELINE", help="fail if slower than this baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="allowed slowdown (0.5 = 50%%)")
+    parser.add_argument("--update-baseline", type=Path, metavar="BASELINE", help="store the results as the baseline")
+    parser.add_argument("--startup-of", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.startup_of:
+        run_startup(args.startup_of)
+        return 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        report = run_benchmarks(tuple(args.sizes), Path(directory))
+    print(format_report(report), file=sys.stderr)
+
+    for path in (args.output, args.update_baseline):
+        if path is not None:
+            path.write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.check is not None:
+        regressions = find_regressions(report, json.loads(args.check.read_text()), args.threshold)
+        regressions += find_scaling_problems(report) + find_missed_targets(report)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
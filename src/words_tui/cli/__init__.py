@@ -1,18 +1,58 @@
 # SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
 #
 # SPDX-License-Identifier: MIT
+from __future__ import annotations
+
 from pathlib import Path
 
 import click
 
 from words_tui.__about__ import __version__
-from words_tui.tui.app import WordsTui
-from words_tui.tui.db import init_db
+from words_tui.cli.compact import compact_database
+from words_tui.cli.export import export
+from words_tui.cli.importer import import_journal
+from words_tui.cli.search import search
+from words_tui.tui.db_profiles import DB_PROFILES, DEFAULT_DB_PROFILE
 
 
 @click.group(context_settings={"help_option_names": ["-h", "--help"]}, invoke_without_command=True)
 @click.version_option(version=__version__, prog_name="words-tui")
 @click.option("--db", "-d", envvar="WORDS_TUI_DB", default=Path.home() / ".words-tui.db", help="Database file to use")
-def words_tui(db: str):
-    init_db(db)
+@click.option(
+    "--db-profile",
+    envvar="WORDS_TUI_DB_PROFILE",
+    type=click.Choice(list(DB_PROFILES)),
+    default=DEFAULT_DB_PROFILE,
+    show_default=True,
+    help="SQLite performance profile (journal mode, syncing, caches)",
+)
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Show how long each stage of handling a keystroke takes, and write the latencies to this JSON file on exit",
+)
+@click.pass_context
+def words_tui(ctx: click.Context, db: str, db_profile: str, profile: Path | None):
+    """Daily writing in your terminal. Opens today's post unless a command is given."""
+    ctx.obj = {"db": db, "db_profile": db_profile}
+    if ctx.invoked_subcommand is not None:
+        return
+
+    # Textual and peewee take a while to import, don't make `--help` and `--version` wait for them
+    from words_tui.tui.app import WordsTui
+    from words_tui.tui.db import init_db
+    from words_tui.tui.profiler import profiler
+
+    if profile is not None:
+        profiler.enable()
+    init_db(db, db_profile)
     WordsTui().run()
+    if profile is not None:
+        profiler.dump(profile)
+        click.echo(f"Wrote latencies to {profile}", err=True)
+
+
+words_tui.add_command(compact_database)
+words_tui.add_command(export)
+words_tui.add_command(import_journal)
+words_tui.add_command(search)
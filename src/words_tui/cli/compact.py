@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+from __future__ import annotations
+
+import datetime
+import statistics
+import time
+
+import click
+
+COLD_POST_DAYS = 30
+"""Posts older than this many days are compressed, unless told otherwise."""
+
+READ_SAMPLE = 100
+"""Number of posts that opening a post is timed on."""
+
+
+def format_size(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+def measure_reads(compressed: bool, sample: int = READ_SAMPLE) -> float | None:
+    """Median seconds it takes to load a post and read its content, of a random sample of posts.
+
+    None if there are no (un)compressed posts.
+    """
+    from peewee import fn
+
+    from words_tui.tui.db import Post
+
+    query = Post.select(Post.id).where(Post.compressed_content.is_null(not compressed))
+    if not compressed:
+        query = query.where(Post.content != "")
+    post_ids = [post.id for post in query.order_by(fn.random()).limit(sample)]
+    timings = []
+    for post_id in post_ids:
+        start = time.perf_counter()
+        Post.get_by_id(post_id).content  # noqa: B018
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) if timings else None
+
+
+@click.command("compact")
+@click.option(
+    "--older-than",
+    "days",
+    type=click.IntRange(min=0),
+    default=COLD_POST_DAYS,
+    show_default=True,
+    help="Compress posts older than this many days",
+)
+@click.option("--limit", "-n", type=click.IntRange(min=1), help="Compress at most this many posts [default: all]")
+@click.option("--no-vacuum", is_flag=True, help="Don't rebuild the database file to give the space back")
+@click.pass_obj
+def compact_database(obj: dict, days: int, limit: int | None, no_vacuum: bool):
+    """Compress the content of old posts to make the database smaller.
+
+    Compressed posts are decompressed whenever they're read, and writing one makes it
+    uncompressed again. Posts are only compressed once, so running this again (e.g. every
+    day or with --limit) only compresses the posts that got old since the last time.
+    """
+    from words_tui.tui.db import compress_posts, database_proxy, get_database_size, init_db
+
+    init_db(obj["db"], obj["db_profile"])
+
+    size_before = get_database_size()
+    older_than = datetime.datetime.combine(datetime.date.today() - datetime.timedelta(days=days), datetime.time())
+    result = compress_posts(older_than, limit)
+    if not no_vacuum:
+        database_proxy.execute_sql("VACUUM")
+    size_after = get_database_size()
+
+    if result.posts:
+        click.echo(
+            f"Compressed {result.posts} posts from {format_size(result.content_bytes)}"
+            f" to {format_size(result.compressed_bytes)}"
+        )
+    else:
+        click.echo(f"No posts older than {days} days left to compress")
+    click.echo(f"Database size: {format_size(size_before)} before, {format_size(size_after)} after")
+
+    compressed_read = measure_reads(compressed=True)
+    if compressed_read is not None:
+        message = f"Opening a compressed post takes {compressed_read * 1000:.2f}ms"
+        uncompressed_read = measure_reads(compressed=False)
+        if uncompressed_read is not None:
+            message += f", an uncompressed one {uncompressed_read * 1000:.2f}ms"
+        click.echo(message)
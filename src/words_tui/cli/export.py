@@ -0,0 +1,129 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+from __future__ import annotations
+
+import datetime
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, TextIO
+
+import click
+
+if TYPE_CHECKING:
+    from words_tui.tui.db import Post
+
+
+def post_to_json(post: Post) -> str:
+    return json.dumps(
+        {
+            "id": post.id,
+            "created_date": post.created_date.isoformat(),
+            "word_count": post.word_count,
+            "content": post.content,
+        },
+        ensure_ascii=False,
+    )
+
+
+def post_to_markdown(post: Post) -> str:
+    return f"# {post.created_date:%Y-%m-%d}\n\n{post.content}\n"
+
+
+def write_ndjson(posts: Iterable[Post], output: TextIO) -> int:
+    """Write one JSON object per line. Returns the number of posts written."""
+    count = 0
+    for post in posts:
+        output.write(post_to_json(post) + "\n")
+        count += 1
+    return count
+
+
+def write_markdown(posts: Iterable[Post], output: TextIO) -> int:
+    """Write all posts to a single Markdown document, with a heading for each day."""
+    count = 0
+    for post in posts:
+        if count:
+            output.write("\n")
+        output.write(post_to_markdown(post))
+        count += 1
+    return count
+
+
+def write_markdown_days(posts: Iterable[Post], directory: Path) -> int:
+    """Write a `YYYY-MM-DD.md` file for each day.
+
+    Posts come in date order, so only the file of the current day is open at a time.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    count = 0
+    day = None
+    output = None
+    try:
+        for post in posts:
+            post_day = post.created_date.date()
+            if post_day != day:
+                if output is not None:
+                    output.close()
+                day = post_day
+                output = (directory / f"{day:%Y-%m-%d}.md").open("w", encoding="utf-8")
+            else:
+                # More than one post on the same day
+                output.write("\n")
+            output.write(post_to_markdown(post))
+            count += 1
+    finally:
+        if output is not None:
+            output.close()
+    return count
+
+
+def export_posts(obj: dict, since: datetime.datetime | None, until: datetime.datetime | None, write: Callable) -> None:
+    # Imported here, so `--help` doesn't have to wait for peewee
+    from words_tui.tui.db import init_db, iter_posts
+
+    init_db(obj["db"], obj["db_profile"])
+    if until is not None:
+        # Include the whole last day
+        until += datetime.timedelta(days=1)
+    count = write(iter_posts(since, until))
+    click.echo(f"Exported {count} posts", err=True)
+
+
+def date_range_options(command: Callable) -> Callable:
+    date = click.DateTime(formats=["%Y-%m-%d"])
+    command = click.option("--until", type=date, help="Only export posts written on or before this day")(command)
+    command = click.option("--since", type=date, help="Only export posts written on or after this day")(command)
+    return command
+
+
+@click.group()
+def export():
+    """Export your writing, from the oldest post to the newest."""
+
+
+@export.command()
+@click.argument("output", type=click.File("w", encoding="utf-8"), default="-")
+@date_range_options
+@click.pass_obj
+def ndjson(obj: dict, output: TextIO, since: datetime.datetime | None, until: datetime.datetime | None):
+    """Export posts as newline delimited JSON to OUTPUT (stdout by default)."""
+    export_posts(obj, since, until, lambda posts: write_ndjson(posts, output))
+
+
+@export.command()
+@click.argument("output", type=click.File("w", encoding="utf-8"), default="-")
+@date_range_options
+@click.pass_obj
+def markdown(obj: dict, output: TextIO, since: datetime.datetime | None, until: datetime.datetime | None):
+    """Export posts as a single Markdown document to OUTPUT (stdout by default)."""
+    export_posts(obj, since, until, lambda posts: write_markdown(posts, output))
+
+
+@export.command("markdown-days")
+@click.argument("directory", type=click.Path(file_okay=False, path_type=Path))
+@date_range_options
+@click.pass_obj
+def markdown_days(obj: dict, directory: Path, since: datetime.datetime | None, until: datetime.datetime | None):
+    """Export a Markdown file for each day to DIRECTORY."""
+    export_posts(obj, since, until, lambda posts: write_markdown_days(posts, directory))
@@ -0,0 +1,190 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+from __future__ import annotations
+
+import datetime
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+import click
+
+JOURNAL_SUFFIXES = {".md", ".markdown", ".txt"}
+"""Files with these extensions are imported, everything else is ignored."""
+
+DATE_PATTERN = re.compile(r"(\d{4})[-_./]?(\d{2})[-_./]?(\d{2})")
+"""Dates in file paths, e.g. `2023-08-01.md`, `2023/08/01.txt` or `journal_20230801.md`."""
+
+PARALLEL_THRESHOLD = 200
+"""Fewer files than this are read in this process, starting worker processes would take longer."""
+
+INSERT_CHUNK_SIZE = 300
+"""Posts per `INSERT`, three columns each stays below SQLite's (older) limit of 999 variables."""
+
+
+class JournalEntry(NamedTuple):
+    path: str
+    day: datetime.date | None
+    """None if there's no date in the path of the file."""
+    content: str
+    word_count: int
+
+
+def find_journal_files(directory: Path) -> list[Path]:
+    return sorted(path for path in directory.rglob("*") if path.suffix.lower() in JOURNAL_SUFFIXES and path.is_file())
+
+
+def parse_day(relative_path: str) -> datetime.date | None:
+    for match in reversed(list(DATE_PATTERN.finditer(relative_path))):
+        try:
+            return datetime.date(*map(int, match.groups()))
+        except ValueError:
+            continue
+    return None
+
+
+def read_journal_file(path: Path, directory: Path) -> JournalEntry:
+    """Read a journal file. Runs in a worker process, so it only gets and returns picklable values."""
+    relative_path = path.relative_to(directory).as_posix()
+    day = parse_day(relative_path)
+    content = path.read_text(encoding="utf-8", errors="replace").strip()
+    if day is not None:
+        # Drop the date heading `words-tui export markdown-days` adds
+        first_line, _, rest = content.partition("\n")
+        if first_line.startswith("#") and first_line.lstrip("#").strip() == day.isoformat():
+            content = rest.strip()
+    return JournalEntry(relative_path, day, content, len(content.split()))
+
+
+def read_journal_files(paths: list[Path], directory: Path, jobs: int | None) -> Iterator[JournalEntry]:
+    directories = [directory] * len(paths)
+    if jobs == 1 or len(paths) < PARALLEL_THRESHOLD:
+        yield from map(read_journal_file, paths, directories)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(read_journal_file, paths, directories, chunksize=64)
+
+
+def merge_content(*contents: str) -> str:
+    return "\n\n".join(content for content in contents if content)
+
+
+class ImportResult(NamedTuple):
+    new_posts: list[dict]
+    """Rows to insert, one for each day that doesn't have a post yet."""
+    merged_posts: dict[int, str]
+    """New content of existing posts, by post id."""
+    skipped_days: list[datetime.date]
+    undated_files: list[str]
+
+
+def plan_import(entries: Iterable[JournalEntry], existing: str) -> ImportResult:
+    """Decide what to do with each day of the journal.
+
+    Several files on the same day are combined into one post. Days that already have
+    a post are either skipped or merged into it, depending on `existing`.
+    """
+    from words_tui.tui.db import Post
+
+    days: dict[datetime.date, list[JournalEntry]] = {}
+    undated_files = []
+    for entry in entries:
+        if entry.day is None:
+            undated_files.append(entry.path)
+        else:
+            days.setdefault(entry.day, []).append(entry)
+
+    existing_posts: dict[datetime.date, Post] = {}
+    if days:
+        query = Post.select(Post.id, Post.created_date).where(
+            Post.created_date >= datetime.datetime.combine(min(days), datetime.time()),
+            Post.created_date < datetime.datetime.combine(max(days) + datetime.timedelta(days=1), datetime.time()),
+        )
+        for post in query.order_by(Post.created_date):
+            existing_posts[post.created_date.date()] = post
+
+    result = ImportResult([], {}, [], undated_files)
+    for day, day_entries in sorted(days.items()):
+        content = merge_content(*(entry.content for entry in day_entries))
+        post = existing_posts.get(day)
+        if post is None:
+            result.new_posts.append(
+                {
+                    "content": content,
+                    "created_date": datetime.datetime.combine(day, datetime.time()),
+                    "word_count": sum(entry.word_count for entry in day_entries),
+                }
+            )
+        elif existing == "merge":
+            result.merged_posts[post.id] = content
+        else:
+            result.skipped_days.append(day)
+    return result
+
+
+def apply_import(result: ImportResult) -> None:
+    from peewee import chunked
+
+    from words_tui.tui.db import Post, database_proxy
+
+    for rows in chunked(result.new_posts, INSERT_CHUNK_SIZE):
+        with database_proxy.atomic():
+            Post.insert_many(rows).execute()
+
+    merged_posts = list(result.merged_posts.items())
+    for chunk in chunked(merged_posts, INSERT_CHUNK_SIZE):
+        with database_proxy.atomic():
+            for post in Post.select().where(Post.id.in_([post_id for post_id, _ in chunk])):
+                content = merge_content(post.content.strip(), result.merged_posts[post.id])
+                Post.update(content=content, word_count=len(content.split())).where(Post.id == post.id).execute()
+
+
+@click.command("import")
+@click.argument("directory", type=click.Path(exists=True, file_okay=False, path_type=Path))
+@click.option(
+    "--existing",
+    type=click.Choice(["skip", "merge"]),
+    default="skip",
+    show_default=True,
+    help="What to do with days that already have a post",
+)
+@click.option("--jobs", "-j", type=click.IntRange(min=1), help="Number of processes reading files [default: all CPUs]")
+@click.option("--dry-run", is_flag=True, help="Show what would be imported without changing the database")
+@click.pass_obj
+def import_journal(obj: dict, directory: Path, existing: str, jobs: int | None, dry_run: bool):
+    """Import a journal from DIRECTORY, a post for each dated Markdown or text file.
+
+    The date is taken from the path of a file, e.g. `2023-08-01.md` or `2023/08/01.txt`.
+    """
+    from words_tui.tui.db import init_db, init_read_only_db
+
+    if dry_run:
+        # Only look for days that already have a post
+        init_read_only_db(obj["db"])
+    else:
+        init_db(obj["db"], obj["db_profile"])
+
+    paths = find_journal_files(directory)
+    with click.progressbar(length=len(paths), label="Reading files", file=sys.stderr) as bar:
+
+        def entries() -> Iterator[JournalEntry]:
+            for entry in read_journal_files(paths, directory, jobs):
+                bar.update(1)
+                yield entry
+
+        result = plan_import(entries(), existing)
+
+    if not dry_run:
+        apply_import(result)
+
+    prefix = "Would import" if dry_run else "Imported"
+    click.echo(f"{prefix} {len(result.new_posts)} new posts from {len(paths)} files")
+    if result.merged_posts:
+        click.echo(f"{prefix} {len(result.merged_posts)} days into existing posts")
+    if result.skipped_days:
+        click.echo(f"Skipped {len(result.skipped_days)} days that already have a post (use --existing merge)")
+    for path in result.undated_files:
+        click.echo(f"Skipped {path}, there's no date in its path")
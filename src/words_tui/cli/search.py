@@ -0,0 +1,28 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+from __future__ import annotations
+
+import click
+
+BOLD = ("\x1b[1m", "\x1b[22m")
+"""Matched terms are bold, click strips the codes when the output isn't a terminal."""
+
+
+@click.command()
+@click.argument("words", nargs=-1, required=True)
+@click.option(
+    "--limit", "-n", type=click.IntRange(min=1), default=20, show_default=True, help="Maximum number of posts"
+)
+@click.pass_obj
+def search(obj: dict, words: tuple[str, ...], limit: int):
+    """Search your posts for WORDS, best matches first."""
+    from words_tui.tui.db import init_db, search_posts
+
+    init_db(obj["db"], obj["db_profile"])
+    posts = search_posts(" ".join(words), limit=limit, highlight=BOLD)
+    for post in posts:
+        snippet = post.snippet.replace("\n", " ")
+        click.echo(f"{post.created_date:%Y-%m-%d}  {snippet}")
+    if not posts:
+        click.echo("No posts found", err=True)
@@ -1,42 +1,27 @@
+from __future__ import annotations
+
+import asyncio
 import datetime as dt
+import signal
 import time
 
-from textual import on
+from textual import log, on
 from textual.app import App, ComposeResult
+from textual.binding import Binding
 from textual.containers import Vertical
 from textual.css.query import NoMatches
 from textual.screen import ModalScreen
 from textual.validation import Number
 from textual.widgets import Footer, Input, Label, Static
 
-from words_tui.tui.db import Post, PostStats, get_posts, get_settings
+from words_tui.tui.autosave import AutoSaver
+from words_tui.tui.db import Post, PostStats, get_post_for_day, get_settings, worker_connection
+from words_tui.tui.profiler import ProfileOverlay, profiler, timed
+from words_tui.tui.search import SearchScreen
+from words_tui.tui.sidebar import Sidebar
+from words_tui.tui.stats_screen import StatsScreen
 from words_tui.tui.text_editor import TextEditor
-
-
-def get_post_icon(post: Post, words_per_day: str) -> str:
-    if len(post.content.split()) >= int(words_per_day):
-        return "✅"
-    elif post.created_date.date() == dt.date.today():
-        return "📝"
-    return "❌"
-
-
-def get_post_summary(post: Post, words_per_day: str) -> str:
-    return " ".join(
-        map(
-            str,
-            [
-                get_post_icon(post, words_per_day),
-                post.created_date.strftime("%Y-%m-%d"),
-                f"{len(post.content.split()):5}/{words_per_day}",
-            ],
-        )
-    )
-
-
-def get_sidebar_text(words_per_day: str) -> str:
-    posts = get_posts()
-    return "[bold] # Date      Words/Goal[/bold]\n" + "\n".join(get_post_summary(post, words_per_day) for post in posts)
+from words_tui.tui.wpm import KeystrokeRing
 
 
 class SettingsScreen(ModalScreen):
@@ -80,39 +65,45 @@ class SettingsScreen(ModalScreen):
         words_per_day.save()
 
 
+STATS_FLUSH_INTERVAL = 10.0
+"""Seconds between writes of a post's stats while writing. They're also written on pauses and on exit."""
+
+
 class WordsPerMinuteCounter:
     def __init__(self, post: Post, words_per_day: int):
         self.paused = True
         self.words_per_day = words_per_day
         self.last_char_written = 0
+        self.last_flush = 0.0
 
         self.post = post
         self.stats = post.stats.first()
         if not self.post.stats:
             self.stats = PostStats(post=self.post)
 
-        self.total_words = self._get_num_words()
+        self.total_words = self.post.word_count
 
         self.words_written = self.stats.words_written
         self.words_deleted = self.stats.words_deleted
         self.pauses = self.stats.pauses
         self.time_writing = self.stats.time_writing
 
-    def _get_num_words(self):
-        return len(self.post.content.split())
+        self.keystrokes = KeystrokeRing()
+        """Recent changes, for rolling words per minute."""
+        self.checkpoint: dict | None = None
+        """Stats at the current minute of writing time. Inserted as a `MinuteStats` row
+        once writing moves on to the next minute or pauses, instead of on every update."""
 
-    def type_character(self):
+    def type_character(self, words: int):
+        current_time = time.monotonic()
         if self.paused:
-            self.last_char_written = time.monotonic()
             self.paused = False
         else:
-            current_time = time.monotonic()
             self.time_writing += current_time - self.last_char_written
-            self.last_char_written = current_time
+        self.last_char_written = current_time
 
-        words = self._get_num_words()
         diff = words - self.total_words
-        self.total_words += diff
+        self.keystrokes.add(current_time, diff)
         if diff > 0:
             self.words_written += diff
         if diff < 0:
@@ -122,19 +113,36 @@ class WordsPerMinuteCounter:
     def update_words(self):
         if self.paused:
             return
-        since_last_char = time.monotonic() - self.last_char_written
-        if since_last_char > 2:
+        current_time = time.monotonic()
+        if self.keystrokes.is_paused(current_time):
             self.paused = True
             self.pauses += 1
+            self.flush()
             return
 
-        checkpoint_index = str(int(self.time_writing) // 60)
-
-        self.stats.per_minute[checkpoint_index] = {
+        minute = int(self.time_writing) // 60
+        if self.checkpoint is not None and self.checkpoint["minute"] != minute:
+            self.save_checkpoint()
+        self.checkpoint = {
+            "minute": minute,
             "words_written": self.words_written,
             "words_deleted": self.words_deleted,
             "pauses": self.pauses,
         }
+
+        if current_time - self.last_flush >= STATS_FLUSH_INTERVAL:
+            self.save_stats()
+
+    def flush(self) -> None:
+        """Write everything that hasn't been written yet."""
+        if self.last_char_written == 0:
+            # Nothing was written since the app started
+            return
+        self.save_stats()
+        self.save_checkpoint()
+
+    @timed("stats_save")
+    def save_stats(self) -> None:
         self.stats.words_written = self.words_written
         self.stats.words_deleted = self.words_deleted
         self.stats.pauses = self.pauses
@@ -146,6 +154,12 @@ class WordsPerMinuteCounter:
             self.stats.writing_time_until_goal = self.time_writing
 
         self.stats.save()
+        self.last_flush = time.monotonic()
+
+    def save_checkpoint(self) -> None:
+        if self.checkpoint is not None:
+            self.stats.add_checkpoint(**self.checkpoint)
+            self.checkpoint = None
 
     def get_wpm(self) -> str:
         if self.last_char_written == 0:
@@ -155,13 +169,25 @@ class WordsPerMinuteCounter:
         if self.time_writing < 10:
             return "~"
 
-        return f"{self.words_written / self.time_writing * 60:.2f}"
+        current_time = time.monotonic()
+        rolling = " ".join(
+            f"{window // 60}m {rate:.0f}"
+            for window, rate in zip(self.keystrokes.windows, self.keystrokes.rates(current_time))
+        )
+        burst = " 🔥" if self.keystrokes.is_burst(current_time) else ""
+        return f"{self.words_written / self.time_writing * 60:.2f} ({rolling}){burst}"
 
 
 class WordsTui(App):
     """A Textual app for writing."""
 
-    BINDINGS = [("ctrl+c", "quit", "Quit"), ("ctrl+s", "open_settings", "Settings")]
+    BINDINGS = [
+        ("ctrl+c", "quit", "Quit"),
+        ("ctrl+s", "open_settings", "Settings"),
+        # The editor has focus, without priority its own bindings would run first
+        Binding("ctrl+f", "open_search", "Search", priority=True),
+        ("ctrl+t", "open_stats", "Stats"),
+    ]
     SCREENS = {"settings": SettingsScreen()}
 
     CSS_PATH = "app.css"
@@ -169,30 +195,46 @@ class WordsTui(App):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         # TODO: Find a better place for this
-        self.posts = get_posts()
         self.words_per_day = get_settings()
 
-        if not self.posts:
-            # When we first initialize the app there are no posts in the database, so create the first one:
-            self.posts.insert(0, Post.create(content="", created_date=dt.datetime.now()))
-        else:
-            latest_post = self.posts[0]
-            missing_days = (dt.date.today() - latest_post.created_date.date()).days
-            start_date = latest_post.created_date.replace(hour=0, minute=0, second=0, microsecond=0)
-
-            for day in range(missing_days):
-                self.posts.insert(0, Post.create(content="", created_date=start_date + dt.timedelta(days=day + 1)))
-
-        current_post = [post for post in self.posts if post.created_date.date() == dt.date.today()]
-        self.current_post: Post = current_post[0]
+        current_post = get_post_for_day(dt.date.today())
+        if current_post is None:
+            # Days without any writing are filled in by the sidebar, so don't store today's post
+            # until the first character is written:
+            current_post = Post(content="", created_date=dt.datetime.now())
+        self.current_post: Post = current_post
 
+        self.autosave = AutoSaver(self.current_post)
         self.words_per_minute = WordsPerMinuteCounter(self.current_post, words_per_day=self.words_per_day)
         self.editor = TextEditor(id="editor")
         self.editor.show_line_numbers = False
+        self.editor.soft_wrap = True
         self.editor.load_text(self.current_post.content)
 
     def on_mount(self) -> None:
+        # Only format debug messages when they can be seen
+        profiler.tracing = bool({"devtools", "debug"} & self.features)
         self.set_interval(1, self.update_wpm)
+        self.set_interval(0.25, self.check_autosave)
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.exit)
+        except (NotImplementedError, RuntimeError):
+            # Signal handlers are not supported on Windows event loops
+            pass
+
+    def check_autosave(self) -> None:
+        if self.autosave.is_due():
+            self.run_worker(self._autosave_in_thread, group="autosave", thread=True)
+
+    def _autosave_in_thread(self) -> None:
+        with worker_connection():
+            self.autosave.flush()
+
+    def exit(self, *args, **kwargs) -> None:
+        self.autosave.flush()
+        self.words_per_minute.flush()
+        log(f"autosave: {self.autosave.attempted} attempted, {self.autosave.coalesced} coalesced")
+        super().exit(*args, **kwargs)
 
     def update_wpm(self) -> None:
         self.words_per_minute.update_words()
@@ -205,35 +247,62 @@ class WordsTui(App):
     def on_text_editor_changed(self, _: TextEditor.Changed) -> None:
         self.update_word_count()
 
+    @timed("word_count")
     def update_word_count(self) -> None:
-        sidebar = self.query_one("#sidebar")
+        sidebar = self.query_one(Sidebar)
         text_editor = self.query_one(TextEditor)
 
-        text = "\n".join(text_editor.document_lines)
-        self.current_post.content = text
-        self.current_post.save()
+        self.current_post.word_count = text_editor.word_count
+        if self.current_post.id is None:
+            # First change of the day, create the post:
+            self.current_post.content = text_editor.text
+            self.current_post.save()
+        else:
+            self.autosave.mark_dirty(text_editor.snapshot(), text_editor.word_count)
 
-        self.words_per_minute.type_character()
-        sidebar.update(get_sidebar_text(self.words_per_day.value))
+        self.words_per_minute.type_character(text_editor.word_count)
+        sidebar.update_current_post()
 
     def action_open_settings(self) -> None:
         def after_quit(words_per_day) -> None:
             self.editor.focus()
             self.words_per_day = words_per_day
             self.words_per_minute.words_per_day = words_per_day
-            self.update_word_count()
+            self.query_one(Sidebar).update_words_per_day(words_per_day.value)
 
+        self.autosave.flush()
         self.push_screen(SettingsScreen(), after_quit)
 
+    def action_open_search(self) -> None:
+        # The binding has priority, so it also fires over the search itself and the other dialogs
+        if isinstance(self.screen, ModalScreen):
+            return
+
+        def after_search(day: dt.date | None) -> None:
+            self.editor.focus()
+            if day is not None:
+                self.query_one(Sidebar).scroll_to_day(day)
+
+        # Search the content of the current post as it is on screen
+        self.autosave.flush()
+        self.push_screen(SearchScreen(), after_search)
+
+    def action_open_stats(self) -> None:
+        # Include the latest changes of the current post
+        self.autosave.flush()
+        self.push_screen(StatsScreen(int(self.words_per_day.value)), lambda _: self.editor.focus())
+
     def compose(self) -> ComposeResult:
         """Create child widgets for the app."""
 
-        yield Static(get_sidebar_text(self.words_per_day.value), id="sidebar")
+        yield Sidebar(self.current_post, self.words_per_day.value, id="sidebar")
         yield Static(
             f"WPM: Not started",
             id="wpm",
         )
         yield self.editor
+        if profiler.enabled:
+            yield ProfileOverlay(id="profile")
         yield Footer()
 
 
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from words_tui.tui.db import Post
+from words_tui.tui.document import DocumentSnapshot
+from words_tui.tui.profiler import timed
+
+AUTOSAVE_IDLE = 1.0
+"""Seconds without any edits after which pending changes are written."""
+
+AUTOSAVE_WINDOW = 5.0
+"""Maximum number of seconds a change can stay unsaved while the user keeps typing."""
+
+
+class AutoSaver:
+    """Write-behind saving of a post's content.
+
+    Edits only mark the post as dirty. The content is written once the user
+    stops typing for `idle` seconds or once `window` seconds have passed since
+    the first unsaved change, whichever comes first. `flush` can be called from
+    a worker thread; writes are serialized so an older snapshot can never
+    overwrite a newer one. Document snapshots are only turned into text when
+    they're written, so that work happens on the worker thread too.
+    """
+
+    def __init__(self, post: Post, idle: float = AUTOSAVE_IDLE, window: float = AUTOSAVE_WINDOW):
+        self.post = post
+        self.idle = idle
+        self.window = window
+
+        self.attempted = 0
+        """Number of times a save was requested (one per edit)."""
+        self.written = 0
+        """Number of times the content was actually written to the database."""
+
+        self._pending: tuple[str | DocumentSnapshot, int] | None = None
+        self._first_change = 0.0
+        self._last_change = 0.0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    @property
+    def coalesced(self) -> int:
+        """Number of requested saves that were folded into another write."""
+        return self.attempted - self.written
+
+    @property
+    def dirty(self) -> bool:
+        return self._pending is not None
+
+    def mark_dirty(self, content: str | DocumentSnapshot, word_count: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._pending is None:
+                self._first_change = now
+            self._pending = (content, word_count)
+            self._last_change = now
+            self.attempted += 1
+
+    def is_due(self) -> bool:
+        with self._lock:
+            if self._pending is None:
+                return False
+            now = time.monotonic()
+            return now - self._last_change >= self.idle or now - self._first_change >= self.window
+
+    def flush(self) -> bool:
+        """Write the pending content, if any. Returns True if a write happened."""
+        with self._write_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = None
+            if pending is None:
+                return False
+            self._write(*pending)
+            with self._lock:
+                self.written += 1
+            return True
+
+    @timed("save")
+    def _write(self, content: str | DocumentSnapshot, word_count: int) -> None:
+        if isinstance(content, DocumentSnapshot):
+            content = content.text
+        Post.update(content=content, word_count=word_count).where(Post.id == self.post.id).execute()
+        self.post.content = content
@@ -1,17 +1,30 @@
+from __future__ import annotations
+
 import datetime
 import json
+import re
 import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, NamedTuple, cast
 
 from peewee import (
+    BlobField,
     DatabaseProxy,
+    DateField,
     DateTimeField,
     DoubleField,
+    FieldAccessor,
     ForeignKeyField,
     IntegerField,
     Model,
     SqliteDatabase,
     TextField,
 )
+from playhouse.migrate import SqliteMigrator, migrate
+
+from words_tui.tui.db_profiles import DB_PROFILES, DEFAULT_DB_PROFILE
 
 database_proxy = DatabaseProxy()
 
@@ -21,18 +34,66 @@ class BaseModel(Model):
         database = database_proxy
 
 
-class JSONField(TextField):
-    def db_value(self, value):
-        return json.dumps(value)
+@contextmanager
+def worker_connection() -> Iterator[None]:
+    """Close the connection of a worker thread once it's done with the database.
+
+    Each thread gets its own connection, so workers would leak theirs otherwise.
+    """
+    try:
+        yield
+    finally:
+        database_proxy.close()
+
+
+COMPRESSION_LEVEL = 9
+"""zlib level of cold posts, they're compressed once and rarely read so it's worth compressing them well."""
+
+
+def compress_content(content: str) -> bytes:
+    return zlib.compress(content.encode("utf-8"), COMPRESSION_LEVEL)
+
 
-    def python_value(self, value):
-        if value is not None:
-            return json.loads(value)
+def decompress_content(compressed_content: bytes) -> str:
+    return zlib.decompress(compressed_content).decode("utf-8")
+
+
+class PostContentAccessor(FieldAccessor):
+    """Reads the text of a post whether or not it's compressed, decompressing it on every access.
+
+    Content that was set since the post was loaded wins over the compressed copy."""
+
+    def __get__(self, instance, instance_type=None):
+        if instance is None:
+            return self.field
+        compressed_content = instance.__data__.get("compressed_content")
+        if compressed_content is not None and self.name not in instance._dirty:
+            return decompress_content(compressed_content)
+        return instance.__data__.get(self.name)
+
+
+class PostContentField(TextField):
+    accessor_class = PostContentAccessor
 
 
 class Post(BaseModel):
-    content = TextField()
-    created_date = DateTimeField(default=datetime.datetime.now)
+    content = PostContentField()
+    """Empty in the database once the post is compressed, but always the text of the post on a `Post`."""
+    created_date = DateTimeField(default=datetime.datetime.now, index=True)
+    word_count = IntegerField(default=0)
+    """Denormalized `len(content.split())` so listing posts doesn't need their content."""
+    compressed_content = BlobField(null=True)
+    """The zlib compressed content of cold posts, see `compress_posts`."""
+
+    def save(self, *args, **kwargs):
+        if "content" in self._dirty:
+            # New content replaces the compressed copy, updates that don't go through `save` are
+            # handled by a trigger (see `SEARCH_TRIGGERS`)
+            self.compressed_content = None
+        elif self.compressed_content is not None and self._pk is not None:
+            # The stored content of a compressed post is empty, writing it back would look like new content
+            kwargs.setdefault("only", self.dirty_fields)
+        return super().save(*args, **kwargs)
 
 
 class PostStats(BaseModel):
@@ -45,36 +106,614 @@ class PostStats(BaseModel):
 
     writing_time_until_goal = DoubleField(null=True)
 
-    per_minute = JSONField(
-        default=lambda: {
-            "0": {
-                "words_written": 0,
-                "words_deleted": 0,
-                "pauses": 0,
+    _per_minute: dict[str, dict[str, int]] | None = None
+
+    @property
+    def per_minute(self) -> dict[str, dict[str, int]]:
+        """Checkpoints by minute of writing time, in the shape they used to be stored in.
+
+        Loaded from `MinuteStats` on first access (see `load_per_minute` to load many at once)
+        and kept up to date by `add_checkpoint`. Later checkpoints of the same minute win.
+        """
+        if self._per_minute is None:
+            load_per_minute([self])
+        return cast("dict[str, dict[str, int]]", self._per_minute)
+
+    def add_checkpoint(self, minute: int, words_written: int, words_deleted: int, pauses: int) -> None:
+        """Insert a `MinuteStats` row of this post's stats at a minute of writing time."""
+        MinuteStats.insert(
+            post=self.post_id, minute=minute, words_written=words_written, words_deleted=words_deleted, pauses=pauses
+        ).execute()
+        if self._per_minute is not None:
+            self._per_minute[str(minute)] = {
+                "words_written": words_written,
+                "words_deleted": words_deleted,
+                "pauses": pauses,
             }
-        }
-    )
+
+
+class MinuteStats(BaseModel):
+    """A checkpoint of a post's cumulative stats at a minute of writing time.
+
+    Rows are only ever inserted, so writing a checkpoint doesn't rewrite earlier ones.
+    """
+
+    post = ForeignKeyField(Post, backref="minutes", index=False)
+    minute = IntegerField()
+    words_written = IntegerField(default=0)
+    words_deleted = IntegerField(default=0)
+    pauses = IntegerField(default=0)
+
+    class Meta:
+        # Also covers looking up the checkpoints of a post
+        indexes = ((("post", "minute"), False),)
+
+
+class DailyStats(BaseModel):
+    """Totals of every day with a post, so statistics don't have to go through every post.
+
+    Kept up to date by triggers on `post` and `poststats` (see `add_daily_stats`).
+    """
+
+    day = DateField(unique=True)
+    post_count = IntegerField(default=0)
+    word_count = IntegerField(default=0)
+    words_written = IntegerField(default=0)
+    words_deleted = IntegerField(default=0)
+    pauses = IntegerField(default=0)
+    time_writing = DoubleField(default=0)
 
 
 class Settings(BaseModel):
-    key = TextField()
+    key = TextField(unique=True)
     value = TextField()
 
 
-def get_posts() -> list[Post]:
-    return list(Post.select().order_by(Post.created_date.desc()))
+def load_per_minute(stats: list[PostStats]) -> None:
+    """Load `PostStats.per_minute` of many stats with a single query."""
+    stats_of_post: dict[int, list[PostStats]] = {}
+    for post_stats in stats:
+        post_stats._per_minute = {"0": {"words_written": 0, "words_deleted": 0, "pauses": 0}}
+        stats_of_post.setdefault(post_stats.post_id, []).append(post_stats)
+    query = (
+        MinuteStats.select()
+        .where(MinuteStats.post.in_(list(stats_of_post)))
+        .order_by(MinuteStats.post, MinuteStats.minute, MinuteStats.id)
+    )
+    for checkpoint in query:
+        for post_stats in stats_of_post[checkpoint.post_id]:
+            post_stats.per_minute[str(checkpoint.minute)] = {
+                "words_written": checkpoint.words_written,
+                "words_deleted": checkpoint.words_deleted,
+                "pauses": checkpoint.pauses,
+            }
+
+
+def get_post_summaries(
+    since: datetime.datetime | None = None,
+    until: datetime.datetime | None = None,
+    limit: int | None = None,
+) -> list[Post]:
+    """Posts from newest to oldest, without loading the content of every post.
+
+    `since` is inclusive and `until` is exclusive, so consecutive date ranges
+    can be used to page through posts.
+    """
+    query = Post.select(Post.id, Post.created_date, Post.word_count).order_by(Post.created_date.desc(), Post.id.desc())
+    if since is not None:
+        query = query.where(Post.created_date >= since)
+    if until is not None:
+        query = query.where(Post.created_date < until)
+    if limit is not None:
+        query = query.limit(limit)
+    return list(query)
+
+
+def iter_posts(since: datetime.datetime | None = None, until: datetime.datetime | None = None) -> Iterator[Post]:
+    """Iterate over posts from oldest to newest, without keeping them all in memory.
+
+    `since` is inclusive and `until` is exclusive, like in `get_post_summaries`.
+    """
+    query = Post.select().order_by(Post.created_date, Post.id)
+    if since is not None:
+        query = query.where(Post.created_date >= since)
+    if until is not None:
+        query = query.where(Post.created_date < until)
+    return query.iterator()
+
+
+def get_post_for_day(day: datetime.date) -> Post | None:
+    start = datetime.datetime.combine(day, datetime.time())
+    return (
+        Post.select()
+        .where(Post.created_date >= start, Post.created_date < start + datetime.timedelta(days=1))
+        .order_by(Post.created_date.desc())
+        .first()
+    )
+
+
+def get_first_post_date() -> datetime.date | None:
+    first_post = Post.select(Post.created_date).order_by(Post.created_date).first()
+    return first_post.created_date.date() if first_post else None
+
+
+SEARCH_HIGHLIGHT = ("\x02", "\x03")
+"""Default markers around matched terms in search snippets, unlikely to appear in a post."""
+
+
+def to_search_query(text: str) -> str:
+    """Turn what was typed into an FTS5 query matching posts that contain every word.
+
+    Words are quoted so characters with a meaning in FTS5 queries (`-`, `"`, `*`, ...) are
+    searched for as they are. The last word is a prefix, since it may not be typed out yet.
+    """
+    terms = ['"{}"'.format(term.replace('"', '""')) for term in text.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_posts(
+    text: str, limit: int = 50, highlight: tuple[str, str] = SEARCH_HIGHLIGHT, snippet_words: int = 12
+) -> list[Post]:
+    """Posts containing every word of `text`, best matches first.
+
+    Results don't load the content of posts, but have a `snippet` of it with matched
+    terms wrapped in the `highlight` markers.
+    """
+    query = to_search_query(text)
+    if not query:
+        return []
+    index_pending_posts()
+    posts = list(
+        Post.raw(
+            "SELECT post.id, post.created_date, post.word_count, post.compressed_content AS compressed_text,"
+            " snippet(post_search, 0, ?, ?, '…', ?) AS snippet"
+            " FROM post_search JOIN post ON post.id = post_search.rowid"
+            " WHERE post_search MATCH ? ORDER BY rank LIMIT ?",
+            *highlight,
+            snippet_words,
+            query,
+            limit,
+        )
+    )
+    for post in posts:
+        # The index reads the content of posts for snippets, which is empty for compressed posts
+        compressed_text = post.__dict__.pop("compressed_text")
+        if compressed_text is not None:
+            post.snippet = make_snippet(decompress_content(compressed_text), text, highlight, snippet_words)
+    return posts
+
+
+SEARCH_TOKEN = re.compile(r"\w+")
+"""Roughly what the FTS5 tokenizer considers a word."""
+
+
+def make_snippet(content: str, text: str, highlight: tuple[str, str], snippet_words: int) -> str:
+    """Like the FTS5 `snippet` of `content` for a search of `text`, for posts the index can't read."""
+    terms = [term.casefold() for term in SEARCH_TOKEN.findall(text)]
+    prefix = terms[-1] if terms else None
+    tokens = list(SEARCH_TOKEN.finditer(content))
+    matches = [
+        token.group().casefold() in terms or (prefix is not None and token.group().casefold().startswith(prefix))
+        for token in tokens
+    ]
+    # The window with the most matches, the first one of them if there's a tie
+    start = max(
+        range(max(len(tokens) - snippet_words, 0) + 1),
+        key=lambda first: (sum(matches[first : first + snippet_words]), -first),
+    )
+    end = min(start + snippet_words, len(tokens))
+    if start == end:
+        return ""
+
+    parts = ["…"] if start > 0 else [content[: tokens[0].start()]]
+    position = tokens[start].start()
+    for token, matched in zip(tokens[start:end], matches[start:end]):
+        parts.append(content[position : token.start()])
+        parts.append(f"{highlight[0]}{token.group()}{highlight[1]}" if matched else token.group())
+        position = token.end()
+    parts.append("…" if end < len(tokens) else content[position:])
+    return "".join(parts)
+
+
+def index_pending_posts() -> None:
+    """Reindex posts the search triggers couldn't, because they were compressed (see `index_compressed_posts`)."""
+    if not database_proxy.execute_sql("SELECT 1 FROM post_search_pending LIMIT 1").fetchone():
+        return
+    with database_proxy.atomic():
+        pending = list(
+            database_proxy.execute_sql(
+                "SELECT pending.post_id, pending.compressed_content, post.content, post.compressed_content"
+                " FROM post_search_pending AS pending LEFT JOIN post ON post.id = pending.post_id"
+            )
+        )
+        for post_id, indexed_content, content, compressed_content in pending:
+            if indexed_content is not None:
+                database_proxy.execute_sql(
+                    "INSERT INTO post_search (post_search, rowid, content) VALUES ('delete', ?, ?)",
+                    (post_id, decompress_content(indexed_content)),
+                )
+            # The post was deleted if there's no content:
+            if content is not None:
+                text = content if compressed_content is None else decompress_content(compressed_content)
+                database_proxy.execute_sql("INSERT INTO post_search (rowid, content) VALUES (?, ?)", (post_id, text))
+            database_proxy.execute_sql("DELETE FROM post_search_pending WHERE post_id = ?", (post_id,))
+
+
+class CompressionResult(NamedTuple):
+    posts: int
+    content_bytes: int
+    """The size of the compressed posts before they were compressed."""
+    compressed_bytes: int
+
+
+def compress_posts(older_than: datetime.datetime, limit: int | None = None, chunk_size: int = 100) -> CompressionResult:
+    """Compress the content of posts created before `older_than` that aren't compressed yet.
+
+    Posts that don't get any smaller are left alone. Each chunk of posts is compressed in its
+    own transaction, so compressing a large database can be interrupted and picked up again,
+    and running it regularly only compresses the posts that got old since the last time.
+    """
+    posts = content_bytes = compressed_bytes = 0
+    last_id = 0
+    while limit is None or posts < limit:
+        query = (
+            Post.select(Post.id, Post.content)
+            .where(
+                Post.id > last_id,
+                Post.created_date < older_than,
+                Post.compressed_content.is_null(),
+                Post.content != "",
+            )
+            .order_by(Post.id)
+            .limit(chunk_size)
+        )
+        rows = list(query.tuples())
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        with database_proxy.atomic():
+            for post_id, content in rows:
+                if limit is not None and posts >= limit:
+                    break
+                encoded_size = len(content.encode("utf-8"))
+                compressed_content = compress_content(content)
+                if len(compressed_content) >= encoded_size:
+                    continue
+                Post.update(content="", compressed_content=compressed_content).where(Post.id == post_id).execute()
+                posts += 1
+                content_bytes += encoded_size
+                compressed_bytes += len(compressed_content)
+    return CompressionResult(posts, content_bytes, compressed_bytes)
+
+
+def get_database_size() -> int:
+    """Bytes used by the database, not counting free pages that `VACUUM` would give back."""
+    db = database_proxy.obj
+    return (db.pragma("page_count") - db.pragma("freelist_count")) * db.pragma("page_size")
 
 
 def get_settings() -> Settings:
     return Settings.get(Settings.key == "words_per_day")
 
 
-def init_db(db_path: str):
-    db = SqliteDatabase(db_path)
+MODELS = [Post, PostStats, MinuteStats, DailyStats, Settings]
+
+
+def init_db(db_path: str, profile: str = DEFAULT_DB_PROFILE):
+    db = SqliteDatabase(db_path, pragmas=DB_PROFILES[profile])
     database_proxy.initialize(db)
 
     db.connect()
-    db.create_tables([Post, PostStats, Settings])
+    migrate_db(db)
+    index_pending_posts()
 
     # Initialize settings:
     Settings.get_or_create(key="words_per_day", defaults={"value": "300"})
+
+
+def init_read_only_db(db_path: str):
+    """Open a database as it is, without creating, migrating or writing to it (e.g. for a dry run).
+
+    A database that doesn't exist yet is opened as an empty one in memory.
+    """
+    if not Path(db_path).exists():
+        init_db(":memory:")
+        return
+    # Not `mode=ro`: the connections of a process share the WAL index, which would stay read-only for all of them
+    db = SqliteDatabase(db_path, pragmas={"query_only": 1})
+    database_proxy.initialize(db)
+    db.connect()
+
+
+def migrate_db(db: SqliteDatabase):
+    """Bring the database schema up to date.
+
+    The schema version is stored in SQLite's `user_version` pragma. Migrations
+    must not depend on the current model definitions (they will keep changing)
+    and must be safe to run on a database that already has the change, since
+    new databases are created from the models and then run every migration.
+    """
+    if not db.table_exists(Post._meta.table_name):
+        db.create_tables(MODELS)
+
+    version = db.pragma("user_version")
+    for next_version, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with db.atomic():
+            migration(db)
+            db.pragma("user_version", next_version)
+
+    # Create tables of models that were added without a migration:
+    db.create_tables(MODELS)
+
+
+def add_word_count_column(db: SqliteDatabase):
+    """Add and backfill `Post.word_count` for databases created before the column existed."""
+    if "word_count" in {column.name for column in db.get_columns("post")}:
+        return
+
+    migrate(SqliteMigrator(db).add_column("post", "word_count", IntegerField(default=0)))
+    word_counts = [
+        (len(content.split()), post_id) for post_id, content in db.execute_sql("SELECT id, content FROM post")
+    ]
+    db.cursor().executemany("UPDATE post SET word_count = ? WHERE id = ?", word_counts)
+
+
+def add_indexes(db: SqliteDatabase):
+    """Index the columns we filter and sort by."""
+    db.execute_sql("CREATE INDEX IF NOT EXISTS post_created_date ON post (created_date)")
+    db.execute_sql("CREATE INDEX IF NOT EXISTS poststats_post_id ON poststats (post_id)")
+    # Settings used to be created with `get_or_create`, so make sure keys are unique before enforcing it:
+    db.execute_sql("DELETE FROM settings WHERE id NOT IN (SELECT MIN(id) FROM settings GROUP BY key)")
+    db.execute_sql("CREATE UNIQUE INDEX IF NOT EXISTS settings_key ON settings (key)")
+
+
+def add_post_search(db: SqliteDatabase):
+    """Index the content of posts for full-text search.
+
+    `post_search` is an external content FTS5 table, so it doesn't store another copy of
+    every post. Triggers keep it in sync however posts are written (the editor, autosave,
+    imports), and `rebuild` backfills it from existing posts.
+    """
+    db.execute_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS post_search USING fts5(content, content='post', content_rowid='id')"
+    )
+    db.execute_sql(
+        "CREATE TRIGGER IF NOT EXISTS post_search_insert AFTER INSERT ON post BEGIN"
+        " INSERT INTO post_search (rowid, content) VALUES (new.id, new.content);"
+        " END"
+    )
+    db.execute_sql(
+        "CREATE TRIGGER IF NOT EXISTS post_search_delete AFTER DELETE ON post BEGIN"
+        " INSERT INTO post_search (post_search, rowid, content) VALUES ('delete', old.id, old.content);"
+        " END"
+    )
+    # Only when the content changes, updating `word_count` alone doesn't need reindexing:
+    db.execute_sql(
+        "CREATE TRIGGER IF NOT EXISTS post_search_update AFTER UPDATE OF content ON post BEGIN"
+        " INSERT INTO post_search (post_search, rowid, content) VALUES ('delete', old.id, old.content);"
+        " INSERT INTO post_search (rowid, content) VALUES (new.id, new.content);"
+        " END"
+    )
+    db.execute_sql("INSERT INTO post_search (post_search) VALUES ('rebuild')")
+
+
+DAILY_STATS_TRIGGERS = {
+    "post_daily_insert": """
+        AFTER INSERT ON post BEGIN
+            INSERT INTO dailystats
+                (day, post_count, word_count, words_written, words_deleted, pauses, time_writing)
+                VALUES (substr(new.created_date, 1, 10), 1, new.word_count, 0, 0, 0, 0)
+            ON CONFLICT (day) DO UPDATE SET
+                post_count = post_count + 1, word_count = word_count + excluded.word_count;
+        END
+    """,
+    "post_daily_update": """
+        AFTER UPDATE OF word_count, created_date ON post BEGIN
+            UPDATE dailystats SET post_count = post_count - 1, word_count = word_count - old.word_count
+                WHERE day = substr(old.created_date, 1, 10);
+            INSERT INTO dailystats
+                (day, post_count, word_count, words_written, words_deleted, pauses, time_writing)
+                VALUES (substr(new.created_date, 1, 10), 1, new.word_count, 0, 0, 0, 0)
+            ON CONFLICT (day) DO UPDATE SET
+                post_count = post_count + 1, word_count = word_count + excluded.word_count;
+        END
+    """,
+    "post_daily_delete": """
+        AFTER DELETE ON post BEGIN
+            UPDATE dailystats SET post_count = post_count - 1, word_count = word_count - old.word_count
+                WHERE day = substr(old.created_date, 1, 10);
+            DELETE FROM dailystats WHERE day = substr(old.created_date, 1, 10) AND post_count <= 0;
+        END
+    """,
+    "poststats_daily_insert": """
+        AFTER INSERT ON poststats BEGIN
+            UPDATE dailystats SET
+                words_written = words_written + new.words_written,
+                words_deleted = words_deleted + new.words_deleted,
+                pauses = pauses + new.pauses,
+                time_writing = time_writing + new.time_writing
+            WHERE day = (SELECT substr(created_date, 1, 10) FROM post WHERE id = new.post_id);
+        END
+    """,
+    "poststats_daily_update": """
+        AFTER UPDATE ON poststats BEGIN
+            UPDATE dailystats SET
+                words_written = words_written - old.words_written,
+                words_deleted = words_deleted - old.words_deleted,
+                pauses = pauses - old.pauses,
+                time_writing = time_writing - old.time_writing
+            WHERE day = (SELECT substr(created_date, 1, 10) FROM post WHERE id = old.post_id);
+            UPDATE dailystats SET
+                words_written = words_written + new.words_written,
+                words_deleted = words_deleted + new.words_deleted,
+                pauses = pauses + new.pauses,
+                time_writing = time_writing + new.time_writing
+            WHERE day = (SELECT substr(created_date, 1, 10) FROM post WHERE id = new.post_id);
+        END
+    """,
+    "poststats_daily_delete": """
+        AFTER DELETE ON poststats BEGIN
+            UPDATE dailystats SET
+                words_written = words_written - old.words_written,
+                words_deleted = words_deleted - old.words_deleted,
+                pauses = pauses - old.pauses,
+                time_writing = time_writing - old.time_writing
+            WHERE day = (SELECT substr(created_date, 1, 10) FROM post WHERE id = old.post_id);
+        END
+    """,
+}
+"""Triggers that apply every change of a post or its stats to the totals of its day.
+
+Days are the first 10 characters of `created_date`, which peewee stores as `YYYY-MM-DD HH:MM:SS`.
+"""
+
+
+def add_daily_stats(db: SqliteDatabase):
+    """Add the `dailystats` table, its triggers, and backfill it from existing posts."""
+    db.execute_sql(
+        "CREATE TABLE IF NOT EXISTS dailystats (id INTEGER NOT NULL PRIMARY KEY, day DATE NOT NULL,"
+        " post_count INTEGER NOT NULL, word_count INTEGER NOT NULL, words_written INTEGER NOT NULL,"
+        " words_deleted INTEGER NOT NULL, pauses INTEGER NOT NULL, time_writing REAL NOT NULL)"
+    )
+    db.execute_sql("CREATE UNIQUE INDEX IF NOT EXISTS dailystats_day ON dailystats (day)")
+    for name, trigger in DAILY_STATS_TRIGGERS.items():
+        db.execute_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {trigger}")
+
+    db.execute_sql("DELETE FROM dailystats")
+    db.execute_sql(
+        "INSERT INTO dailystats (day, post_count, word_count, words_written, words_deleted, pauses, time_writing)"
+        " SELECT substr(post.created_date, 1, 10), COUNT(*), SUM(post.word_count),"
+        " COALESCE(SUM(stats.words_written), 0), COALESCE(SUM(stats.words_deleted), 0),"
+        " COALESCE(SUM(stats.pauses), 0), COALESCE(SUM(stats.time_writing), 0)"
+        " FROM post LEFT JOIN ("
+        "  SELECT post_id, SUM(words_written) AS words_written, SUM(words_deleted) AS words_deleted,"
+        "  SUM(pauses) AS pauses, SUM(time_writing) AS time_writing FROM poststats GROUP BY post_id"
+        " ) AS stats ON stats.post_id = post.id"
+        " GROUP BY 1"
+    )
+
+
+def add_minute_stats(db: SqliteDatabase):
+    """Move the `poststats.per_minute` JSON into rows of `minutestats`."""
+    db.execute_sql(
+        "CREATE TABLE IF NOT EXISTS minutestats (id INTEGER NOT NULL PRIMARY KEY,"
+        " post_id INTEGER NOT NULL REFERENCES post (id), minute INTEGER NOT NULL,"
+        " words_written INTEGER NOT NULL, words_deleted INTEGER NOT NULL, pauses INTEGER NOT NULL)"
+    )
+    db.execute_sql("CREATE INDEX IF NOT EXISTS minutestats_post_id_minute ON minutestats (post_id, minute)")
+    if "per_minute" not in {column.name for column in db.get_columns("poststats")}:
+        return
+
+    checkpoints = []
+    for post_id, per_minute in db.execute_sql("SELECT post_id, per_minute FROM poststats ORDER BY id"):
+        for minute, checkpoint in sorted(json.loads(per_minute).items(), key=lambda item: int(item[0])):
+            if not any(checkpoint.values()):
+                # The default every post started with
+                continue
+            checkpoints.append(
+                (post_id, int(minute), checkpoint["words_written"], checkpoint["words_deleted"], checkpoint["pauses"])
+            )
+    db.cursor().executemany(
+        "INSERT INTO minutestats (post_id, minute, words_written, words_deleted, pauses) VALUES (?, ?, ?, ?, ?)",
+        checkpoints,
+    )
+    migrate(SqliteMigrator(db).drop_column("poststats", "per_minute"))
+    # SQLite before 3.35 can't drop columns, so the table may have been recreated without its triggers:
+    for name, trigger in DAILY_STATS_TRIGGERS.items():
+        if name.startswith("poststats_"):
+            db.execute_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {trigger}")
+
+
+def add_compressed_content(db: SqliteDatabase):
+    """Add `Post.compressed_content`, see `compress_posts` and `index_compressed_posts`."""
+    if "compressed_content" not in {column.name for column in db.get_columns("post")}:
+        migrate(SqliteMigrator(db).add_column("post", "compressed_content", BlobField(null=True)))
+
+
+NOT_PENDING = "NOT EXISTS (SELECT 1 FROM post_search_pending WHERE post_id = {0}.id)"
+
+SEARCH_TRIGGERS = {
+    "post_search_insert": f"""
+        AFTER INSERT ON post WHEN {NOT_PENDING.format("new")} BEGIN
+            INSERT INTO post_search (rowid, content)
+                SELECT new.id, new.content WHERE new.compressed_content IS NULL;
+            INSERT INTO post_search_pending (post_id) SELECT new.id WHERE new.compressed_content IS NOT NULL;
+        END
+    """,
+    "post_search_delete": f"""
+        AFTER DELETE ON post WHEN {NOT_PENDING.format("old")} BEGIN
+            INSERT INTO post_search (post_search, rowid, content)
+                SELECT 'delete', old.id, old.content WHERE old.compressed_content IS NULL;
+            INSERT INTO post_search_pending (post_id, compressed_content)
+                SELECT old.id, old.compressed_content WHERE old.compressed_content IS NOT NULL;
+        END
+    """,
+    # Compressing a post doesn't change its text, so only updates of uncompressed posts and
+    # uncompressing a post change what's indexed:
+    "post_search_update": f"""
+        AFTER UPDATE OF content, compressed_content ON post
+        WHEN new.compressed_content IS NULL AND {NOT_PENDING.format("old")} BEGIN
+            INSERT INTO post_search (post_search, rowid, content)
+                SELECT 'delete', old.id, old.content WHERE old.compressed_content IS NULL;
+            INSERT INTO post_search (rowid, content) SELECT new.id, new.content WHERE old.compressed_content IS NULL;
+            INSERT INTO post_search_pending (post_id, compressed_content)
+                SELECT old.id, old.compressed_content WHERE old.compressed_content IS NOT NULL;
+        END
+    """,
+    # Writing the content of a compressed post without going through `Post.save` (autosave,
+    # imports, other SQLite clients) makes it uncompressed again:
+    "post_decompress": """
+        AFTER UPDATE OF content ON post
+        WHEN old.compressed_content IS NOT NULL AND new.compressed_content IS old.compressed_content BEGIN
+            UPDATE post SET compressed_content = NULL WHERE id = new.id;
+        END
+    """,
+}
+
+
+def index_compressed_posts(db: SqliteDatabase):
+    """Index the text of compressed posts for full-text search with plain SQL triggers.
+
+    Any SQLite client must be able to write posts, so the schema can't use SQL functions the
+    app registers, like one that decompresses posts. `post_search` indexes the content of `post`
+    and compressed posts are indexed with their text from Python. Triggers can't read the text
+    a compressed post was indexed with, so when one is uncompressed or deleted they queue it in
+    `post_search_pending` and leave it alone until `index_pending_posts` reindexes it.
+    """
+    db.execute_sql("DROP VIEW IF EXISTS post_text")
+    for name in SEARCH_TRIGGERS:
+        db.execute_sql(f"DROP TRIGGER IF EXISTS {name}")
+    db.execute_sql("DROP TABLE IF EXISTS post_search")
+    db.execute_sql("CREATE VIRTUAL TABLE post_search USING fts5(content, content='post', content_rowid='id')")
+    # `compressed_content` is what the post was indexed with, NULL if it wasn't indexed:
+    db.execute_sql(
+        "CREATE TABLE IF NOT EXISTS post_search_pending (post_id INTEGER NOT NULL PRIMARY KEY, compressed_content BLOB)"
+    )
+    db.execute_sql("DELETE FROM post_search_pending")
+    for name, trigger in SEARCH_TRIGGERS.items():
+        db.execute_sql(f"CREATE TRIGGER {name} {trigger}")
+
+    db.execute_sql(
+        "INSERT INTO post_search (rowid, content) SELECT id, content FROM post WHERE compressed_content IS NULL"
+    )
+    compressed_posts = [
+        (post_id, decompress_content(compressed_content))
+        for post_id, compressed_content in db.execute_sql(
+            "SELECT id, compressed_content FROM post WHERE compressed_content IS NOT NULL"
+        )
+    ]
+    db.cursor().executemany("INSERT INTO post_search (rowid, content) VALUES (?, ?)", compressed_posts)
+
+
+MIGRATIONS = [
+    add_word_count_column,
+    add_indexes,
+    add_post_search,
+    add_daily_stats,
+    add_minute_stats,
+    add_compressed_content,
+    index_compressed_posts,
+]
+"""Schema migrations, in order. The position in the list (plus one) is the schema version they migrate to."""
@@ -0,0 +1,29 @@
+"""SQLite settings to pick from with `--db-profile`.
+
+Kept apart from the models, so the CLI can list them without importing peewee.
+"""
+
+from __future__ import annotations
+
+DB_PROFILES: dict[str, dict[str, object]] = {
+    # SQLite's own defaults (rollback journal, full sync on every commit)
+    "compat": {},
+    # Write-ahead log, only sync on checkpoints. Survives app crashes, might lose
+    # the last few commits on power loss.
+    "balanced": {
+        "journal_mode": "wal",
+        "synchronous": "normal",
+        "cache_size": -8 * 1024,  # 8MiB
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "memory",
+    },
+    # Never sync. Only for throwaway databases (benchmarks, imports you can redo).
+    "fast": {
+        "journal_mode": "wal",
+        "synchronous": "off",
+        "cache_size": -32 * 1024,  # 32MiB
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "memory",
+    },
+}
+DEFAULT_DB_PROFILE = "balanced"
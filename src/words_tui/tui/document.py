@@ -0,0 +1,514 @@
+"""Storage for the lines of a document being edited in the `TextEditor`.
+
+`LineRope` is the default. It's a persistent (immutable) balanced tree of line
+chunks, so replacing lines is O(log n), and taking a snapshot of the document
+is O(1) because a snapshot is just a reference to the current root. Nodes
+cache the word and UTF-8 byte counts and the widest cell width of their lines,
+so the total word count, the document width and mapping between rows and byte
+offsets are O(log n) too. Leaves keep the cell width, word and byte count of
+each of their lines when they're split or merged, so an edit only measures and
+counts the lines it changed.
+`LineList` stores the lines in a plain list and is mostly useful as a
+reference implementation.
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Iterable, Iterator, Sequence, cast, overload
+
+from textual._cells import cell_len
+
+LEAF_MAX_LINES = 64
+"""Leaves of the rope with fewer lines than this are merged with their neighbours."""
+
+
+class DocumentBuffer(ABC):
+    """The interface the `TextEditor` uses to store its document."""
+
+    @property
+    @abstractmethod
+    def line_count(self) -> int: ...
+
+    @property
+    @abstractmethod
+    def word_count(self) -> int:
+        """The number of whitespace separated words in the document."""
+        ...
+
+    @property
+    @abstractmethod
+    def max_line_width(self) -> int:
+        """The cell width of the widest line."""
+        ...
+
+    @abstractmethod
+    def get_line(self, index: int) -> str: ...
+
+    @abstractmethod
+    def iter_lines(self, start: int = 0, stop: int | None = None) -> Iterator[str]: ...
+
+    @abstractmethod
+    def line_start_byte(self, index: int) -> int:
+        """The UTF-8 byte offset of the start of a line, assuming lines are separated by `\\n`."""
+        ...
+
+    @abstractmethod
+    def line_at_byte(self, offset: int) -> tuple[int, int]:
+        """The index and start byte offset of the line that contains the byte at `offset`."""
+        ...
+
+    @abstractmethod
+    def replace_lines(self, start: int, stop: int, lines: list[str]) -> None:
+        """Replace lines `start` up to (but not including) `stop` with `lines`."""
+        ...
+
+    @abstractmethod
+    def snapshot(self) -> DocumentSnapshot:
+        """An immutable copy of the current document."""
+        ...
+
+
+class DocumentSnapshot:
+    """An immutable copy of a document. Safe to read from other threads."""
+
+    def __init__(self, lines: Sequence[str] | _Node | None) -> None:
+        self._lines = lines
+
+    @property
+    def line_count(self) -> int:
+        if isinstance(self._lines, _Node):
+            return self._lines.line_count
+        return len(self._lines or ())
+
+    def iter_lines(self) -> Iterator[str]:
+        if isinstance(self._lines, _Node):
+            return self._lines.iter_lines(0, self._lines.line_count)
+        return iter(self._lines or ())
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.iter_lines())
+
+
+class DocumentLines(Sequence[str]):
+    """A read-only list-like view of the lines in a `DocumentBuffer`."""
+
+    def __init__(self, buffer: DocumentBuffer) -> None:
+        self._buffer = buffer
+
+    def __len__(self) -> int:
+        return self._buffer.line_count
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._buffer.line_count)
+            lines = list(self._buffer.iter_lines(start, max(start, stop)))
+            return lines if step == 1 else list(self)[index]
+        if index < 0:
+            index += self._buffer.line_count
+        if not 0 <= index < self._buffer.line_count:
+            raise IndexError(index)
+        return self._buffer.get_line(index)
+
+    def __iter__(self) -> Iterator[str]:
+        return self._buffer.iter_lines()
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (list, tuple, DocumentLines)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    # The lines change as the document is edited
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+def _line_bytes(line: str) -> int:
+    """The number of UTF-8 bytes a line takes up, including the new line character."""
+    return len(line.encode("utf8")) + 1
+
+
+class LineList(DocumentBuffer):
+    """Stores the document in a plain list of lines.
+
+    Mapping between rows and byte offsets is O(n).
+    """
+
+    def __init__(self, lines: Iterable[str] = ()) -> None:
+        self._lines = list(lines)
+        self._line_word_counts = [len(line.split()) for line in self._lines]
+        self._word_count = sum(self._line_word_counts)
+        self._line_widths = [cell_len(line) for line in self._lines]
+        self._width_counts = Counter(self._line_widths)
+        """How many lines there are of each width."""
+        self._max_line_width: int | None = None
+
+    @property
+    def line_count(self) -> int:
+        return len(self._lines)
+
+    @property
+    def word_count(self) -> int:
+        return self._word_count
+
+    @property
+    def max_line_width(self) -> int:
+        if self._max_line_width is None:
+            self._max_line_width = max(self._width_counts, default=0)
+        return self._max_line_width
+
+    def get_line(self, index: int) -> str:
+        return self._lines[index]
+
+    def iter_lines(self, start: int = 0, stop: int | None = None) -> Iterator[str]:
+        return iter(self._lines[start:stop])
+
+    def line_start_byte(self, index: int) -> int:
+        return sum(_line_bytes(line) for line in self._lines[:index])
+
+    def line_at_byte(self, offset: int) -> tuple[int, int]:
+        line_start = 0
+        for index, line in enumerate(self._lines):
+            line_end = line_start + _line_bytes(line)
+            if offset < line_end:
+                return index, line_start
+            line_start = line_end
+        return len(self._lines), line_start
+
+    def replace_lines(self, start: int, stop: int, lines: list[str]) -> None:
+        word_counts = [len(line.split()) for line in lines]
+        self._word_count += sum(word_counts) - sum(self._line_word_counts[start:stop])
+        self._line_word_counts[start:stop] = word_counts
+
+        widths = [cell_len(line) for line in lines]
+        width_counts = self._width_counts
+        width_counts.update(widths)
+        width_counts.subtract(self._line_widths[start:stop])
+        for width in set(self._line_widths[start:stop]):
+            if not width_counts[width]:
+                del width_counts[width]
+        self._line_widths[start:stop] = widths
+        if self._max_line_width is not None and max(widths, default=0) >= self._max_line_width:
+            self._max_line_width = max(widths)
+        elif self._max_line_width not in width_counts:
+            # The widest line was removed
+            self._max_line_width = None
+
+        self._lines[start:stop] = lines
+
+    def snapshot(self) -> DocumentSnapshot:
+        return DocumentSnapshot(tuple(self._lines))
+
+
+class _Node(ABC):
+    """A node of a `LineRope`. Nodes are never modified after they're created."""
+
+    __slots__ = ("line_count", "height", "_word_count", "_byte_count", "_max_width")
+
+    line_count: int
+    height: int
+
+    def __init__(self) -> None:
+        self._word_count: int | None = None
+        self._byte_count: int | None = None
+        self._max_width: int | None = None
+
+    # The counts are computed lazily and cached, so an edit only needs to count
+    # the lines of the nodes it created.
+    @property
+    def word_count(self) -> int:
+        if self._word_count is None:
+            self._word_count = self._count_words()
+        return self._word_count
+
+    @property
+    def byte_count(self) -> int:
+        """UTF-8 bytes taken up by the lines, including a new line character after each line."""
+        if self._byte_count is None:
+            self._byte_count = self._count_bytes()
+        return self._byte_count
+
+    @property
+    def max_width(self) -> int:
+        """The cell width of the widest line."""
+        if self._max_width is None:
+            self._max_width = self._measure_max_width()
+        return self._max_width
+
+    @abstractmethod
+    def _count_words(self) -> int: ...
+
+    @abstractmethod
+    def _measure_max_width(self) -> int: ...
+
+    @abstractmethod
+    def _count_bytes(self) -> int: ...
+
+    @abstractmethod
+    def get_line(self, index: int) -> str: ...
+
+    @abstractmethod
+    def iter_lines(self, start: int, stop: int) -> Iterator[str]: ...
+
+
+class _Leaf(_Node):
+    __slots__ = ("lines", "_widths", "_words", "_bytes")
+
+    def __init__(
+        self,
+        lines: tuple[str, ...],
+        widths: tuple[int, ...] | None = None,
+        words: tuple[int, ...] | None = None,
+        line_bytes: tuple[int, ...] | None = None,
+    ) -> None:
+        super().__init__()
+        self.lines = lines
+        self.line_count = len(lines)
+        self.height = 0
+        # The cell width, word and byte count of each line, if they have been counted already
+        self._widths = widths
+        self._words = words
+        self._bytes = line_bytes
+
+    @property
+    def widths(self) -> tuple[int, ...]:
+        if self._widths is None:
+            self._widths = tuple(cell_len(line) for line in self.lines)
+        return self._widths
+
+    @property
+    def words(self) -> tuple[int, ...]:
+        if self._words is None:
+            self._words = tuple(len(line.split()) for line in self.lines)
+        return self._words
+
+    @property
+    def line_bytes(self) -> tuple[int, ...]:
+        if self._bytes is None:
+            self._bytes = tuple(_line_bytes(line) for line in self.lines)
+        return self._bytes
+
+    def _measure_max_width(self) -> int:
+        return max(self.widths, default=0)
+
+    def _count_words(self) -> int:
+        return sum(self.words)
+
+    def _count_bytes(self) -> int:
+        return sum(self.line_bytes)
+
+    def get_line(self, index: int) -> str:
+        return self.lines[index]
+
+    def iter_lines(self, start: int, stop: int) -> Iterator[str]:
+        return iter(self.lines[start:stop])
+
+
+class _Branch(_Node):
+    __slots__ = ("left", "right")
+
+    def __init__(self, left: _Node, right: _Node) -> None:
+        super().__init__()
+        self.left = left
+        self.right = right
+        self.line_count = left.line_count + right.line_count
+        self.height = max(left.height, right.height) + 1
+
+    def _count_words(self) -> int:
+        return self.left.word_count + self.right.word_count
+
+    def _count_bytes(self) -> int:
+        return self.left.byte_count + self.right.byte_count
+
+    def _measure_max_width(self) -> int:
+        return max(self.left.max_width, self.right.max_width)
+
+    def get_line(self, index: int) -> str:
+        node: _Node = self
+        # Comparing types is quicker than isinstance(), which goes through `ABCMeta` for leaves
+        while type(node) is _Branch:
+            if index < node.left.line_count:
+                node = node.left
+            else:
+                index -= node.left.line_count
+                node = node.right
+        return node.get_line(index)
+
+    def iter_lines(self, start: int, stop: int) -> Iterator[str]:
+        left_count = self.left.line_count
+        if start < left_count:
+            yield from self.left.iter_lines(start, min(stop, left_count))
+        if stop > left_count:
+            yield from self.right.iter_lines(max(start - left_count, 0), stop - left_count)
+
+
+def _branch(left: _Node, right: _Node) -> _Node:
+    if left.height > right.height + 1:
+        # Rotate right, a node taller than another one is a branch
+        left = cast(_Branch, left)
+        if left.left.height >= left.right.height:
+            return _Branch(left.left, _Branch(left.right, right))
+        left_right = cast(_Branch, left.right)
+        return _Branch(_Branch(left.left, left_right.left), _Branch(left_right.right, right))
+    if right.height > left.height + 1:
+        # Rotate left
+        right = cast(_Branch, right)
+        if right.right.height >= right.left.height:
+            return _Branch(_Branch(left, right.left), right.right)
+        right_left = cast(_Branch, right.left)
+        return _Branch(_Branch(left, right_left.left), _Branch(right_left.right, right.right))
+    return _Branch(left, right)
+
+
+def _join(left: _Node | None, right: _Node | None) -> _Node | None:
+    """Concatenate two ropes, keeping the result balanced."""
+    if left is None or not left.line_count:
+        return right
+    if right is None or not right.line_count:
+        return left
+    if left.height > right.height + 1:
+        left = cast(_Branch, left)
+        return _branch(left.left, _join(left.right, right))
+    if right.height > left.height + 1:
+        right = cast(_Branch, right)
+        return _branch(_join(left, right.left), right.right)
+    if isinstance(left, _Leaf) and isinstance(right, _Leaf) and left.line_count + right.line_count <= LEAF_MAX_LINES:
+        # Usually a leaf of new lines joining a counted one, counting the new lines now
+        # saves counting the whole leaf again later
+        widths = words = line_bytes = None
+        if left._widths is not None or right._widths is not None:
+            widths = left.widths + right.widths
+        if left._words is not None or right._words is not None:
+            words = left.words + right.words
+        if left._bytes is not None or right._bytes is not None:
+            line_bytes = left.line_bytes + right.line_bytes
+        return _Leaf(left.lines + right.lines, widths, words, line_bytes)
+    return _Branch(left, right)
+
+
+def _slice(counts: tuple[int, ...] | None, start: int | None, stop: int | None) -> tuple[int, ...] | None:
+    return None if counts is None else counts[start:stop]
+
+
+def _split(node: _Node | None, index: int) -> tuple[_Node | None, _Node | None]:
+    """Split a rope into the lines before `index` and the lines from `index` on."""
+    if node is None:
+        return None, None
+    if index <= 0:
+        return None, node
+    if index >= node.line_count:
+        return node, None
+    if isinstance(node, _Leaf):
+        counts = (node._widths, node._words, node._bytes)
+        return (
+            _Leaf(node.lines[:index], *(_slice(values, None, index) for values in counts)),
+            _Leaf(node.lines[index:], *(_slice(values, index, None) for values in counts)),
+        )
+    node = cast(_Branch, node)
+    left_count = node.left.line_count
+    if index < left_count:
+        left, middle = _split(node.left, index)
+        return left, _join(middle, node.right)
+    middle, right = _split(node.right, index - left_count)
+    return _join(node.left, middle), right
+
+
+def _build(lines: Sequence[str]) -> _Node | None:
+    """Build a balanced rope out of a list of lines."""
+    nodes: list[_Node] = [
+        _Leaf(tuple(lines[start : start + LEAF_MAX_LINES])) for start in range(0, len(lines), LEAF_MAX_LINES)
+    ]
+    if not nodes:
+        return None
+    while len(nodes) > 1:
+        paired = [_Branch(nodes[index], nodes[index + 1]) for index in range(0, len(nodes) - 1, 2)]
+        if len(nodes) % 2:
+            paired[-1] = _branch(paired[-1], nodes[-1])
+        nodes = paired
+    return nodes[0]
+
+
+class LineRope(DocumentBuffer):
+    """Stores the document in a persistent balanced tree of line chunks."""
+
+    def __init__(self, lines: Iterable[str] = ()) -> None:
+        self._root = _build(list(lines))
+
+    @property
+    def line_count(self) -> int:
+        return self._root.line_count if self._root else 0
+
+    @property
+    def word_count(self) -> int:
+        return self._root.word_count if self._root else 0
+
+    @property
+    def max_line_width(self) -> int:
+        return self._root.max_width if self._root else 0
+
+    def get_line(self, index: int) -> str:
+        if self._root is None or not 0 <= index < self._root.line_count:
+            raise IndexError(index)
+        return self._root.get_line(index)
+
+    def iter_lines(self, start: int = 0, stop: int | None = None) -> Iterator[str]:
+        if self._root is None:
+            return iter(())
+        line_count = self._root.line_count
+        stop = line_count if stop is None else min(stop, line_count)
+        if start >= stop:
+            return iter(())
+        return self._root.iter_lines(start, stop)
+
+    def line_start_byte(self, index: int) -> int:
+        node = self._root
+        offset = 0
+        while type(node) is _Branch:
+            if index < node.left.line_count:
+                node = node.left
+            else:
+                offset += node.left.byte_count
+                index -= node.left.line_count
+                node = node.right
+        if node is None:
+            return 0
+        return offset + sum(cast(_Leaf, node).line_bytes[:index])
+
+    def line_at_byte(self, offset: int) -> tuple[int, int]:
+        node = self._root
+        if node is None or offset >= node.byte_count:
+            return self.line_count, node.byte_count if node else 0
+        index = 0
+        line_start = 0
+        while type(node) is _Branch:
+            if offset < line_start + node.left.byte_count:
+                node = node.left
+            else:
+                line_start += node.left.byte_count
+                index += node.left.line_count
+                node = node.right
+        for line_bytes in cast(_Leaf, node).line_bytes:
+            line_end = line_start + line_bytes
+            if offset < line_end:
+                break
+            line_start = line_end
+            index += 1
+        return index, line_start
+
+    def replace_lines(self, start: int, stop: int, lines: list[str]) -> None:
+        before, rest = _split(self._root, start)
+        _, after = _split(rest, stop - start)
+        self._root = _join(_join(before, _build(lines)), after)
+
+    def snapshot(self) -> DocumentSnapshot:
+        return DocumentSnapshot(self._root)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import json
+from functools import wraps
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Any, Callable, TypeVar
+
+from rich.table import Table
+from textual import log
+from textual.widgets import Static
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+SUB_BUCKETS = 8
+"""Histogram buckets per power of two nanoseconds, percentiles are within 1/16 of the real value."""
+
+
+def _bucket(nanoseconds: int) -> int:
+    if nanoseconds < 2 * SUB_BUCKETS:
+        return max(nanoseconds, 0)
+    bits = nanoseconds.bit_length()
+    return (bits - 1) * SUB_BUCKETS + ((nanoseconds >> (bits - 4)) & (SUB_BUCKETS - 1))
+
+
+def _bucket_value(bucket: int) -> float:
+    """The middle of the range of nanoseconds in a bucket."""
+    if bucket < 2 * SUB_BUCKETS:
+        return bucket
+    bits, sub_bucket = divmod(bucket, SUB_BUCKETS)
+    width = 1 << (bits + 1 - 4)
+    return (SUB_BUCKETS + sub_bucket) * width + (width - 1) / 2
+
+
+class LatencyHistogram:
+    """Counts of latencies in buckets that grow exponentially.
+
+    Recording is constant time and the memory used doesn't depend on the number
+    of recorded latencies, so it can stay on for a whole session.
+    """
+
+    def __init__(self) -> None:
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, nanoseconds: int) -> None:
+        bucket = _bucket(nanoseconds)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += nanoseconds
+        if nanoseconds > self.max:
+            self.max = nanoseconds
+
+    def percentile(self, percent: float) -> float:
+        """Nanoseconds that `percent` of the latencies are shorter than (or equal to)."""
+        if not self.count:
+            return 0.0
+        rank = percent / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(_bucket_value(bucket), self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        """Milliseconds, apart from the count."""
+        return {
+            "count": self.count,
+            "total": self.total / 1e6,
+            "p50": self.percentile(50) / 1e6,
+            "p95": self.percentile(95) / 1e6,
+            "p99": self.percentile(99) / 1e6,
+            "max": self.max / 1e6,
+        }
+
+
+class Profiler:
+    """Latencies of the stages of handling a keystroke.
+
+    Off by default. Stages are timed by functions decorated with `timed`, which only
+    check `enabled` while the profiler is off. Stages can be nested (an edit includes
+    reparsing, for example), so their times don't add up.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.tracing = False
+        """Whether `trace` messages are logged, only worth it when someone's looking at them."""
+        self.stages: dict[str, LatencyHistogram] = {}
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def record(self, stage: str, nanoseconds: int) -> None:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = LatencyHistogram()
+        histogram.record(nanoseconds)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        return {stage: histogram.summary() for stage, histogram in self.stages.items()}
+
+    def dump(self, path: Path) -> None:
+        path.write_text(json.dumps({"unit": "ms", "stages": self.summary()}, indent=2) + "\n")
+
+
+profiler = Profiler()
+
+
+def timed(stage: str) -> Callable[[F], F]:
+    """Record how long the decorated function takes as `stage`, while profiling."""
+
+    def decorator(function: F) -> F:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.record(stage, perf_counter_ns() - start)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def trace(message: str, *args: object) -> None:
+    """Log a debug message, formatted with `str.format` only if tracing is on.
+
+    Arguments like an edit with 5MB of pasted text would otherwise be turned into a
+    string on every call, just to be thrown away when no one is looking at the log.
+    """
+    if profiler.tracing:
+        log.debug(message.format(*args))
+
+
+class ProfileOverlay(Static):
+    """Live latencies of every stage, while profiling."""
+
+    def on_mount(self) -> None:
+        self.update_summary()
+        self.set_interval(1, self.update_summary)
+
+    def update_summary(self) -> None:
+        table = Table("stage", "count", "p50", "p95", "p99", box=None, padding=(0, 1), title="Latency (ms)")
+        for stage, summary in sorted(profiler.summary().items()):
+            table.add_row(stage, str(summary["count"]), *(f"{summary[name]:.2f}" for name in ("p50", "p95", "p99")))
+        self.update(table)
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import datetime as dt
+from functools import partial
+
+from rich.text import Text
+from textual import on
+from textual.app import ComposeResult
+from textual.containers import Vertical
+from textual.screen import ModalScreen
+from textual.timer import Timer
+from textual.widgets import Footer, Input, OptionList
+from textual.worker import get_current_worker
+
+from words_tui.tui.db import SEARCH_HIGHLIGHT, Post, search_posts, worker_connection
+
+SEARCH_DEBOUNCE = 0.15
+"""Seconds to wait after the last keystroke before searching."""
+
+SEARCH_LIMIT = 50
+"""Maximum number of results shown."""
+
+
+def highlight_snippet(snippet: str) -> Text:
+    """Turn a snippet with `SEARCH_HIGHLIGHT` markers into styled text on a single line."""
+    start, end = SEARCH_HIGHLIGHT
+    plain, *matches = snippet.replace("\n", " ").split(start)
+    text = Text(plain)
+    for match in matches:
+        matched, _, rest = match.partition(end)
+        text.append(matched, style="bold reverse")
+        text.append(rest)
+    return text
+
+
+def render_result(post: Post) -> Text:
+    text = Text.assemble((f"{post.created_date:%Y-%m-%d}", "bold"), f" {post.word_count} words\n")
+    text.append_text(highlight_snippet(post.snippet))
+    return text
+
+
+class SearchScreen(ModalScreen):
+    """Find posts by their content.
+
+    Results are shown as you type. Searches are debounced and run on a worker thread,
+    and results of an older search that finish late are ignored. The screen is
+    dismissed with the day of the chosen post, or None.
+    """
+
+    CSS_PATH = "search.css"
+    BINDINGS = [
+        ("escape", "dismiss", "Back"),
+        ("ctrl+c", "quit", "Quit"),
+    ]
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.results: list[Post] = []
+        self._search_timer: Timer | None = None
+
+    def action_dismiss(self) -> None:
+        self.dismiss(None)
+
+    def compose(self) -> ComposeResult:
+        with Vertical(id="search"):
+            yield Input(placeholder="Search your posts", id="search_input")
+            yield OptionList(id="search_results")
+        yield Footer()
+
+    @on(Input.Changed)
+    def schedule_search(self, event: Input.Changed) -> None:
+        if self._search_timer is not None:
+            self._search_timer.stop()
+        self._search_timer = self.set_timer(SEARCH_DEBOUNCE, partial(self.search, event.value))
+
+    def search(self, text: str) -> None:
+        self.run_worker(partial(self._search_in_thread, text), group="search", exclusive=True, thread=True)
+
+    def _search_in_thread(self, text: str) -> None:
+        with worker_connection():
+            results = search_posts(text, limit=SEARCH_LIMIT)
+        if not get_current_worker().is_cancelled:
+            self.app.call_from_thread(self.show_results, text, results)
+
+    def show_results(self, text: str, results: list[Post]) -> None:
+        if text != self.query_one(Input).value:
+            # A newer search is on its way
+            return
+        self.results = results
+        option_list = self.query_one(OptionList)
+        option_list.clear_options()
+        option_list.add_options(render_result(post) for post in results)
+        if results:
+            option_list.highlighted = 0
+
+    @on(Input.Submitted)
+    def open_first_result(self) -> None:
+        if self.results:
+            self.open_result(0)
+
+    @on(OptionList.OptionSelected)
+    def open_selected_result(self, event: OptionList.OptionSelected) -> None:
+        self.open_result(event.option_index)
+
+    def open_result(self, index: int) -> None:
+        day: dt.date = self.results[index].created_date.date()
+        self.dismiss(day)
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import datetime as dt
+from collections import OrderedDict
+from functools import partial
+
+from rich.text import Text
+from textual.geometry import Region, Size
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+from words_tui.tui.db import Post, get_first_post_date, get_post_summaries, worker_connection
+from words_tui.tui.profiler import timed
+
+SIDEBAR_HEADER = " # Date      Words/Goal"
+
+SIDEBAR_WIDTH = 23
+"""Width of a rendered sidebar row in cells."""
+
+SIDEBAR_PAGE_SIZE = 100
+"""Number of days fetched from the database at once."""
+
+SIDEBAR_MAX_PAGES = 5
+"""Number of pages kept in memory. Least recently used pages are dropped first."""
+
+SIDEBAR_PREFETCH_ROWS = 20
+"""Start loading the next page when a row this close to the end of a page is rendered."""
+
+
+def get_post_icon(post: Post, words_per_day: str) -> str:
+    if post.word_count >= int(words_per_day):
+        return "✅"
+    elif post.created_date.date() == dt.date.today():
+        return "📝"
+    return "❌"
+
+
+def get_post_summary(post: Post, words_per_day: str) -> str:
+    return " ".join(
+        map(
+            str,
+            [
+                get_post_icon(post, words_per_day),
+                post.created_date.strftime("%Y-%m-%d"),
+                f"{post.word_count:5}/{words_per_day}",
+            ],
+        )
+    )
+
+
+class Sidebar(ScrollView, can_focus=False):
+    """Lists every day since the first post with its word count.
+
+    Only the visible rows are rendered. Each row is a day, counting back from
+    the current post, so a page of rows is a date range that is fetched from
+    the database with a range query on the indexed `created_date`. The next
+    page is prefetched on a worker thread while scrolling. Days without a post
+    are filled in at render time rather than stored.
+    """
+
+    def __init__(self, current_post: Post, words_per_day: str, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.current_post = current_post
+        """The post being edited. Rendered from memory since it may have unsaved changes
+        (or not exist in the database at all yet)."""
+        self.words_per_day = words_per_day
+
+        self.last_day = current_post.created_date.date()
+        """The day of the first row."""
+        first_day = get_first_post_date() or self.last_day
+        self.day_count = max((self.last_day - first_day).days, 0) + 1
+
+        self._pages: OrderedDict[int, dict[dt.date, Post]] = OrderedDict()
+        """Loaded pages of post summaries by day, in least recently used order."""
+        self._loading_pages: set[int] = set()
+
+    def on_mount(self) -> None:
+        self._store_page(0, get_post_summaries(*self._page_range(0)))
+        self._refresh_virtual_size()
+
+    def _refresh_virtual_size(self) -> None:
+        # One extra row for the header
+        self.virtual_size = Size(SIDEBAR_WIDTH, self.day_count + 1)
+
+    @timed("sidebar")
+    def render_line(self, widget_y: int) -> Strip:
+        width = self.size.width
+        if widget_y == 0:
+            # The header stays in place while the rows scroll underneath it
+            return self._render_text(Text(SIDEBAR_HEADER, style="bold"), width)
+
+        row = round(self.scroll_y) + widget_y - 1
+        if row >= self.day_count:
+            return Strip.blank(width)
+        if row == 0:
+            return self._render_text(Text(get_post_summary(self.current_post, self.words_per_day)), width)
+
+        page_index, page_row = divmod(row, SIDEBAR_PAGE_SIZE)
+        if page_row >= SIDEBAR_PAGE_SIZE - SIDEBAR_PREFETCH_ROWS:
+            self._request_page(page_index + 1)
+
+        page = self._get_page(page_index)
+        if page is None:
+            return Strip.blank(width)
+
+        day = self.last_day - dt.timedelta(days=row)
+        post = page.get(day)
+        if post is None:
+            # Nothing was written on this day
+            post = Post(content="", word_count=0, created_date=dt.datetime.combine(day, dt.time()))
+        return self._render_text(Text(get_post_summary(post, self.words_per_day)), width)
+
+    def _render_text(self, text: Text, width: int) -> Strip:
+        text.end = ""
+        return Strip(text.render(self.app.console)).adjust_cell_length(width)
+
+    # --- Paging
+    def _page_range(self, page_index: int) -> tuple[dt.datetime, dt.datetime]:
+        """The (inclusive, exclusive) range of creation dates shown on a page."""
+        until = self.last_day - dt.timedelta(days=page_index * SIDEBAR_PAGE_SIZE - 1)
+        since = until - dt.timedelta(days=SIDEBAR_PAGE_SIZE)
+        return dt.datetime.combine(since, dt.time()), dt.datetime.combine(until, dt.time())
+
+    def _get_page(self, page_index: int) -> dict[dt.date, Post] | None:
+        """Return a loaded page, or request it and return None if it isn't loaded."""
+        page = self._pages.get(page_index)
+        if page is None:
+            self._request_page(page_index)
+        else:
+            self._pages.move_to_end(page_index)
+        return page
+
+    def _request_page(self, page_index: int) -> None:
+        if page_index in self._pages or page_index in self._loading_pages:
+            return
+        if page_index * SIDEBAR_PAGE_SIZE >= self.day_count:
+            return
+        self._loading_pages.add(page_index)
+        self.run_worker(partial(self._load_page, page_index), group="sidebar", thread=True)
+
+    def _load_page(self, page_index: int) -> None:
+        with worker_connection():
+            posts = get_post_summaries(*self._page_range(page_index))
+        self.app.call_from_thread(self._page_loaded, page_index, posts)
+
+    def _page_loaded(self, page_index: int, posts: list[Post]) -> None:
+        self._loading_pages.discard(page_index)
+        self._store_page(page_index, posts)
+        self.refresh()
+
+    def _store_page(self, page_index: int, posts: list[Post]) -> None:
+        # Posts are sorted newest first, so if there's more than one post on a day the newest one wins:
+        self._pages[page_index] = {post.created_date.date(): post for post in reversed(posts)}
+        self._pages.move_to_end(page_index)
+        while len(self._pages) > SIDEBAR_MAX_PAGES:
+            self._pages.popitem(last=False)
+
+    # --- Updates
+    def update_current_post(self) -> None:
+        """Re-render the row of the current post.
+
+        The current post is always on the first row.
+        """
+        widget_y = 1 - round(self.scroll_y)
+        if 0 < widget_y < self.size.height:
+            self.refresh(Region(0, widget_y, self.size.width, 1))
+
+    def scroll_to_day(self, day: dt.date) -> None:
+        """Scroll so the row of `day` is right below the header."""
+        self.scroll_to(y=(self.last_day - day).days, animate=False)
+
+    def update_words_per_day(self, words_per_day: str) -> None:
+        """Re-render every visible row, since the goal changes every post's icon."""
+        self.words_per_day = words_per_day
+        self.refresh()
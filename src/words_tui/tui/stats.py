@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import datetime as dt
+from dataclasses import dataclass
+
+from words_tui.tui.db import database_proxy
+
+STREAKS_QUERY = """
+WITH goal_days AS (
+    SELECT day, julianday(day) - ROW_NUMBER() OVER (ORDER BY day) AS streak
+    FROM dailystats WHERE word_count >= ?
+)
+SELECT MIN(day), MAX(day), COUNT(*) FROM goal_days GROUP BY streak ORDER BY MAX(day)
+"""
+"""Runs of consecutive days that reached the goal, oldest first.
+
+Consecutive days have the same difference between their date and their row number.
+"""
+
+
+@dataclass
+class Statistics:
+    first_day: dt.date | None
+    days: int
+    """Days since the first post, including today."""
+    days_written: int
+    total_words: int
+    words_written: int
+    words_deleted: int
+    time_writing: float
+    """Seconds."""
+    best_day: dt.date | None
+    best_day_words: int
+    goal_days: int
+    current_streak: int
+    longest_streak: int
+
+    @property
+    def average_words(self) -> float:
+        """Average words of a day with a post."""
+        return self.total_words / self.days_written if self.days_written else 0
+
+    @property
+    def average_wpm(self) -> float:
+        return self.words_written / self.time_writing * 60 if self.time_writing else 0
+
+    @property
+    def goal_hit_rate(self) -> float:
+        """Share of all days (days without a post included) that reached the goal."""
+        return self.goal_days / self.days if self.days else 0
+
+
+def get_statistics(words_per_day: int, today: dt.date | None = None) -> Statistics:
+    """Compute statistics from the daily totals in `dailystats`, with one row per day.
+
+    A streak that reached the goal yesterday is still current, since today isn't over yet.
+    """
+    today = today or dt.date.today()
+    db = database_proxy
+
+    first_day, days_written, total_words, words_written, words_deleted, time_writing = db.execute_sql(
+        "SELECT MIN(day), COUNT(*), SUM(word_count), SUM(words_written), SUM(words_deleted), SUM(time_writing)"
+        " FROM dailystats WHERE post_count > 0"
+    ).fetchone()
+    first_day = dt.date.fromisoformat(first_day) if first_day else None
+
+    best_day, best_day_words = db.execute_sql(
+        "SELECT day, word_count FROM dailystats ORDER BY word_count DESC, day LIMIT 1"
+    ).fetchone() or (None, 0)
+
+    goal_days = 0
+    current_streak = 0
+    longest_streak = 0
+    for _, last_day, length in db.execute_sql(STREAKS_QUERY, (words_per_day,)):
+        goal_days += length
+        longest_streak = max(longest_streak, length)
+        current_streak = length if dt.date.fromisoformat(last_day) >= today - dt.timedelta(days=1) else 0
+
+    return Statistics(
+        first_day=first_day,
+        days=(today - first_day).days + 1 if first_day else 0,
+        days_written=days_written,
+        total_words=total_words or 0,
+        words_written=words_written or 0,
+        words_deleted=words_deleted or 0,
+        time_writing=time_writing or 0,
+        best_day=dt.date.fromisoformat(best_day) if best_day else None,
+        best_day_words=best_day_words,
+        goal_days=goal_days,
+        current_streak=current_streak,
+        longest_streak=longest_streak,
+    )
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from rich.table import Table
+from textual.app import ComposeResult
+from textual.containers import Vertical
+from textual.screen import ModalScreen
+from textual.widgets import Footer, Label, Static
+
+from words_tui.tui.db import worker_connection
+from words_tui.tui.stats import Statistics, get_statistics
+
+
+def format_duration(seconds: float) -> str:
+    minutes = int(seconds) // 60
+    return f"{minutes // 60}h {minutes % 60:02}m"
+
+
+def render_statistics(statistics: Statistics, words_per_day: int) -> Table:
+    table = Table.grid(padding=(0, 2))
+    table.add_column(style="bold")
+    table.add_column(justify="right")
+    if statistics.first_day is None:
+        table.add_row("Nothing written yet", "")
+        return table
+
+    best_day = f"{statistics.best_day_words} ({statistics.best_day:%Y-%m-%d})" if statistics.best_day else "-"
+    rows = [
+        ("Writing since", f"{statistics.first_day:%Y-%m-%d}"),
+        ("Days written", f"{statistics.days_written} of {statistics.days}"),
+        ("Total words", f"{statistics.total_words}"),
+        ("Average words per day", f"{statistics.average_words:.0f}"),
+        ("Best day", best_day),
+        (f"Days with {words_per_day} words", f"{statistics.goal_days} ({statistics.goal_hit_rate:.0%})"),
+        ("Current streak", f"{statistics.current_streak} days"),
+        ("Longest streak", f"{statistics.longest_streak} days"),
+        ("Time writing", format_duration(statistics.time_writing)),
+        ("Average WPM", f"{statistics.average_wpm:.2f}"),
+    ]
+    for row in rows:
+        table.add_row(*row)
+    return table
+
+
+class StatsScreen(ModalScreen):
+    """Statistics of all posts.
+
+    They're computed by SQL over the daily totals (one row per day written) on a
+    worker thread, so opening the screen doesn't wait for them and doesn't read posts.
+    """
+
+    CSS_PATH = "stats.css"
+    BINDINGS = [
+        ("escape", "dismiss", "Back"),
+        ("ctrl+c", "quit", "Quit"),
+    ]
+
+    def __init__(self, words_per_day: int, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.words_per_day = words_per_day
+
+    def compose(self) -> ComposeResult:
+        with Vertical(id="stats"):
+            yield Label("Statistics", id="stats_label")
+            yield Static("Loading…", id="stats_table")
+        yield Footer()
+
+    def on_mount(self) -> None:
+        self.run_worker(self._load_statistics, group="stats", thread=True)
+
+    def _load_statistics(self) -> None:
+        with worker_connection():
+            statistics = get_statistics(self.words_per_day)
+        self.app.call_from_thread(self.show_statistics, statistics)
+
+    def show_statistics(self, statistics: Statistics) -> None:
+        self.query_one("#stats_table", Static).update(render_statistics(statistics, self.words_per_day))
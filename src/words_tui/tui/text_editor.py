@@ -3,15 +3,20 @@
 from __future__ import annotations
 
 import re
-from collections import defaultdict
-from dataclasses import dataclass
+from bisect import bisect_right
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-from typing import ClassVar, NamedTuple, Optional
+from time import monotonic
+from typing import TYPE_CHECKING, ClassVar, Iterator, NamedTuple, Optional
 
 from rich.cells import get_character_cell_size
 from rich.style import Style
 from rich.text import Text
-from textual import events, log
+from textual import events
+from textual._cache import LRUCache
 from textual._cells import cell_len
 from textual._types import Protocol
 from textual.binding import Binding
@@ -20,8 +25,15 @@ from textual.message import Message
 from textual.reactive import Reactive, reactive
 from textual.scroll_view import ScrollView
 from textual.strip import Strip
-from tree_sitter import Language, Parser, Tree
-from tree_sitter.binding import Query
+
+from words_tui.tui.document import DocumentBuffer, DocumentLines, DocumentSnapshot, LineRope
+from words_tui.tui.profiler import timed, trace
+from words_tui.tui.wrap import WrapLayout
+
+if TYPE_CHECKING:
+    # tree-sitter is only imported once a language is set
+    from tree_sitter import Language, Parser, Tree
+    from tree_sitter.binding import Query
 
 TREE_SITTER_PATH = Path(__file__) / "../../../../tree-sitter/"
 LANGUAGES_PATH = TREE_SITTER_PATH / "textual-languages.so"
@@ -29,6 +41,34 @@ LANGUAGES_PATH = TREE_SITTER_PATH / "textual-languages.so"
 # TODO - remove hardcoded python.scm highlight query file
 HIGHLIGHTS_PATH = TREE_SITTER_PATH / "highlights/python.scm"
 
+LINE_CACHE_SIZE = 1024
+"""The maximum number of rendered lines the editor keeps around."""
+
+UNDO_HISTORY_SIZE = 4 * 1024 * 1024
+"""The maximum size in bytes of the undo history. The oldest edits are forgotten first."""
+
+UNDO_PAUSE = 1.0
+"""Typing after a pause of this many seconds starts a new undo step."""
+
+EDIT_OVERHEAD = 128
+"""Roughly how many bytes an edit takes up, not counting its text."""
+
+LARGE_EDIT_SIZE = 64 * 1024
+"""Text of at least this many characters (e.g. a large paste) is inserted in chunks of about this
+size, and the document is reparsed on a worker thread instead of blocking the UI."""
+
+READ_CHUNK_SIZE = 16 * 1024
+"""Roughly how many bytes of the document are handed to tree-sitter at once while parsing."""
+
+READ_CHUNK_LINES = 1024
+"""The maximum number of lines handed to tree-sitter at once while parsing."""
+
+HIGHLIGHT_BLOCK_ROWS = 100
+"""Highlights are captured when a row is first rendered, for this many rows at once."""
+
+REWRAP_CHUNK_LINES = 512
+"""With soft wrap on, lines that aren't on screen are wrapped this many at a time between other events."""
+
 # TODO - temporary proof of concept approach
 HIGHLIGHT_STYLES = {
     "string": Style(color="#E6DB74"),
@@ -90,8 +130,12 @@ class Edit(Protocol):
     def undo(self, editor: TextEditor) -> object | None:
         """Undo the action."""
 
+    def size(self) -> int:
+        """The number of bytes of text kept around to undo the action, 0 if it didn't change anything."""
+
 
-class Insert(NamedTuple):
+@dataclass
+class Insert:
     """Implements the Edit protocol for inserting text at some position."""
 
     text: str
@@ -101,10 +145,21 @@ class Insert(NamedTuple):
 
     def do(self, editor: TextEditor) -> None:
         if self.text:
-            editor._insert_text_range(self.text, self.from_position, self.to_position, self.move_cursor)
+            self.replaced_text = editor.get_text_range(self.from_position, self.to_position)
+            self.end_position = editor._insert_text_range(
+                self.text, self.from_position, self.to_position, self.move_cursor
+            )
 
     def undo(self, editor: TextEditor) -> None:
         """Undo the action."""
+        if self.text:
+            start = min(self.from_position, self.to_position)
+            editor._insert_text_range(self.replaced_text, start, self.end_position, move_cursor=False)
+
+    def size(self) -> int:
+        if not self.text:
+            return 0
+        return len(self.text.encode("utf8")) + len(self.replaced_text.encode("utf8"))
 
 
 @dataclass
@@ -120,6 +175,12 @@ class Delete:
 
     def undo(self, editor: TextEditor) -> None:
         """Undo the action."""
+        if self.deleted_text:
+            start = min(self.from_position, self.to_position)
+            editor._insert_text_range(self.deleted_text, start, start, move_cursor=False)
+
+    def size(self) -> int:
+        return len(self.deleted_text.encode("utf8"))
 
     def __rich_repr__(self):
         yield "from_position", self.from_position
@@ -128,6 +189,106 @@ class Delete:
             yield "deleted_text", self.deleted_text
 
 
+@dataclass
+class EditGroup:
+    """Edits that are undone and redone together, e.g. the characters of a typed word."""
+
+    selection_before: Selection
+    """The selection to restore when the group is undone."""
+    selection_after: Selection
+    """The selection to restore when the group is redone."""
+    last_edit_time: float
+    edits: list[Edit] = field(default_factory=list)
+    size: int = 0
+    """The approximate size of the edits in bytes."""
+
+
+@dataclass
+class EditBatch:
+    """The state of a `TextEditor.batch` that's in progress."""
+
+    group: EditGroup
+    """The edits made in the batch, undone and redone together."""
+    tree_edit: dict | None = None
+    """One tree-sitter edit that covers all of the edits in the batch."""
+    parse_document: bool = False
+    """True if the whole document needs to be parsed again, e.g. after a large paste."""
+    changed: bool = False
+    """True if the document was changed in the batch."""
+
+
+def _merge_tree_edits(first: dict | None, second: dict) -> dict:
+    """Combine two consecutive tree-sitter edits into a single edit that covers both.
+
+    The locations of `second` are in the document as it is after `first`.
+    """
+    if first is None:
+        return second
+
+    def before_first(byte: int, point: tuple[int, int]) -> tuple[int, tuple[int, int]]:
+        """Map a location at or after the end of `first` to where it was before `first`."""
+        (new_end_row, new_end_column), (old_end_row, old_end_column) = first["new_end_point"], first["old_end_point"]
+        row, column = point
+        if row == new_end_row:
+            point = (old_end_row, column - new_end_column + old_end_column)
+        else:
+            point = (row - new_end_row + old_end_row, column)
+        return byte - first["new_end_byte"] + first["old_end_byte"], point
+
+    def after_second(byte: int, point: tuple[int, int]) -> tuple[int, tuple[int, int]]:
+        """Map a location at or after the end of the range replaced by `second` to where it is after `second`."""
+        (old_end_row, old_end_column), (new_end_row, new_end_column) = second["old_end_point"], second["new_end_point"]
+        row, column = point
+        if row == old_end_row:
+            point = (new_end_row, column - old_end_column + new_end_column)
+        else:
+            point = (row - old_end_row + new_end_row, column)
+        return byte - second["old_end_byte"] + second["new_end_byte"], point
+
+    if second["start_byte"] < first["start_byte"]:
+        start_byte, start_point = second["start_byte"], second["start_point"]
+    else:
+        start_byte, start_point = first["start_byte"], first["start_point"]
+
+    if second["old_end_byte"] >= first["new_end_byte"]:
+        old_end_byte, old_end_point = before_first(second["old_end_byte"], second["old_end_point"])
+        new_end_byte, new_end_point = second["new_end_byte"], second["new_end_point"]
+    else:
+        old_end_byte, old_end_point = first["old_end_byte"], first["old_end_point"]
+        new_end_byte, new_end_point = after_second(first["new_end_byte"], first["new_end_point"])
+
+    return {
+        "start_byte": start_byte,
+        "old_end_byte": old_end_byte,
+        "new_end_byte": new_end_byte,
+        "start_point": start_point,
+        "old_end_point": old_end_point,
+        "new_end_point": new_end_point,
+    }
+
+
+def _iter_chunks(text: str, size: int) -> Iterator[str]:
+    """Split text into chunks of about `size` characters, ending right after a new line where possible."""
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start + size - 1) + 1 or len(text)
+        yield text[start:end]
+        start = end
+
+
+def _starts_new_group(previous: str, character: str, deleting: bool = False) -> bool:
+    """True if typing or deleting `character` after `previous` starts a new undo step.
+
+    A word and the whitespace after it are undone together. Words are usually
+    deleted backwards, so then the whitespace comes first.
+    """
+    if character == "\n":
+        return True
+    if deleting:
+        return character.isspace() and not previous.isspace()
+    return previous.isspace() and not character.isspace()
+
+
 class TextEditor(ScrollView, can_focus=True):
     DEFAULT_CSS = """\
 $editor-active-line-bg: white 8%;
@@ -179,10 +340,12 @@ TextEditor > .text-editor--selection {
         Binding("backspace", "delete_left", "delete left", show=False),
         Binding("ctrl+w", "delete_word_left", "delete left to start of word", show=False),
         Binding("ctrl+d", "delete_right", "delete right", show=False),
-        Binding("ctrl+f", "delete_word_right", "delete right to start of word", show=False),
+        Binding("ctrl+delete", "delete_word_right", "delete right to start of word", show=False),
         Binding("ctrl+x", "delete_line", "delete line", show=False),
         Binding("ctrl+u", "delete_to_start_of_line", "delete to line start", show=False),
         Binding("ctrl+k", "delete_to_end_of_line", "delete to line end", show=False),
+        Binding("ctrl+z", "undo", "undo", show=False),
+        Binding("ctrl+y", "redo", "redo", show=False),
     ]
 
     language: Reactive[str | None] = reactive(None)
@@ -191,6 +354,8 @@ TextEditor > .text-editor--selection {
     """The cursor position (zero-based line_index, offset)."""
     show_line_numbers: Reactive[bool] = reactive(True)
     """True to show line number gutter, otherwise False."""
+    soft_wrap: Reactive[bool] = reactive(False, init=False)
+    """True to wrap long lines at the edge of the editor instead of scrolling horizontally."""
     _document_size: Reactive[Size] = reactive(Size(), init=False)
     """Tracks the width of the document. Used to update virtual size. Do not
     update virtual size directly."""
@@ -220,19 +385,27 @@ TextEditor > .text-editor--selection {
         id: str | None = None,
         classes: str | None = None,
         disabled: bool = False,
+        buffer_class: type[DocumentBuffer] = LineRope,
     ) -> None:
         super().__init__(name=name, id=id, classes=classes, disabled=disabled)
 
         # --- Core editor data
-        self.document_lines: list[str] = []
-        """Each string in this list represents a line in the document. Includes new line characters."""
+        self._buffer_class = buffer_class
+        """The kind of `DocumentBuffer` used to store the document."""
 
-        self._highlights: dict[int, list[Highlight]] = defaultdict(list)
-        """Mapping line numbers to the set of cached highlights for that line."""
+        self._buffer: DocumentBuffer = buffer_class()
+        """The lines of the document, without new line characters."""
+
+        self._highlights: dict[int, list[Highlight]] = {}
+        """Mapping line numbers to the set of cached highlights for that line. Rows that haven't
+        been rendered since they last changed aren't captured yet."""
 
         self._highlights_query: str | None = None
         """The string containing the tree-sitter AST query used for syntax highlighting."""
 
+        self._compiled_highlights_query: Query | None = None
+        """The highlights query compiled for the current language."""
+
         self._last_intentional_cell_width: int = 0
         """Tracks the last column (measured in terms of cell length, since we care here about where
          the cursor visually moves more than the logical characters) the user explicitly navigated to so that we can reset
@@ -241,18 +414,47 @@ TextEditor > .text-editor--selection {
         self._word_pattern = re.compile(r"(?<=\W)(?=\w)|(?<=\w)(?=\W)")
         """Compiled regular expression for what we consider to be a 'word'."""
 
-        self._undo_stack: list[Edit] = []
-        """A stack (the end of the list is the top of the stack) for tracking edits."""
+        self._undo_stack: deque[EditGroup] = deque()
+        """A stack (the end of the deque is the top of the stack) for tracking edits."""
+
+        self._redo_stack: deque[EditGroup] = deque()
+        """Undone edits, cleared when a new edit is made."""
+
+        self._undo_size = 0
+        """The approximate size of the undo stack in bytes, kept below `UNDO_HISTORY_SIZE`."""
+
+        self._open_group: EditGroup | None = None
+        """The group on top of the undo stack, if more typing can still be added to it."""
+
+        self._batch: EditBatch | None = None
+        """The batch of edits in progress, see `batch`."""
 
         self._selecting = False
         """True if we're currently selecting text, otherwise False."""
 
+        self._line_cache: LRUCache[tuple, Strip] = LRUCache(LINE_CACHE_SIZE)
+        """Rendered lines, keyed by everything that affects how a line is rendered."""
+
+        self._component_rich_styles: dict[str, Style] = {}
+        """Cached component styles, cleared when the styles change."""
+
+        self._wrap = WrapLayout()
+        """The visual rows of every line, while `soft_wrap` is on."""
+
+        self._rewrap_scheduled = False
+        """True if wrapping the lines that aren't on screen yet will continue after other events."""
+
         # --- Abstract syntax tree and related parsing machinery
         self._language: Language | None = None
         self._parser: Parser | None = None
         """The tree-sitter parser which extracts the syntax tree from the document."""
         self._syntax_tree: Tree | None = None
         """The tree-sitter Tree (AST) built from the document."""
+        self._pending_tree_edits: list[dict] | None = None
+        """Edits made while the document is parsed on a worker, to apply to the new tree when it's
+        ready. None if the document isn't being parsed."""
+        self._parse_generation = 0
+        """Incremented on every full parse, so the results of outdated parses are dropped."""
 
     def watch_language(self, new_language: str | None) -> None:
         """Update the language used in AST parsing.
@@ -260,19 +462,23 @@ TextEditor > .text-editor--selection {
         When the language reactive string is updated, fetch the Language definition
         from our tree-sitter library file. If the language reactive is set to None,
         then the no parser is used."""
-        log.debug(f"updating editor language to {new_language!r}")
+        trace("updating editor language to {!r}", new_language)
         if new_language:
+            from tree_sitter import Language, Parser
+
             self._language = Language(LANGUAGES_PATH.resolve(), new_language)
             parser = Parser()
             self._parser = parser
             self._parser.set_language(self._language)
-            self._syntax_tree = self._build_ast(parser)
             self._highlights_query = Path(HIGHLIGHTS_PATH.resolve()).read_text()
+            # Compiling the query is expensive, so only do it when the language changes
+            self._compiled_highlights_query = self._language.query(self._highlights_query)
+            self._parse_document()
 
-        log.debug(f"parser set to {self._parser}")
+        trace("parser set to {}", self._parser)
 
     def watch__document_size(self, size: Size) -> None:
-        log.debug(f"document size set to {size!r} ")
+        trace("document size set to {!r}", size)
         document_width, document_height = size
         self.virtual_size = Size(document_width + self.gutter_width, document_height)
 
@@ -289,19 +495,76 @@ TextEditor > .text-editor--selection {
         else:
             return None
 
-    def _read_callable(self, byte_offset: int, point: tuple[int, int]) -> str:
-        row, column = point
-        lines = self.document_lines
-        row_out_of_bounds = row >= len(lines)
-        column_out_of_bounds = not row_out_of_bounds and column > len(lines[row])
-        if row_out_of_bounds or column_out_of_bounds:
-            return_value = None
-        elif column == len(lines[row]) and row < len(lines):
-            return_value = b"\n"
+    @timed("parse")
+    def _parse_document(self) -> None:
+        """Parse the whole document, on a worker thread if it's large."""
+        self._highlights.clear()
+        self._parse_generation += 1
+        self._pending_tree_edits = None
+        if self._buffer.line_start_byte(self._buffer.line_count) < LARGE_EDIT_SIZE:
+            self._syntax_tree = self._build_ast(self._parser)
+            return
+
+        # Until the new tree is ready edits don't touch the syntax tree and nothing is highlighted
+        self._syntax_tree = None
+        self._pending_tree_edits = []
+        parse = partial(self._parse_snapshot, self._parse_generation, self._language, self._buffer.snapshot())
+        if self.is_attached:
+            self.run_worker(parse, group="parse", thread=True, exclusive=True)
+        else:
+            parse()
+
+    def _parse_snapshot(self, generation: int, language: Language, snapshot: DocumentSnapshot) -> None:
+        from tree_sitter import Parser
+
+        # Unlike parsing with `_read_callable`, parsing bytes releases the GIL, so the UI stays responsive.
+        parser = Parser()
+        parser.set_language(language)
+        tree = parser.parse(snapshot.text.encode("utf8") + b"\n")
+        if self.is_attached:
+            self.app.call_from_thread(self._parse_finished, generation, tree)
         else:
-            return_value = lines[row][column].encode("utf8")
-        # print(f"(point={point!r}) (offset={byte_offset!r}) {return_value!r}")
-        return return_value
+            self._parse_finished(generation, tree)
+
+    def _parse_finished(self, generation: int, tree: Tree) -> None:
+        if generation != self._parse_generation or self._parser is None:
+            # The document was replaced (or the language changed) since the parse started
+            return
+        pending_tree_edits = self._pending_tree_edits or []
+        self._pending_tree_edits = None
+        if pending_tree_edits:
+            # Catch up with the edits that were made while parsing
+            for tree_edit in pending_tree_edits:
+                tree.edit(**tree_edit)
+            tree = self._parser.parse(self._read_callable, tree)
+        self._syntax_tree = tree
+        self._highlights.clear()
+        self._line_cache.clear()
+        self.refresh()
+
+    def _read_callable(self, byte_offset: int, point: tuple[int, int]) -> bytes | None:
+        """Return the rest of the line (and its new line) at a tree-sitter point, followed by
+        as many of the next lines as fit in `READ_CHUNK_SIZE` bytes.
+
+        Handing tree-sitter chunks of lines instead of single characters means a reparse
+        only takes a handful of calls, even when tree-sitter reads the whole document
+        again. The column of a point is a byte offset."""
+        row, column = point
+        buffer = self._buffer
+        if row >= buffer.line_count:
+            return None
+        line = buffer.get_line(row).encode("utf8") + b"\n"
+        if column >= len(line):
+            return None
+        chunk = [line[column:]]
+        chunk_size = len(chunk[0])
+        for next_line in buffer.iter_lines(row + 1, min(row + 1 + READ_CHUNK_LINES, buffer.line_count)):
+            if chunk_size >= READ_CHUNK_SIZE:
+                break
+            encoded_line = next_line.encode("utf8") + b"\n"
+            chunk.append(encoded_line)
+            chunk_size += len(encoded_line)
+        return b"".join(chunk)
 
     def load_text(self, text: str) -> None:
         """Load text from a string into the editor."""
@@ -316,57 +579,291 @@ TextEditor > .text-editor--selection {
         """Load text from a list of lines into the editor.
 
         This will replace any previously loaded lines."""
-        self.document_lines = lines
-        self._document_size = self._get_document_size(lines)
+        self._buffer = self._buffer_class(lines)
+        self._clear_history()
+        self._wrap.reset(self._buffer.line_count)
+        self._update_size()
         if self._parser is not None:
-            self._syntax_tree = self._build_ast(self._parser)
-            self._prepare_highlights()
+            self._parse_document()
 
-        log.debug(f"loaded text. parser = {self._parser} ast = {self._syntax_tree}")
+        trace("loaded text. parser = {} ast = {}", self._parser, self._syntax_tree)
 
     def clear(self) -> None:
         self.load_text("")
 
+    @property
+    def document_lines(self) -> DocumentLines:
+        """A read-only list-like view of the lines in the document."""
+        return DocumentLines(self._buffer)
+
+    @document_lines.setter
+    def document_lines(self, lines: list[str]) -> None:
+        self.load_lines(list(lines))
+
+    @property
+    def text(self) -> str:
+        """The whole document as a single string."""
+        return self.snapshot().text
+
+    def snapshot(self) -> DocumentSnapshot:
+        """An immutable copy of the document, e.g. for saving it from another thread."""
+        return self._buffer.snapshot()
+
     # --- Methods for measuring things (e.g. virtual sizes)
-    def _get_document_size(self, document_lines: list[str]) -> Size:
+    @property
+    def word_count(self) -> int:
+        """The number of whitespace separated words in the document."""
+        return self._buffer.word_count
+
+    def _get_document_size(self) -> Size:
         """Return the virtual size of the document - the document only
         refers to the area in which the cursor can move. It does not, for
-        example, include the width of the gutter."""
-        text_width = max(cell_len(line) for line in document_lines)
-        height = len(document_lines)
+        example, include the width of the gutter.
+
+        The buffer tracks the width of its widest line as lines are edited,
+        so this doesn't need to measure every line. With soft wrap on, the
+        document is as wide as the editor and as high as its visual rows."""
+        if self.soft_wrap:
+            return Size(max(self._wrap.width, 0) + 1, self._wrap.visual_row_count)
+        text_width = self._buffer.max_line_width
+        height = self._buffer.line_count
         # We add one to the text width to leave a space for the cursor, since it
         # can rest at the end of a line where there isn't yet any character.
         # Similarly, the cursor can rest below the bottom line of text, where
         # a line doesn't currently exist.
         return Size(text_width + 1, height)
 
+    @timed("refresh_size")
     def _refresh_size(self) -> None:
-        self._document_size = self._get_document_size(self.document_lines)
+        if self._batch is None:
+            self._update_size()
 
+    def _update_size(self) -> None:
+        if self.soft_wrap:
+            self._update_wrap_width()
+            self._wrap_visible_lines()
+            self._schedule_rewrap()
+        self._document_size = self._get_document_size()
+
+    # --- Soft wrap
+    @property
+    def _wrap_width(self) -> int:
+        """The cells available for text on a row, leaving room for the gutter, the scrollbar and the cursor."""
+        return self.size.width - self.gutter_width - self.styles.scrollbar_size_vertical - 1
+
+    def watch_soft_wrap(self, soft_wrap: bool) -> None:
+        self._wrap.reset(self._buffer.line_count, self._wrap_width if soft_wrap else 0)
+        if soft_wrap and self.is_mounted:
+            self.scroll_to(x=0, animate=False)
+        self._update_size()
+
+    def watch_show_line_numbers(self) -> None:
+        # The gutter takes up some of the width the text is wrapped to
+        if self.soft_wrap:
+            self._update_size()
+
+    def _size_updated(self, size: Size, virtual_size: Size, container_size: Size, layout: bool = True) -> bool:
+        changed = super()._size_updated(size, virtual_size, container_size, layout)
+        # Rewrap when the layout changes the size, the first frame at the new size is rendered
+        # before the `Resize` event is handled
+        if changed and self.soft_wrap:
+            self._update_size()
+        return changed
+
+    def watch_scroll_y(self, old_value: float, new_value: float) -> None:
+        if self.soft_wrap and round(old_value) != round(new_value):
+            rows = self._wrap.visual_row_count
+            self._wrap_visible_lines()
+            if rows != self._wrap.visual_row_count:
+                self._document_size = self._get_document_size()
+        super().watch_scroll_y(old_value, new_value)
+
+    def _update_wrap_width(self) -> None:
+        """Start rewrapping the document if the width of the editor changed.
+
+        Only the lines on screen are wrapped right away, the rest count as a single row
+        until `_rewrap_step` gets to them."""
+        width = self._wrap_width
+        if width == self._wrap.width:
+            return
+        top_row, _ = self._wrap.locate(round(self.scroll_y))
+        self._wrap.reset(self._buffer.line_count, width)
+        self._wrap_visible_lines(top_row)
+        self._document_size = self._get_document_size()
+        if self.is_mounted:
+            self.scroll_to(y=self._wrap.visual_row(top_row), animate=False)
+
+    def _wrap_visible_lines(self, top_row: int | None = None) -> None:
+        """Wrap the lines on screen that aren't wrapped yet."""
+        if top_row is None:
+            top_row, _ = self._wrap.locate(round(self.scroll_y))
+        stop = min(top_row + self.size.height + 1, self._buffer.line_count)
+        self._wrap.wrap_lines(top_row, self._buffer.iter_lines(top_row, stop))
+
+    def _schedule_rewrap(self) -> None:
+        if self._wrap.pending and not self._rewrap_scheduled and self.is_mounted:
+            self._rewrap_scheduled = True
+            self.call_later(self._rewrap_step)
+
+    def _rewrap_step(self) -> None:
+        """Wrap the next few lines that aren't wrapped yet, keeping the same line at the top of the screen."""
+        self._rewrap_scheduled = False
+        if not self.soft_wrap or not self._wrap.pending:
+            return
+        scroll_y = round(self.scroll_y)
+        top_row, top_sub_row = self._wrap.locate(scroll_y)
+        start = self._wrap.first_pending()
+        stop = min(start + REWRAP_CHUNK_LINES, self._buffer.line_count)
+        self._wrap.wrap_lines(start, self._buffer.iter_lines(start, stop))
+        self._document_size = self._get_document_size()
+        new_scroll_y = self._wrap.visual_row(top_row) + top_sub_row
+        if new_scroll_y != scroll_y:
+            self.scroll_to(y=new_scroll_y, animate=False)
+        self._schedule_rewrap()
+
+    def _line_offsets(self, row: int) -> tuple[int, ...]:
+        """Where the visual rows of a line start, wrapping it now if it isn't wrapped yet."""
+        rows = self._wrap.visual_row_count
+        offsets = self._wrap.wrap(row, self._buffer.get_line(row))
+        if rows != self._wrap.visual_row_count:
+            self._refresh_size()
+        return offsets
+
+    def _visual_position(self, row: int, column: int) -> tuple[int, int, int]:
+        """The visual row of a line that a column is on, where that row starts and where the next one starts."""
+        offsets = self._line_offsets(row)
+        sub_row = bisect_right(offsets, column) - 1
+        end = offsets[sub_row + 1] if sub_row + 1 < len(offsets) else len(self._buffer.get_line(row))
+        return sub_row, offsets[sub_row], end
+
+    def _visual_column(self, row: int, sub_row: int, cell_width: int) -> int:
+        """The column that is `cell_width` cells from the start of a visual row of a line."""
+        line = self._buffer.get_line(row)
+        offsets = self._line_offsets(row)
+        start = offsets[sub_row]
+        if sub_row + 1 < len(offsets):
+            # The column where the next row starts is on that row, not at the end of this one
+            end = offsets[sub_row + 1] - 1
+        else:
+            end = len(line)
+        total_cell_offset = 0
+        for column in range(start, end):
+            total_cell_offset += cell_len(line[column])
+            if total_cell_offset >= cell_width + 1:
+                return column
+        return end
+
+    def notify_style_update(self) -> None:
+        # Styles are updated on focus too, rendered lines only go stale if a style they use changed
+        old_styles = self._component_rich_styles
+        self._component_rich_styles = {}
+        if any(self._get_component_style(name) != style for name, style in old_styles.items()):
+            self._line_cache.clear()
+        super().notify_style_update()
+
+    def _get_component_style(self, name: str) -> Style:
+        """Like `get_component_rich_style`, but cached until the styles change."""
+        style = self._component_rich_styles.get(name)
+        if style is None:
+            style = self._component_rich_styles[name] = self.get_component_rich_style(name)
+        return style
+
+    @timed("render_line")
     def render_line(self, widget_y: int) -> Strip:
-        document_lines = self.document_lines
+        if self.soft_wrap:
+            return self._render_wrapped_line(widget_y)
+
+        buffer = self._buffer
 
         document_y = round(self.scroll_y + widget_y)
-        out_of_bounds = document_y >= len(document_lines)
+        out_of_bounds = document_y >= buffer.line_count
         if out_of_bounds:
             return Strip.blank(self.size.width)
 
-        line_string = document_lines[document_y].replace("\n", "").replace("\r", "")
-        line_text = Text(f"{line_string} ", end="", tab_size=4)
-        line_text.set_length(self.virtual_size.width)
+        line_string = buffer.get_line(document_y).replace("\n", "").replace("\r", "")
+        highlights = tuple(self._get_highlights(document_y))
+        selection_span = self._get_selection_span(document_y, len(line_string))
+        end_row, end_column = self.selection.end
+        cursor_column = end_column if end_row == document_y else None
+
+        # The strip only depends on these, so lines that didn't change since they
+        # were last rendered (e.g. when scrolling or idle repaints) come from the cache.
+        # Strings cache their hash, so using the line itself in the key is cheap.
+        cache_key = (
+            document_y,
+            line_string,
+            highlights,
+            selection_span,
+            cursor_column,
+            int(self.scroll_x),
+            self.virtual_size.width,
+            self.gutter_width,
+        )
+        strip = self._line_cache.get(cache_key)
+        if strip is None:
+            strip = self._render_line_strip(document_y, line_string, highlights, selection_span, cursor_column)
+            self._line_cache.set(cache_key, strip)
+        return strip
 
-        # Apply highlighting
-        null_style = Style.null()
-        if self._highlights:
-            highlights = self._highlights[document_y]
-            for start, end, highlight_name in highlights:
-                node_style = HIGHLIGHT_STYLES.get(highlight_name, null_style)
-                line_text.stylize(node_style, start, end)
+    def _render_wrapped_line(self, widget_y: int) -> Strip:
+        """Render one visual row of a wrapped line.
 
-        start, end = self.selection
-        end_row, end_column = end
+        The layout isn't updated while rendering, a line that wasn't wrapped yet only shows its first row.
+        """
+        visual_y = round(self.scroll_y + widget_y)
+        if visual_y >= self._wrap.visual_row_count:
+            return Strip.blank(self.size.width)
 
-        selection_style = self.get_component_rich_style("text-editor--selection")
+        document_y, sub_row = self._wrap.locate(visual_y)
+        line_string = self._buffer.get_line(document_y).replace("\n", "").replace("\r", "")
+        offsets = self._wrap.offsets(line_string)
+        last_row = sub_row + 1 >= len(offsets) or self._wrap.rows(document_y) == 1
+        start = offsets[sub_row]
+        end = len(line_string) if last_row else offsets[sub_row + 1]
+        row_string = line_string[start:end]
+
+        highlights = tuple(
+            Highlight(max(highlight_start - start, 0), None if highlight_end is None else highlight_end - start, name)
+            for highlight_start, highlight_end, name in self._get_highlights(document_y)
+            if highlight_start < end and (highlight_end is None or highlight_end > start)
+        )
+        selection_span = self._get_selection_span(document_y, len(line_string))
+        if selection_span is not None:
+            selection_start, selection_end = selection_span
+            if (selection_start >= end and not last_row) or selection_end <= start:
+                selection_span = None
+            else:
+                selection_span = max(selection_start - start, 0), min(selection_end, end) - start
+        end_row, end_column = self.selection.end
+        cursor_column = None
+        if end_row == document_y and start <= end_column and (end_column < end or last_row):
+            cursor_column = end_column - start
+            overflow = cell_len(row_string[:cursor_column]) - self._wrap.width
+            if overflow > 0:
+                # Spaces can hang over the edge of the row, the cursor stays on its last cell
+                cursor_column -= overflow
+
+        cache_key = (
+            document_y,
+            sub_row,
+            row_string,
+            highlights,
+            selection_span,
+            cursor_column,
+            self.virtual_size.width,
+            self.gutter_width,
+        )
+        strip = self._line_cache.get(cache_key)
+        if strip is None:
+            strip = self._render_line_strip(
+                document_y, row_string, highlights, selection_span, cursor_column, show_line_number=sub_row == 0
+            )
+            self._line_cache.set(cache_key, strip)
+        return strip
+
+    def _get_selection_span(self, document_y: int, line_length: int) -> tuple[int, int] | None:
+        """The range of columns on a row that is selected, or None if nothing on the row is selected."""
+        start, end = self.selection
 
         # Start and end can be before or after each other, depending on the direction
         # you move the cursor during selecting text, but the "top" of the selection
@@ -376,45 +873,63 @@ TextEditor > .text-editor--selection {
         selection_top_row, selection_top_column = selection_top
         selection_bottom_row, selection_bottom_column = selection_bottom
 
-        if start != end and selection_top_row <= document_y <= selection_bottom_row:
-            # If this row is part of the selection
-            if document_y == selection_top_row == selection_bottom_row:
-                # Selection within a single line
-                line_text.stylize_before(
-                    selection_style,
-                    start=selection_top_column,
-                    end=selection_bottom_column,
-                )
-            else:
-                # Selection spanning multiple lines
-                if document_y == selection_top_row:
-                    line_text.stylize_before(
-                        selection_style,
-                        start=selection_top_column,
-                        end=len(line_string),
-                    )
-                elif document_y == selection_bottom_row:
-                    line_text.stylize_before(selection_style, end=selection_bottom_column)
-                else:
-                    line_text.stylize_before(selection_style, end=len(line_string))
+        if start == end or not selection_top_row <= document_y <= selection_bottom_row:
+            return None
+        if document_y == selection_top_row == selection_bottom_row:
+            # Selection within a single line
+            return selection_top_column, selection_bottom_column
+        # Selection spanning multiple lines
+        if document_y == selection_top_row:
+            return selection_top_column, line_length
+        elif document_y == selection_bottom_row:
+            return 0, selection_bottom_column
+        return 0, line_length
+
+    def _render_line_strip(
+        self,
+        document_y: int,
+        line_string: str,
+        highlights: tuple[Highlight, ...],
+        selection_span: tuple[int, int] | None,
+        cursor_column: int | None,
+        *,
+        show_line_number: bool = True,
+    ) -> Strip:
+        line_text = Text(f"{line_string} ", end="", tab_size=4)
+        line_text.set_length(self.virtual_size.width)
+
+        # Apply highlighting
+        null_style = Style.null()
+        for start, end, highlight_name in highlights:
+            node_style = HIGHLIGHT_STYLES.get(highlight_name, null_style)
+            line_text.stylize(node_style, start, end)
+
+        if selection_span is not None:
+            selection_start, selection_end = selection_span
+            line_text.stylize_before(
+                self._get_component_style("text-editor--selection"),
+                start=selection_start,
+                end=selection_end,
+            )
 
         # Show the cursor and the selection
-        if end_row == document_y:
-            cursor_style = self.get_component_rich_style("text-editor--cursor")
-            line_text.stylize(cursor_style, end_column, end_column + 1)
-            active_line_style = self.get_component_rich_style("text-editor--active-line")
+        if cursor_column is not None:
+            cursor_style = self._get_component_style("text-editor--cursor")
+            line_text.stylize(cursor_style, cursor_column, cursor_column + 1)
+            active_line_style = self._get_component_style("text-editor--active-line")
             line_text.stylize_before(active_line_style)
 
         # Show the gutter
         if self.show_line_numbers:
-            if end_row == document_y:
-                gutter_style = self.get_component_rich_style("text-editor--active-line-gutter")
+            if cursor_column is not None:
+                gutter_style = self._get_component_style("text-editor--active-line-gutter")
             else:
-                gutter_style = self.get_component_rich_style("text-editor--gutter")
+                gutter_style = self._get_component_style("text-editor--gutter")
 
             gutter_width_no_margin = self.gutter_width - 2
+            line_number = document_y + 1 if show_line_number else ""
             gutter = Text(
-                f"{document_y + 1:>{gutter_width_no_margin}}  ",
+                f"{line_number:>{gutter_width_no_margin}}  ",
                 style=gutter_style,
                 end="",
             )
@@ -445,32 +960,32 @@ TextEditor > .text-editor--selection {
         return gutter_longest_number
 
     # --- Syntax highlighting
-    def _prepare_highlights(
-        self,
-        start_point: tuple[int, int] | None = None,
-        end_point: tuple[int, int] | None = None,
-    ) -> None:
-        # TODO - we're ignoring get changed ranges for now. Either I'm misunderstanding
-        #  it or I've made a mistake somewhere with AST editing.
-
+    def _get_highlights(self, row: int) -> list[Highlight]:
+        """The highlights of a row, capturing them (and those of the next few rows) if they aren't cached."""
+        highlights = self._highlights.get(row)
+        if highlights is None:
+            if self._syntax_tree is None:
+                return []
+            self._prepare_highlights(row, min(row + HIGHLIGHT_BLOCK_ROWS, self._buffer.line_count) - 1)
+            highlights = self._highlights[row]
+        return highlights
+
+    @timed("highlights")
+    def _prepare_highlights(self, start_row: int, end_row: int) -> None:
+        """Capture the highlights of rows `start_row` to `end_row` (inclusive), replacing any
+        highlights cached for those rows."""
         highlights = self._highlights
-        query: Query = self._language.query(self._highlights_query)
-
-        log.debug(f"capturing nodes in range {start_point!r} -> {end_point!r}")
+        query = self._compiled_highlights_query
 
-        captures_kwargs = {}
-        if start_point is not None:
-            captures_kwargs["start_point"] = start_point
-        if end_point is not None:
-            captures_kwargs["end_point"] = end_point
+        trace("capturing nodes in rows {!r} -> {!r}", start_row, end_row)
 
-        captures = query.captures(self._syntax_tree.root_node, **captures_kwargs)
+        captures = query.captures(self._syntax_tree.root_node, start_point=(start_row, 0), end_point=(end_row + 1, 0))
 
         highlight_updates: dict[int, list[Highlight]] = defaultdict(list)
         for capture in captures:
             node, highlight_name = capture
-            node_start_row, node_start_column = node.start_point
-            node_end_row, node_end_column = node.end_point
+            node_start_row, node_start_column = self._point_to_position(node.start_point)
+            node_end_row, node_end_column = self._point_to_position(node.end_point)
 
             if node_start_row == node_end_row:
                 highlight = Highlight(node_start_column, node_end_column, highlight_name)
@@ -485,27 +1000,185 @@ TextEditor > .text-editor--selection {
                 # Add the last line
                 highlight_updates[node_end_row].append(Highlight(0, node_end_column, highlight_name))
 
-        for line_index, updated_highlights in highlight_updates.items():
-            highlights[line_index] = updated_highlights
+        # Nodes that span the range also have captures outside of it, those rows weren't
+        # captured completely, so only replace the rows inside the range.
+        for line_index in range(start_row, end_row + 1):
+            highlights[line_index] = highlight_updates.get(line_index, [])
+
+    def _forget_highlights(self, start_row: int, end_row: int) -> None:
+        """Drop the cached highlights of rows `start_row` to `end_row` (inclusive), so they're captured
+        again the next time they're rendered."""
+        highlights = self._highlights
+        if end_row - start_row < len(highlights):
+            for row in range(start_row, end_row + 1):
+                highlights.pop(row, None)
+        else:
+            for row in [row for row in highlights if start_row <= row <= end_row]:
+                del highlights[row]
+
+    def _shift_highlights(self, start_row: int, old_end_row: int, new_end_row: int) -> None:
+        """Move the cached highlights of the rows after an edit to their new rows.
 
+        The highlights of the edited rows themselves are dropped, they need to be captured again."""
+        line_delta = new_end_row - old_end_row
+        highlights = self._highlights
+        if not line_delta:
+            return
+        shifted: dict[int, list[Highlight]] = {}
+        for row, row_highlights in highlights.items():
+            if row < start_row:
+                shifted[row] = row_highlights
+            elif row > old_end_row:
+                shifted[row + line_delta] = row_highlights
+        self._highlights = shifted
+
+    @timed("edit")
     def edit(self, edit: Edit) -> object | None:
-        log.debug(f"performing edit {edit!r}")
+        trace("performing edit {!r}", edit)
+        selection_before = self.selection
         result = edit.do(self)
-        self._undo_stack.append(edit)
+        self._record_edit(edit, selection_before)
+        return result
 
-        # TODO: Think about this...
-        self._undo_stack = self._undo_stack[-20:]
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Make several edits as if they were one.
 
-        return result
+        The syntax tree is updated, the size refreshed and `Changed` posted once at the end
+        of the batch, and the edits are undone and redone together. Batches can be nested,
+        the outermost one wins.
+
+        ```python
+        with editor.batch():
+            for start, end in matches:
+                editor.insert_text_range(replacement, start, end)
+        ```
+        """
+        if self._batch is not None:
+            yield
+            return
+
+        self._batch = EditBatch(EditGroup(self.selection, self.selection, monotonic()))
+        try:
+            yield
+        finally:
+            self._finish_batch()
+
+    def _finish_batch(self) -> None:
+        batch = self._batch
+        self._batch = None
+        if batch.parse_document:
+            self._parse_document()
+        elif batch.tree_edit is not None:
+            self._apply_tree_edit(batch.tree_edit)
+        if batch.changed:
+            self._refresh_size()
+            self._post_changed()
+
+        group = batch.group
+        if group.edits:
+            group.selection_after = self.selection
+            self._redo_stack.clear()
+            self._undo_stack.append(group)
+            self._undo_size += group.size
+            self._open_group = None
+            self._trim_history()
+
+    def _post_changed(self) -> None:
+        if self._batch is not None:
+            self._batch.changed = True
+        else:
+            self.post_message(self.Changed(self, ""))
+
+    def _record_edit(self, edit: Edit, selection_before: Selection) -> None:
+        """Add an edit that was just made to the undo history."""
+        size = edit.size()
+        if not size:
+            return
+
+        if self._batch is not None:
+            self._batch.group.edits.append(edit)
+            self._batch.group.size += size + EDIT_OVERHEAD
+            return
+
+        now = monotonic()
+        self._redo_stack.clear()
+        group = self._open_group
+        if group is None or not self._continues_group(group, edit, selection_before, now):
+            group = EditGroup(selection_before, self.selection, now)
+            self._undo_stack.append(group)
+        group.edits.append(edit)
+        group.selection_after = self.selection
+        group.last_edit_time = now
+        group.size += size + EDIT_OVERHEAD
+        self._undo_size += size + EDIT_OVERHEAD
+        self._open_group = group
+        self._trim_history()
+
+    def _continues_group(self, group: EditGroup, edit: Edit, selection_before: Selection, now: float) -> bool:
+        """True if an edit is more typing (or deleting) of the same word as the last edit in a group."""
+        if now - group.last_edit_time > UNDO_PAUSE or selection_before != group.selection_after:
+            return False
+        previous = group.edits[-1]
+        if isinstance(edit, Insert) and isinstance(previous, Insert):
+            return (
+                len(edit.text) == len(previous.text) == 1
+                and not edit.replaced_text
+                and not previous.replaced_text
+                and not _starts_new_group(previous.text, edit.text)
+            )
+        if isinstance(edit, Delete) and isinstance(previous, Delete):
+            return len(edit.deleted_text) == len(previous.deleted_text) == 1 and not _starts_new_group(
+                previous.deleted_text, edit.deleted_text, deleting=True
+            )
+        return False
+
+    def _trim_history(self) -> None:
+        """Forget the oldest edits until the history fits in `UNDO_HISTORY_SIZE`. The latest edit is always kept."""
+        while self._undo_size > UNDO_HISTORY_SIZE and len(self._undo_stack) > 1:
+            self._undo_size -= self._undo_stack.popleft().size
+
+    def _clear_history(self) -> None:
+        self._undo_stack.clear()
+        self._redo_stack.clear()
+        self._undo_size = 0
+        self._open_group = None
 
     def undo(self) -> None:
+        """Undo the last group of edits."""
         if self._undo_stack:
-            action = self._undo_stack.pop()
-            action.undo(self)
+            group = self._undo_stack.pop()
+            self._undo_size -= group.size
+            self._open_group = None
+            with self.batch():
+                for edit in reversed(group.edits):
+                    edit.undo(self)
+            self.selection = group.selection_before
+            self._redo_stack.append(group)
+
+    def redo(self) -> None:
+        """Redo the last group of edits that was undone."""
+        if self._redo_stack:
+            group = self._redo_stack.pop()
+            self._open_group = None
+            with self.batch():
+                for edit in group.edits:
+                    edit.do(self)
+            self.selection = group.selection_after
+            self._undo_stack.append(group)
+            self._undo_size += group.size
+            self._trim_history()
+
+    def action_undo(self) -> None:
+        self.undo()
+
+    def action_redo(self) -> None:
+        self.redo()
 
     # --- Lower level event/key handling
+    @timed("key")
     def _on_key(self, event: events.Key) -> None:
-        log.debug(f"{event!r}")
+        trace("{!r}", event)
         key = event.key
         if event.is_printable or key == "tab" or key == "enter":
             if key == "tab":
@@ -527,6 +1200,12 @@ TextEditor > .text-editor--selection {
         if offset is None:
             return
 
+        if self.soft_wrap:
+            target_x = max(offset.x - self.gutter_width, 0)
+            target_row, sub_row = self._wrap.locate(max(offset.y + int(self.scroll_y), 0))
+            sub_row = min(sub_row, len(self._line_offsets(target_row)) - 1)
+            return target_row, self._visual_column(target_row, sub_row, target_x)
+
         target_x = max(offset.x - self.gutter_width + int(self.scroll_x), 0)
         target_row = clamp(offset.y + int(self.scroll_y), 0, len(self.document_lines) - 1)
         target_column = self.cell_width_to_column_index(target_x, target_row)
@@ -544,7 +1223,7 @@ TextEditor > .text-editor--selection {
         offset = event.get_content_offset(self)
         target_row, target_column = self.get_target_document_location(offset)
         self.selection = Selection.cursor((target_row, target_column))
-        log.debug(f"started selection {self.selection!r}")
+        trace("started selection {!r}", self.selection)
         self._selecting = True
 
     def _on_mouse_move(self, event: events.MouseMove) -> None:
@@ -554,7 +1233,7 @@ TextEditor > .text-editor--selection {
             target = self.get_target_document_location(offset)
             selection_start, _ = self.selection
             self.selection = Selection(selection_start, target)
-            log.debug(f"selection updated {self.selection!r}")
+            trace("selection updated {!r}", self.selection)
 
     def _on_mouse_up(self, event: events.MouseUp) -> None:
         event.stop()
@@ -564,7 +1243,7 @@ TextEditor > .text-editor--selection {
     def _on_paste(self, event: events.Paste) -> None:
         text = event.text
         if text:
-            self.insert_text(text, self.selection)
+            self.insert_text_range(text, *self.selection)
         event.stop()
 
     def cell_width_to_column_index(self, cell_width: int, row_index: int) -> int:
@@ -574,7 +1253,7 @@ TextEditor > .text-editor--selection {
         for column_index, character in enumerate(line):
             total_cell_offset += cell_len(character)
             if total_cell_offset >= cell_width + 1:
-                log(f"cell width {cell_width} -> column_index {column_index}")
+                trace("cell width {} -> column_index {}", cell_width, column_index)
                 return column_index
         return len(line)
 
@@ -586,8 +1265,13 @@ TextEditor > .text-editor--selection {
         # The end of the selection is always considered to be position of the cursor
         # ... this is a constraint we need to enforce in code.
         row, column = self.selection.end
-        text = self.active_line_text[:column]
-        column_offset = cell_len(text)
+        if self.soft_wrap:
+            sub_row, start, _ = self._visual_position(row, column)
+            column_offset = min(cell_len(self.active_line_text[start:column]), self._wrap.width)
+            row = self._wrap.visual_row(row) + sub_row
+        else:
+            text = self.active_line_text[:column]
+            column_offset = cell_len(text)
         self.scroll_to_region(
             Region(x=column_offset, y=row, width=3, height=1),
             spacing=Spacing(right=self.gutter_width),
@@ -653,7 +1337,7 @@ TextEditor > .text-editor--selection {
             self.selection = Selection(start, (cursor_row, 0))
         else:
             self.selection = Selection.cursor((cursor_row, 0))
-            print(f"new selection = {self.selection}")
+            trace("new selection = {!r}", self.selection)
 
     # ------ Cursor movement actions
     def action_cursor_left(self) -> None:
@@ -728,6 +1412,12 @@ TextEditor > .text-editor--selection {
     def get_cursor_down_position(self):
         """Get the position the cursor will move to if it moves down."""
         cursor_row, cursor_column = self.selection.end
+        if self.soft_wrap:
+            sub_row, _, _ = self._visual_position(cursor_row, cursor_column)
+            if sub_row + 1 < len(self._line_offsets(cursor_row)):
+                return cursor_row, self._visual_column(cursor_row, sub_row + 1, self._last_intentional_cell_width)
+            if not self.cursor_at_last_row:
+                return cursor_row + 1, self._visual_column(cursor_row + 1, 0, self._last_intentional_cell_width)
         if self.cursor_at_last_row:
             return cursor_row, len(self.document_lines[cursor_row])
 
@@ -749,9 +1439,18 @@ TextEditor > .text-editor--selection {
         self.selection = Selection(start, target)
 
     def get_cursor_up_position(self) -> tuple[int, int]:
+        cursor_row, cursor_column = self.selection.end
+        if self.soft_wrap:
+            sub_row, _, _ = self._visual_position(cursor_row, cursor_column)
+            if sub_row > 0:
+                return cursor_row, self._visual_column(cursor_row, sub_row - 1, self._last_intentional_cell_width)
+            if not self.cursor_at_first_row:
+                last_sub_row = len(self._line_offsets(cursor_row - 1)) - 1
+                return cursor_row - 1, self._visual_column(
+                    cursor_row - 1, last_sub_row, self._last_intentional_cell_width
+                )
         if self.cursor_at_first_row:
             return 0, 0
-        cursor_row, cursor_column = self.selection.end
         target_row = max(0, cursor_row - 1)
         # Attempt to snap last intentional cell length
         target_column = self.cell_width_to_column_index(self._last_intentional_cell_width, target_row)
@@ -830,8 +1529,13 @@ TextEditor > .text-editor--selection {
 
     def _record_last_intentional_cell_width(self) -> None:
         row, column = self.selection.end
-        column_cell_length = self.get_column_cell_width(row, column)
-        log(f"last intentional cell width = {column_cell_length}")
+        if self.soft_wrap:
+            # Moving up and down keeps the cursor in the same cell of the visual rows
+            _, start, _ = self._visual_position(row, column)
+            column_cell_length = cell_len(self.document_lines[row][start:column])
+        else:
+            column_cell_length = self.get_column_cell_width(row, column)
+        trace("last intentional cell width = {}", column_cell_length)
         self._last_intentional_cell_width = column_cell_length
 
     # --- Editor operations
@@ -853,66 +1557,175 @@ TextEditor > .text-editor--selection {
         from_position: tuple[int, int],
         to_position: tuple[int, int],
         move_cursor: bool = True,
-    ) -> None:
-        """Insert text at a given range and move the cursor to the end of the inserted text."""
+    ) -> tuple[int, int]:
+        """Insert text at a given range and move the cursor to the end of the inserted text.
+
+        Returns:
+            The position at the end of the inserted text.
+        """
+        from_position, to_position = self._fix_direction(from_position, to_position)
+
+        if len(text) >= LARGE_EDIT_SIZE:
+            # Splitting all of the text into lines at once would need another copy of it, and
+            # reparsing it all would block the UI.
+            cursor_destination = from_position
+            for chunk in _iter_chunks(text, LARGE_EDIT_SIZE):
+                cursor_destination = self._splice_text(chunk, cursor_destination, to_position)
+                to_position = cursor_destination
+            if self._batch is not None:
+                self._batch.parse_document = True
+            elif self._parser is not None:
+                self._parse_document()
+        else:
+            old_range = None
+            if self._parser is not None:
+                old_range = self._get_tree_sitter_range(from_position, to_position)
+            cursor_destination = self._splice_text(text, from_position, to_position)
+            if old_range is not None:
+                self._reparse(old_range, cursor_destination)
 
+        self._refresh_size()
+        if move_cursor:
+            self.selection = Selection.cursor(cursor_destination)
+        self._post_changed()
+        return cursor_destination
+
+    def _splice_text(self, text: str, from_position: tuple[int, int], to_position: tuple[int, int]) -> tuple[int, int]:
+        """Replace the text in a range of the buffer (the start must be before the end) with new text.
+
+        Returns:
+            The position at the end of the new text.
+        """
         inserted_text = text
-        lines = self.document_lines
+        buffer = self._buffer
 
         from_row, from_column = from_position
         to_row, to_column = to_position
 
-        if from_position > to_position:
-            from_row, from_column, to_row, to_column = (
-                to_row,
-                to_column,
-                from_row,
-                from_column,
-            )
-
-        insert_lines = inserted_text.splitlines()
+        # Inserting an empty string still replaces the range, e.g. when undoing an insert
+        insert_lines = inserted_text.splitlines() or [""]
         if inserted_text.endswith("\n"):
             # Special case where a single newline character is inserted.
             insert_lines.append("")
 
-        before_selection = lines[from_row][:from_column]
-        after_selection = lines[to_row][to_column:]
+        before_selection = buffer.get_line(from_row)[:from_column]
+        after_selection = buffer.get_line(to_row)[to_column:]
 
         insert_lines[0] = before_selection + insert_lines[0]
         destination_column = len(insert_lines[-1])
         insert_lines[-1] = insert_lines[-1] + after_selection
-        lines[from_row : to_row + 1] = insert_lines
+
+        self._replace_lines(from_row, to_row + 1, insert_lines)
         destination_row = from_row + len(insert_lines) - 1
 
-        cursor_destination = (destination_row, destination_column)
-
-        start_byte = self._position_to_byte_offset(from_position)
-        if self._syntax_tree is not None:
-            self._syntax_tree.edit(
-                start_byte=start_byte,
-                old_end_byte=self._position_to_byte_offset(to_position),
-                new_end_byte=start_byte + len(inserted_text),
-                start_point=from_position,
-                old_end_point=to_position,
-                new_end_point=cursor_destination,
-            )
-            self._syntax_tree = self._parser.parse(self._read_callable, self._syntax_tree)
-            self._prepare_highlights()
-        self._refresh_size()
-        if move_cursor:
-            self.selection = Selection.cursor(cursor_destination)
-        self.post_message(self.Changed(self, ""))
+        return destination_row, destination_column
+
+    def _replace_lines(self, start: int, stop: int, lines: list[str]) -> None:
+        """Replace lines `start` up to (but not including) `stop`, rewrapping only the new lines."""
+        self._buffer.replace_lines(start, stop, lines)
+        if self.soft_wrap:
+            self._wrap.replace(start, stop, len(lines))
+            if len(lines) <= REWRAP_CHUNK_LINES:
+                self._wrap.wrap_lines(start, lines)
+
+    def get_text_range(self, start: tuple[int, int], end: tuple[int, int]) -> str:
+        """Return the text between two locations in the document."""
+        (start_row, start_column), (end_row, end_column) = self._fix_direction(start, end)
+        buffer = self._buffer
+        if start_row == end_row:
+            return buffer.get_line(start_row)[start_column:end_column]
+        lines = [
+            buffer.get_line(start_row)[start_column:],
+            *buffer.iter_lines(start_row + 1, end_row),
+            buffer.get_line(end_row)[:end_column],
+        ]
+        return "\n".join(lines)
 
     def _position_to_byte_offset(self, position: tuple[int, int]) -> int:
-        """Given a document coordinate, return the byte offset of that coordinate."""
+        """Given a document coordinate, return the UTF-8 byte offset of that coordinate."""
 
         # TODO - this assumes all line endings are a single byte `\n`
-        lines = self.document_lines
         row, column = position
-        lines_above = lines[:row]
-        bytes_lines_above = sum(len(line) + 1 for line in lines_above)
-        bytes_this_line_left_of_cursor = len(lines[row][:column])
-        return bytes_lines_above + bytes_this_line_left_of_cursor
+        return self._buffer.line_start_byte(row) + self._position_to_point(position)[1]
+
+    def _byte_offset_to_position(self, byte_offset: int) -> tuple[int, int]:
+        """Given a UTF-8 byte offset, return the document coordinate of that offset."""
+        row, line_start = self._buffer.line_at_byte(byte_offset)
+        if row >= self._buffer.line_count:
+            return row, 0
+        line = self._buffer.get_line(row).encode("utf8")
+        return row, len(line[: byte_offset - line_start].decode("utf8", errors="ignore"))
+
+    def _point_to_position(self, point: tuple[int, int]) -> tuple[int, int]:
+        """Given a tree-sitter point, where the column is in bytes, return the document coordinate."""
+        row, byte_column = point
+        if row >= self._buffer.line_count:
+            return row, byte_column
+        line = self._buffer.get_line(row)
+        if line.isascii():
+            return row, byte_column
+        return row, len(line.encode("utf8")[:byte_column].decode("utf8", errors="ignore"))
+
+    def _position_to_point(self, position: tuple[int, int]) -> tuple[int, int]:
+        """Given a document coordinate, return the tree-sitter point, where the column is in bytes."""
+        row, column = position
+        if row >= self._buffer.line_count:
+            return row, 0
+        return row, len(self._buffer.get_line(row)[:column].encode("utf8"))
+
+    def _get_tree_sitter_range(
+        self, from_position: tuple[int, int], to_position: tuple[int, int]
+    ) -> tuple[int, int, tuple[int, int], tuple[int, int]]:
+        """The start and end byte offsets and points of a range, to describe an edit to tree-sitter.
+
+        Must be called before the document is changed."""
+        return (
+            self._position_to_byte_offset(from_position),
+            self._position_to_byte_offset(to_position),
+            self._position_to_point(from_position),
+            self._position_to_point(to_position),
+        )
+
+    def _reparse(
+        self, old_range: tuple[int, int, tuple[int, int], tuple[int, int]], new_end_position: tuple[int, int]
+    ) -> None:
+        """Tell tree-sitter about an edit and incrementally reparse the document."""
+        start_byte, old_end_byte, start_point, old_end_point = old_range
+        tree_edit = {
+            "start_byte": start_byte,
+            "old_end_byte": old_end_byte,
+            "new_end_byte": self._position_to_byte_offset(new_end_position),
+            "start_point": start_point,
+            "old_end_point": old_end_point,
+            "new_end_point": self._position_to_point(new_end_position),
+        }
+        if self._batch is not None:
+            self._batch.tree_edit = _merge_tree_edits(self._batch.tree_edit, tree_edit)
+        else:
+            self._apply_tree_edit(tree_edit)
+
+    @timed("reparse")
+    def _apply_tree_edit(self, tree_edit: dict) -> None:
+        if self._syntax_tree is None:
+            # The document is being parsed on a worker, the edit is applied to the tree when it's done
+            if self._pending_tree_edits is not None:
+                self._pending_tree_edits.append(tree_edit)
+            return
+
+        self._syntax_tree.edit(**tree_edit)
+        old_tree = self._syntax_tree
+        self._syntax_tree = self._parser.parse(self._read_callable, old_tree)
+
+        # Only capture highlights again for the edited rows and the rows where the
+        # syntax tree changed (e.g. everything after an opening quote).
+        start_row, old_end_row = tree_edit["start_point"][0], tree_edit["old_end_point"][0]
+        new_end_row = tree_edit["new_end_point"][0]
+        self._shift_highlights(start_row, old_end_row, new_end_row)
+        changed_rows = [(start_row, new_end_row)]
+        for changed_range in old_tree.changed_ranges(self._syntax_tree):
+            changed_rows.append((changed_range.start_point[0], changed_range.end_point[0]))
+        for changed_start_row, changed_end_row in _merge_row_ranges(changed_rows):
+            self._forget_highlights(changed_start_row, changed_end_row)
 
     def dedent_line(self) -> None:
         """Reduces the indentation of the current line by one level.
@@ -930,13 +1743,8 @@ TextEditor > .text-editor--selection {
         # If the line is indented, reduce the indentation
         # TODO - if the line is less than the indent level we should just dedent as far as possible.
         if current_line.startswith(indent_level):
-            self.document_lines[cursor_row] = current_line[len(indent_level) :]
-
-        if cursor_column > len(current_line):
-            self.selection = Selection.cursor((cursor_row, len(current_line)))
-
-        self._refresh_size()
-        self.refresh()
+            cursor_destination = (cursor_row, max(cursor_column - len(indent_level), 0))
+            self.edit(Delete((cursor_row, 0), (cursor_row, len(indent_level)), cursor_destination))
 
     def delete_range(
         self,
@@ -961,7 +1769,7 @@ TextEditor > .text-editor--selection {
         from_row, from_column = from_position
         to_row, to_column = to_position
 
-        lines = self.document_lines
+        buffer = self._buffer
 
         # Ensure that from_position is before to_position
         if from_position > to_position:
@@ -972,42 +1780,18 @@ TextEditor > .text-editor--selection {
                 from_column,
             )
 
-        # If the range is within a single line
-        if from_row == to_row:
-            line = lines[from_row]
-            deleted_text = line[from_column:to_column]
-            lines[from_row] = line[:from_column] + line[to_column:]
-        else:
-            # The range spans multiple lines
-            start_line = lines[from_row]
-            end_line = lines[to_row]
-
-            deleted_text = start_line[from_column:] + "\n"
-            for row in range(from_row + 1, to_row):
-                deleted_text += lines[row] + "\n"
-
-            deleted_text += end_line[:to_column]
-            if to_column == len(end_line):
-                deleted_text += "\n"
-
-            # Update the lines at the start and end of the range
-            lines[from_row] = start_line[:from_column] + end_line[to_column:]
-
-            # Delete the lines in between
-            del lines[from_row + 1 : to_row + 1]
-
-        if self._syntax_tree is not None:
-            start_byte = self._position_to_byte_offset(from_position)
-            self._syntax_tree.edit(
-                start_byte=start_byte,
-                old_end_byte=self._position_to_byte_offset(to_position),
-                new_end_byte=start_byte,
-                start_point=from_position,
-                old_end_point=to_position,
-                new_end_point=from_position,
-            )
-            self._syntax_tree = self._parser.parse(self._read_callable, self._syntax_tree)
-            self._prepare_highlights()
+        old_range = None
+        if self._parser is not None:
+            old_range = self._get_tree_sitter_range((from_row, from_column), (to_row, to_column))
+
+        deleted_text = self.get_text_range((from_row, from_column), (to_row, to_column))
+        # Join the start and end of the range, dropping the lines in between
+        start_line = buffer.get_line(from_row)
+        end_line = start_line if from_row == to_row else buffer.get_line(to_row)
+        self._replace_lines(from_row, to_row + 1, [start_line[:from_column] + end_line[to_column:]])
+
+        if old_range is not None:
+            self._reparse(old_range, (from_row, from_column))
 
         self._refresh_size()
         if cursor_destination is not None:
@@ -1016,7 +1800,7 @@ TextEditor > .text-editor--selection {
             # Move the cursor to the start of the deleted range
             self.selection = Selection.cursor((from_row, from_column))
 
-        self.post_message(self.Changed(self, ""))
+        self._post_changed()
         return deleted_text
 
     def action_delete_left(self) -> None:
@@ -1140,7 +1924,7 @@ TextEditor > .text-editor--selection {
         document_size: Size
         virtual_size: Size
         scroll: Offset
-        undo_stack: list[Edit]
+        undo_stack: list[EditGroup]
         tree_sexp: str
         active_line_text: str
         active_line_cell_len: int
@@ -1163,11 +1947,22 @@ TextEditor > .text-editor--selection {
             active_line_cell_len=cell_len(self.active_line_text),
             highlight_cache_key_count=len(self._highlights),
             highlight_cache_total_size=sum(len(highlights) for key, highlights in self._highlights.items()),
-            highlight_cache_current_row_size=len(self._highlights[self.selection.end[0]]),
-            highlight_cache_current_row=self._highlights[self.selection.end[0]],
+            highlight_cache_current_row_size=len(self._highlights.get(self.selection.end[0], [])),
+            highlight_cache_current_row=self._highlights.get(self.selection.end[0], []),
         )
 
 
+def _merge_row_ranges(row_ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Merge overlapping or adjacent (inclusive) row ranges."""
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted(row_ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
 def traverse_tree(cursor):
     reached_root = False
     while reached_root is False:
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from array import array
+
+ROLLING_WINDOWS = (60, 5 * 60, 15 * 60)
+"""Seconds that rolling words per minute are computed over.
+
+These are wall-clock seconds up to now, pauses included, so time spent not writing
+lowers the rates."""
+
+PAUSE_SECONDS = 2.0
+"""Writing is paused once nothing was typed for this long."""
+
+BURST_RATIO = 1.5
+"""Writing is a burst while the rate of the shortest window is this much higher than the longest one."""
+
+MIN_RATE_SPAN = 10.0
+"""Seconds a rate is spread over at least, so the first few words don't read as a huge WPM."""
+
+
+class KeystrokeRing:
+    """Words written and deleted during the last `max(windows)` seconds.
+
+    Changes are summed into one-second buckets kept in fixed size arrays, so memory stays
+    the same however long the session runs. Every window keeps running totals that are
+    updated as buckets enter and leave it, so adding a change and reading a rate take
+    (amortized) constant time.
+    """
+
+    def __init__(self, windows: tuple[int, ...] = ROLLING_WINDOWS):
+        self.windows = windows
+        self.capacity = max(windows)
+        self._seconds = array("q", [0]) * self.capacity
+        self._written = array("q", [0]) * self.capacity
+        self._deleted = array("q", [0]) * self.capacity
+        self._head = 0
+        """Number of buckets ever added. Bucket `i` is stored at `i % capacity`."""
+        self._tails = [0] * len(windows)
+        """The oldest bucket still in each window."""
+        self._window_written = [0] * len(windows)
+        self._window_deleted = [0] * len(windows)
+
+        self.first_change: float | None = None
+        self.last_change: float | None = None
+
+    def add(self, timestamp: float, word_delta: int) -> None:
+        """Record a change of the document. Changes within a word count towards pauses only."""
+        if self.first_change is None:
+            self.first_change = timestamp
+        self.last_change = timestamp
+        if word_delta == 0:
+            return
+        second = int(timestamp)
+        if self._head == 0 or self._seconds[(self._head - 1) % self.capacity] != second:
+            self._expire(second, make_room=True)
+            slot = self._head % self.capacity
+            self._seconds[slot] = second
+            self._written[slot] = 0
+            self._deleted[slot] = 0
+            self._head += 1
+        slot = (self._head - 1) % self.capacity
+
+        # The newest bucket is always in every window
+        if word_delta > 0:
+            self._written[slot] += word_delta
+            self._window_written = [written + word_delta for written in self._window_written]
+        else:
+            self._deleted[slot] -= word_delta
+            self._window_deleted = [deleted - word_delta for deleted in self._window_deleted]
+
+    def _expire(self, second: int, make_room: bool = False) -> None:
+        """Drop buckets that are too old for a window, and the oldest bucket if it's about to be overwritten."""
+        oldest_kept = self._head - self.capacity + 1 if make_room else self._head - self.capacity
+        for index, window in enumerate(self.windows):
+            tail = self._tails[index]
+            while tail < self._head and (self._seconds[tail % self.capacity] <= second - window or tail < oldest_kept):
+                self._window_written[index] -= self._written[tail % self.capacity]
+                self._window_deleted[index] -= self._deleted[tail % self.capacity]
+                tail += 1
+            self._tails[index] = tail
+
+    def words_written(self, now: float) -> list[int]:
+        """Words written during each window."""
+        self._expire(int(now))
+        return list(self._window_written)
+
+    def words_deleted(self, now: float) -> list[int]:
+        """Words deleted during each window."""
+        self._expire(int(now))
+        return list(self._window_deleted)
+
+    def rates(self, now: float) -> list[float]:
+        """Words written per minute during each window.
+
+        Windows longer than the session so far are spread over the session instead.
+        """
+        if self.first_change is None:
+            return [0.0] * len(self.windows)
+        elapsed = now - self.first_change
+        return [
+            written / max(min(window, elapsed), MIN_RATE_SPAN) * 60
+            for window, written in zip(self.windows, self.words_written(now))
+        ]
+
+    def is_paused(self, now: float) -> bool:
+        return self.last_change is None or now - self.last_change > PAUSE_SECONDS
+
+    def is_burst(self, now: float) -> bool:
+        """True while writing a lot faster than usual."""
+        if self.is_paused(now):
+            return False
+        rates = self.rates(now)
+        return rates[0] > 0 and rates[0] >= rates[-1] * BURST_RATIO
@@ -0,0 +1,216 @@
+"""Soft wrapping of the lines of the `TextEditor`.
+
+Each line of the document is shown on one or more visual rows. `wrap_offsets` decides
+where the rows of a line start and `WrapLayout` keeps track of how many rows every line
+takes up, so the editor can map between document rows and visual rows without measuring
+the whole document.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from rich.cells import get_character_cell_size
+from textual._cache import LRUCache
+from textual._cells import cell_len
+
+BLOCK_LINES = 256
+"""Lines are counted in blocks of about this many lines."""
+
+WRAP_CACHE_SIZE = 4096
+"""The maximum number of wrapped lines a layout keeps around."""
+
+
+def wrap_offsets(line: str, width: int) -> tuple[int, ...]:
+    """The columns where each visual row of `line` starts, when it's wrapped to `width` cells.
+
+    Rows are broken after the spaces between words, words that are wider than `width`
+    are broken anywhere. Spaces never start a new row, they hang over the edge instead.
+    """
+    if width <= 0 or (len(line) <= width if line.isascii() else cell_len(line) <= width):
+        return (0,)
+
+    is_ascii = line.isascii()
+    offsets = [0]
+    start = 0
+    cells = 0
+    """The cell width of `line[start:index]`."""
+    break_at = 0
+    """The column after the last space on the current row."""
+    break_cells = 0
+    """The cell width of `line[start:break_at]`."""
+    for index, character in enumerate(line):
+        if character == " ":
+            cells += 1
+            break_at = index + 1
+            break_cells = cells
+            continue
+        size = 1 if is_ascii else get_character_cell_size(character)
+        if cells + size > width:
+            if start < break_at:
+                cells -= break_cells
+                start = break_at
+                offsets.append(start)
+            if cells + size > width and start < index:
+                cells = 0
+                start = index
+                offsets.append(start)
+        cells += size
+    return tuple(offsets)
+
+
+class WrapLayout:
+    """The number of visual rows each line of a document takes up when wrapped to `width` cells.
+
+    The counts are kept in blocks of lines along with the total number of rows of each
+    block, so mapping between document rows and visual rows only adds up the blocks before
+    a row, and replacing lines only touches the blocks they're in.
+
+    Lines start out unwrapped and count as a single row until `wrap` or `wrap_lines` measure
+    them. That way the editor only has to wrap the lines on screen after a resize and can
+    wrap the rest of the document a bit at a time.
+    """
+
+    def __init__(self, line_count: int = 1, width: int = 0) -> None:
+        self._offsets: LRUCache[tuple[str, int], tuple[int, ...]] = LRUCache(WRAP_CACHE_SIZE)
+        """Wrapped lines, keyed by the line and the width it was wrapped to."""
+        self.width = width
+        self.reset(line_count)
+
+    def reset(self, line_count: int, width: int | None = None) -> None:
+        """Forget the rows of every line, e.g. when the document is replaced or the width changes."""
+        if width is not None:
+            self.width = width
+        self._counts = [[0] * min(BLOCK_LINES, line_count - start) for start in range(0, line_count, BLOCK_LINES)]
+        """The number of rows of each line, in blocks. 0 if the line wasn't wrapped yet."""
+        if not self._counts:
+            self._counts = [[]]
+        self._block_rows = [len(counts) for counts in self._counts]
+        self._block_pending = [len(counts) for counts in self._counts]
+        self.line_count = line_count
+        self.visual_row_count = line_count
+        self.pending = line_count
+        """The number of lines that weren't wrapped yet."""
+
+    def offsets(self, line: str) -> tuple[int, ...]:
+        """Where the rows of `line` start, without updating the layout."""
+        key = (line, self.width)
+        offsets = self._offsets.get(key)
+        if offsets is None:
+            offsets = wrap_offsets(line, self.width)
+            self._offsets.set(key, offsets)
+        return offsets
+
+    def _find_line(self, row: int) -> tuple[int, int]:
+        """The block of a line and its index in the block. Rows past the end are at the end of the last block."""
+        for block, counts in enumerate(self._counts):
+            if row < len(counts):
+                return block, row
+            row -= len(counts)
+        return len(self._counts) - 1, len(self._counts[-1])
+
+    def _set_rows(self, block: int, index: int, rows: int) -> None:
+        counts = self._counts[block]
+        old_rows = counts[index]
+        if old_rows == rows:
+            return
+        counts[index] = rows
+        if not old_rows:
+            old_rows = 1
+            self._block_pending[block] -= 1
+            self.pending -= 1
+        self._block_rows[block] += rows - old_rows
+        self.visual_row_count += rows - old_rows
+
+    def wrap(self, row: int, line: str) -> tuple[int, ...]:
+        """Where the rows of the line at `row` start, recording how many rows it takes up."""
+        offsets = self.offsets(line)
+        self._set_rows(*self._find_line(row), len(offsets))
+        return offsets
+
+    def wrap_lines(self, start: int, lines: Iterable[str]) -> None:
+        """Wrap the lines that weren't wrapped yet out of consecutive `lines`, starting with the line at `start`."""
+        block, index = self._find_line(start)
+        counts = self._counts[block]
+        for line in lines:
+            while index >= len(counts):
+                if block + 1 == len(self._counts):
+                    return
+                block += 1
+                index = 0
+                counts = self._counts[block]
+            if not counts[index]:
+                self._set_rows(block, index, len(self.offsets(line)))
+            index += 1
+
+    def first_pending(self) -> int | None:
+        """The first line that wasn't wrapped yet."""
+        row = 0
+        for block, pending in enumerate(self._block_pending):
+            counts = self._counts[block]
+            if pending:
+                return row + counts.index(0)
+            row += len(counts)
+        return None
+
+    def replace(self, start: int, stop: int, line_count: int) -> None:
+        """Replace lines `start` up to (but not including) `stop` with `line_count` unwrapped lines."""
+        first_block, first_index = self._find_line(start)
+        last_block = self._find_line(max(stop - 1, start))[0]
+
+        counts = [count for block in range(first_block, last_block + 1) for count in self._counts[block]]
+        counts[first_index : first_index + stop - start] = [0] * line_count
+        if len(counts) <= 2 * BLOCK_LINES:
+            blocks = [counts]
+        else:
+            blocks = [counts[index : index + BLOCK_LINES] for index in range(0, len(counts), BLOCK_LINES)]
+        if not counts and len(self._counts) > last_block - first_block + 1:
+            blocks = []
+
+        old_rows = sum(self._block_rows[first_block : last_block + 1])
+        old_pending = sum(self._block_pending[first_block : last_block + 1])
+        block_rows = [sum(count or 1 for count in counts) for counts in blocks]
+        block_pending = [counts.count(0) for counts in blocks]
+
+        self._counts[first_block : last_block + 1] = blocks
+        self._block_rows[first_block : last_block + 1] = block_rows
+        self._block_pending[first_block : last_block + 1] = block_pending
+        self.line_count += line_count - (stop - start)
+        self.visual_row_count += sum(block_rows) - old_rows
+        self.pending += sum(block_pending) - old_pending
+
+    def rows(self, row: int) -> int:
+        """The number of visual rows of a line, 1 if it wasn't wrapped yet."""
+        block, index = self._find_line(row)
+        counts = self._counts[block]
+        return counts[index] or 1 if index < len(counts) else 1
+
+    def visual_row(self, row: int) -> int:
+        """The first visual row of a line."""
+        visual_row = 0
+        for block, counts in enumerate(self._counts):
+            if row < len(counts):
+                return visual_row + sum(count or 1 for count in counts[:row])
+            row -= len(counts)
+            visual_row += self._block_rows[block]
+        return visual_row
+
+    def locate(self, visual_row: int) -> tuple[int, int]:
+        """The line shown on a visual row and which of its rows it is.
+
+        Visual rows past the end are on the last row of the last line."""
+        row = 0
+        for block, block_rows in enumerate(self._block_rows):
+            counts = self._counts[block]
+            if visual_row < block_rows:
+                for count in counts:
+                    rows = count or 1
+                    if visual_row < rows:
+                        return row, visual_row
+                    visual_row -= rows
+                    row += 1
+            visual_row -= block_rows
+            row += len(counts)
+        if not self.line_count:
+            return 0, 0
+        return self.line_count - 1, self.rows(self.line_count - 1) - 1
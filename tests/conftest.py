@@ -0,0 +1,13 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+import pytest
+
+from words_tui.tui.db import database_proxy, init_db
+
+
+@pytest.fixture
+def db(tmp_path):
+    init_db(str(tmp_path / "words-tui.db"))
+    yield database_proxy
+    database_proxy.close()
@@ -0,0 +1,33 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+from words_tui.tui.autosave import AutoSaver
+from words_tui.tui.db import Post
+
+
+def test_autosave_coalesces_edits(db):
+    post = Post.create(content="")
+    autosave = AutoSaver(post, idle=60, window=60)
+
+    for text in ["h", "he", "hel", "hell", "hello"]:
+        autosave.mark_dirty(text, len(text.split()))
+
+    assert autosave.dirty
+    assert not autosave.is_due()
+    assert Post.get_by_id(post.id).content == ""
+
+    assert autosave.flush()
+    assert not autosave.flush()
+    assert Post.get_by_id(post.id).content == "hello"
+    assert Post.get_by_id(post.id).word_count == 1
+    assert autosave.attempted == 5
+    assert autosave.written == 1
+    assert autosave.coalesced == 4
+
+
+def test_autosave_is_due_after_idle(db):
+    post = Post.create(content="")
+    autosave = AutoSaver(post, idle=0, window=60)
+    assert not autosave.is_due()
+    autosave.mark_dirty("hello", 1)
+    assert autosave.is_due()
@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+import importlib.util
+import json
+from pathlib import Path
+
+from words_tui.tui.db import Post, database_proxy, init_db
+
+BENCHMARKS = Path(__file__).parent.parent / "benchmarks"
+
+spec = importlib.util.spec_from_file_location("bench", BENCHMARKS / "bench.py")
+bench = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(bench)
+
+
+def test_synthetic_database(tmp_path):
+    bench.make_database(tmp_path / "posts.db", 30)
+    init_db(str(tmp_path / "posts.db"))
+    try:
+        posts = list(Post.select())
+        assert len(posts) == 30
+        assert all(post.word_count == len(post.content.split()) for post in posts)
+        assert 200 < sum(post.word_count for post in posts) / 30 < 700
+    finally:
+        database_proxy.close()
+
+
+def test_baseline_covers_every_measurement():
+    baseline = json.loads((BENCHMARKS / "baseline.json").read_text())
+    assert set(baseline["results"]) == set(bench.REPEAT)
+    for name, sizes in baseline["results"].items():
+        assert set(sizes) == {str(size) for size in bench.EDITOR_SIZES.get(name, bench.SIZES)}
+
+
+def test_find_regressions():
+    def report(**fastest):
+        return {"results": {name: {"30": {"min": value}} for name, value in fastest.items()}}
+
+    baseline = report(startup=0.3, keystroke=0.010, wpm_tick=0.0001)
+    assert bench.find_regressions(report(startup=0.4, keystroke=0.012, wpm_tick=0.0009), baseline) == []
+    assert bench.find_regressions(report(startup=0.5, keystroke=0.020), baseline) == [
+        "startup with 30 posts: fastest 500.00ms, baseline 300.00ms",
+        "keystroke with 30 posts: fastest 20.00ms, baseline 10.00ms",
+    ]
+
+
+def test_find_scaling_problems():
+    def report(small, large):
+        return {"results": {"insert": {"30": {"median": small}, "50000": {"median": large}}}}
+
+    assert bench.find_scaling_problems(report(0.001, 0.004)) == []
+    assert bench.find_scaling_problems(report(0.001, 0.010)) == [
+        "insert with 50000 lines: 10.00ms, 10.0 times as long as with 30"
+    ]
+
+
+def test_find_missed_targets():
+    def report(median):
+        return {"results": {"paste": {"5000000": {"median": median}}}}
+
+    assert bench.find_missed_targets(report(0.5)) == []
+    assert bench.find_missed_targets(report(1.5)) == ["paste with 5000000 chars: 1500.00ms, target 1000.00ms"]
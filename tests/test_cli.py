@@ -0,0 +1,44 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+from __future__ import annotations
+
+import subprocess
+import sys
+
+HEAVY_MODULES = {"textual", "rich", "tree_sitter", "peewee"}
+"""Modules the CLI shouldn't import until the TUI starts."""
+
+IMPORT_TIME_BUDGET = 0.2
+"""Seconds that importing the CLI may take (about 0.06s when this was written)."""
+
+
+def import_times(*args: str) -> dict[str, float]:
+    """Run Python with `-X importtime` and return the cumulative import time of each module in seconds."""
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative) / 1_000_000
+    return times
+
+
+def test_version_does_not_import_the_tui():
+    times = import_times("-m", "words_tui", "--version")
+    imported = {name.split(".")[0] for name in times}
+    assert not imported & HEAVY_MODULES
+    assert times["words_tui.cli"] < IMPORT_TIME_BUDGET
+
+
+def test_tree_sitter_is_only_imported_for_languages():
+    times = import_times("-c", "from words_tui.tui.app import WordsTui")
+    assert "textual" in times
+    assert "tree_sitter" not in times
+
+
+def test_export_does_not_import_textual(tmp_path):
+    times = import_times("-m", "words_tui", "--db", str(tmp_path / "words-tui.db"), "export", "ndjson")
+    assert "peewee" in times
+    assert "textual" not in times
@@ -0,0 +1,40 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+import datetime
+
+from click.testing import CliRunner
+
+from words_tui.cli import compact, words_tui
+from words_tui.tui.db import Post, get_post_for_day
+
+
+def run_compact(db_path: str, *args: str) -> list[str]:
+    result = CliRunner().invoke(words_tui, ["--db", db_path, "compact", *args], catch_exceptions=False)
+    assert result.exit_code == 0
+    return result.stdout.splitlines()
+
+
+def test_format_size():
+    assert compact.format_size(512) == "512B"
+    assert compact.format_size(1536) == "1.5KB"
+    assert compact.format_size(3 * 1024**3) == "3.0GB"
+
+
+def test_compact(db):
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time(9))
+    content = "All work and no play makes Jack a dull boy. " * 50
+    for days in range(10):
+        Post.create(content=content, created_date=today - datetime.timedelta(days=days), word_count=500)
+
+    output = run_compact(db.database, "--older-than", "3", "--limit", "4")
+    assert output[0].startswith(f"Compressed 4 posts from {compact.format_size(4 * len(content))} to ")
+    assert output[1].startswith("Database size: ")
+    assert output[2].startswith("Opening a compressed post takes ")
+    assert ", an uncompressed one " in output[2]
+
+    # Only the posts that weren't compressed yet
+    assert run_compact(db.database, "--older-than", "3")[0].startswith("Compressed 2 posts from ")
+    assert run_compact(db.database, "--older-than", "3")[0] == "No posts older than 3 days left to compress"
+    assert Post.select().where(Post.compressed_content.is_null(False)).count() == 6
+    assert get_post_for_day(datetime.date.today() - datetime.timedelta(days=9)).content == content
@@ -0,0 +1,304 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+import datetime
+import logging
+import sqlite3
+
+import pytest
+from playhouse.test_utils import count_queries
+
+from words_tui.tui.db import (
+    MIGRATIONS,
+    DailyStats,
+    MinuteStats,
+    Post,
+    PostStats,
+    Settings,
+    compress_posts,
+    database_proxy,
+    get_first_post_date,
+    get_post_for_day,
+    get_post_summaries,
+    init_db,
+    iter_posts,
+    load_per_minute,
+    make_snippet,
+    search_posts,
+    to_search_query,
+    worker_connection,
+)
+
+LEGACY_SCHEMA = """
+CREATE TABLE "post" ("id" INTEGER NOT NULL PRIMARY KEY, "content" TEXT NOT NULL, "created_date" DATETIME NOT NULL);
+CREATE TABLE "poststats" ("id" INTEGER NOT NULL PRIMARY KEY, "post_id" INTEGER NOT NULL,
+    "words_written" INTEGER NOT NULL, "words_deleted" INTEGER NOT NULL, "pauses" INTEGER NOT NULL,
+    "time_writing" REAL NOT NULL, "writing_time_until_goal" REAL, "per_minute" TEXT NOT NULL,
+    FOREIGN KEY ("post_id") REFERENCES "post" ("id"));
+CREATE INDEX "poststats_post_id" ON "poststats" ("post_id");
+CREATE TABLE "settings" ("id" INTEGER NOT NULL PRIMARY KEY, "key" TEXT NOT NULL, "value" TEXT NOT NULL);
+INSERT INTO post (content, created_date) VALUES ('one two three', '2023-08-01 10:00:00');
+INSERT INTO post (content, created_date) VALUES ('', '2023-08-02 10:00:00');
+INSERT INTO poststats (post_id, words_written, words_deleted, pauses, time_writing, per_minute)
+    VALUES (1, 3, 0, 1, 70.5, '{"0": {"words_written": 0, "words_deleted": 0, "pauses": 0},
+        "1": {"words_written": 3, "words_deleted": 0, "pauses": 1}}');
+INSERT INTO settings (key, value) VALUES ('words_per_day', '500');
+INSERT INTO settings (key, value) VALUES ('words_per_day', '300');
+"""
+"""The schema created by words-tui 23.6 and earlier, with a bit of data."""
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    db_path = str(tmp_path / "legacy.db")
+    connection = sqlite3.connect(db_path)
+    connection.executescript(LEGACY_SCHEMA)
+    connection.close()
+
+    init_db(db_path)
+    yield database_proxy
+    database_proxy.close()
+
+
+def test_legacy_database_is_migrated(legacy_db):
+    assert legacy_db.pragma("user_version") == len(MIGRATIONS)
+    assert [post.word_count for post in Post.select().order_by(Post.id)] == [3, 0]
+    assert {index.name for index in legacy_db.get_indexes("post")} == {"post_created_date"}
+    assert [(setting.key, setting.value) for setting in Settings.select()] == [("words_per_day", "500")]
+    # Existing posts are backfilled into the search index:
+    assert [post.id for post in search_posts("two")] == [1]
+    assert [(day.day, day.post_count, day.word_count) for day in DailyStats.select().order_by(DailyStats.day)] == [
+        (datetime.date(2023, 8, 1), 1, 3),
+        (datetime.date(2023, 8, 2), 1, 0),
+    ]
+    # Per minute stats are moved into their own table:
+    assert "per_minute" not in {column.name for column in legacy_db.get_columns("poststats")}
+    stats = PostStats.get()
+    assert [(row.minute, row.words_written, row.pauses) for row in MinuteStats.select()] == [(1, 3, 1)]
+    assert stats.per_minute == {
+        "0": {"words_written": 0, "words_deleted": 0, "pauses": 0},
+        "1": {"words_written": 3, "words_deleted": 0, "pauses": 1},
+    }
+    # Triggers on the table still work:
+    stats.words_written = 5
+    stats.save()
+    assert DailyStats.get(DailyStats.day == datetime.date(2023, 8, 1)).words_written == 5
+
+
+def test_new_database_is_at_latest_version(db):
+    assert db.pragma("user_version") == len(MIGRATIONS)
+    assert db.pragma("journal_mode") == "wal"
+
+
+def test_migrations_are_idempotent(db):
+    for migration in MIGRATIONS:
+        migration(db)
+
+
+def test_post_summaries_skip_content(db):
+    Post.create(content="hello world", word_count=2)
+    [summary] = get_post_summaries()
+    assert summary.word_count == 2
+    assert summary.content is None
+
+
+def test_post_summaries_by_date_range(db):
+    start = datetime.datetime(2023, 8, 1, 12)
+    Post.insert_many(
+        [{"content": "", "created_date": start + datetime.timedelta(days=day)} for day in range(5)]
+    ).execute()
+
+    page = get_post_summaries(since=datetime.datetime(2023, 8, 2), until=datetime.datetime(2023, 8, 4))
+
+    assert [post.created_date.day for post in page] == [3, 2]
+    assert [post.created_date.day for post in get_post_summaries(limit=2)] == [5, 4]
+
+
+def test_post_for_day(db):
+    post = Post.create(content="hello", created_date=datetime.datetime(2023, 8, 2, 23, 59))
+
+    assert get_post_for_day(datetime.date(2023, 8, 2)) == post
+    assert get_post_for_day(datetime.date(2023, 8, 3)) is None
+    assert get_first_post_date() == datetime.date(2023, 8, 2)
+
+
+def test_iter_posts_uses_the_date_index(db, caplog):
+    with caplog.at_level(logging.DEBUG, logger="peewee"):
+        list(iter_posts(since=datetime.datetime(2023, 8, 2), until=datetime.datetime(2023, 8, 4)))
+    sql, params = caplog.records[-1].msg
+
+    plan = " ".join(row[-1] for row in db.execute_sql("EXPLAIN QUERY PLAN " + sql, params))
+    assert "INDEX post_created_date" in plan
+
+
+def test_search_query_escapes_syntax():
+    assert to_search_query('  say "hi" - or* ') == '"say" """hi""" "-" "or*"*'
+    assert to_search_query("") == ""
+
+
+def test_search_index_follows_posts(db):
+    first = Post.create(content="the quick brown fox", word_count=4)
+    second = Post.create(content="a quick brown dog, quick quick", word_count=6)
+    Post.insert_many([{"content": "brownies", "word_count": 1}]).execute()
+
+    assert [post.id for post in search_posts("quick")] == [second.id, first.id]
+    assert [post.content for post in search_posts("brown")] == [None, None, None]
+    [result] = search_posts("fox", highlight=("[", "]"))
+    assert result.snippet == "the quick brown [fox]"
+    assert search_posts("quick bro") and not search_posts("fox dog")
+
+    first.content = "a slow turtle"
+    first.save()
+    assert [post.id for post in search_posts("quick")] == [second.id]
+    assert [post.id for post in search_posts("turtle")] == [first.id]
+
+    second.delete_instance()
+    assert search_posts("dog") == []
+
+
+def test_per_minute_uses_the_latest_checkpoint(db):
+    post = Post.create(content="", word_count=0)
+    stats = PostStats.create(post=post)
+    MinuteStats.insert_many(
+        [
+            {"post": post, "minute": 0, "words_written": 5},
+            {"post": post, "minute": 1, "words_written": 8},
+            {"post": post, "minute": 0, "words_written": 6},
+        ]
+    ).execute()
+    assert {minute: checkpoint["words_written"] for minute, checkpoint in stats.per_minute.items()} == {"0": 6, "1": 8}
+    assert {index.name for index in db.get_indexes("minutestats")} == {"minutestats_post_id_minute"}
+
+
+def test_per_minute_is_loaded_once(db):
+    stats = [PostStats.create(post=Post.create(content="", word_count=0)) for _ in range(3)]
+    for minute, post_stats in enumerate(stats):
+        post_stats.add_checkpoint(minute, words_written=minute + 1, words_deleted=0, pauses=0)
+
+    stats = list(PostStats.select())
+    with count_queries() as counter:
+        load_per_minute(stats)
+        written = [post_stats.per_minute[str(minute)]["words_written"] for minute, post_stats in enumerate(stats)]
+        assert written == [1, 2, 3]
+        assert stats[0].per_minute == stats[0].per_minute
+    assert counter.count == 1
+
+    # New checkpoints show up without loading them again
+    with count_queries() as counter:
+        stats[0].add_checkpoint(1, words_written=4, words_deleted=1, pauses=1)
+        assert stats[0].per_minute["1"] == {"words_written": 4, "words_deleted": 1, "pauses": 1}
+    assert counter.count == 1
+    assert PostStats.get_by_id(stats[0].id).per_minute == stats[0].per_minute
+
+
+def test_compressed_posts_read_like_uncompressed(db):
+    old_day = datetime.date(2023, 8, 1)
+    text = "the quick brown fox jumps over the lazy dog " * 20
+    Post.create(content=text, created_date=datetime.datetime(2023, 8, 1, 9), word_count=180)
+    Post.create(content="tiny", created_date=datetime.datetime(2023, 8, 2, 9), word_count=1)
+    Post.create(content=text, created_date=datetime.datetime(2023, 9, 1, 9), word_count=180)
+
+    result = compress_posts(datetime.datetime(2023, 8, 15))
+    # Compressing "tiny" wouldn't make it smaller
+    assert result.posts == 1
+    assert result.content_bytes == len(text)
+    assert result.compressed_bytes < len(text) / 5
+    assert compress_posts(datetime.datetime(2023, 8, 15)).posts == 0
+
+    [(content, compressed_content)] = db.execute_sql(
+        "SELECT content, compressed_content FROM post WHERE compressed_content IS NOT NULL"
+    )
+    assert content == ""
+    assert len(compressed_content) == result.compressed_bytes
+    assert get_post_for_day(old_day).content == text
+    assert [post.content for post in iter_posts()] == [text, "tiny", text]
+    assert DailyStats.get(DailyStats.day == old_day).word_count == 180
+
+    # Compressed posts are still searched, and compressing them didn't index them twice
+    assert len(search_posts("lazy")) == 2
+    [result] = search_posts("tiny")
+    assert result.created_date.date() == old_day + datetime.timedelta(days=1)
+
+
+def test_compressed_posts_have_snippets(db):
+    text = "Well, the quick brown fox jumps over the lazy dog. " * 3
+    Post.create(content=text, created_date=datetime.datetime(2023, 8, 1), word_count=30)
+    Post.create(content="The quick brown fox!", created_date=datetime.datetime(2023, 8, 2), word_count=4)
+    snippets = [post.snippet for post in search_posts("quick", highlight=("[", "]"), snippet_words=5)]
+    assert compress_posts(datetime.datetime(2023, 9, 1)).posts == 1
+
+    # Like the snippets of uncompressed posts, but they may start at another match
+    assert [post.snippet for post in search_posts("quick", highlight=("[", "]"), snippet_words=5)] == snippets
+    assert [post.snippet for post in search_posts("lazy do", highlight=("[", "]"))] == [
+        "…[lazy] [dog]. Well, the quick brown fox jumps over the [lazy] [dog]…"
+    ]
+    assert [post.snippet for post in search_posts("brown fox", highlight=("[", "]"))] == [
+        "The quick [brown] [fox]!",
+        "…[brown] [fox] jumps over the lazy dog. Well, the quick [brown] [fox]…",
+    ]
+    assert make_snippet("Fox, fox", "fo", ("[", "]"), 1) == "[Fox]…"
+
+
+def test_writing_a_compressed_post_uncompresses_it(db):
+    first = Post.create(content="one fish two fish " * 20, created_date=datetime.datetime(2023, 8, 1), word_count=80)
+    second = Post.create(content="red fish blue fish " * 20, created_date=datetime.datetime(2023, 8, 2), word_count=80)
+    assert compress_posts(datetime.datetime(2023, 9, 1)).posts == 2
+
+    # Updates that only set the content, like autosaving
+    Post.update(content="green eggs", word_count=2).where(Post.id == first.id).execute()
+    # Saving a post that was loaded while compressed
+    post = get_post_for_day(datetime.date(2023, 8, 2))
+    post.content = "and ham"
+    assert post.content == "and ham"
+    post.save()
+
+    assert list(db.execute_sql("SELECT content FROM post WHERE compressed_content IS NULL ORDER BY id")) == [
+        ("green eggs",),
+        ("and ham",),
+    ]
+    assert post.content == "and ham"
+    assert [found.id for found in search_posts("eggs")] == [first.id]
+    assert [found.id for found in search_posts("ham")] == [second.id]
+    assert search_posts("fish") == []
+
+
+def test_saving_other_fields_keeps_a_post_compressed(db):
+    text = "one fish two fish " * 20
+    Post.create(content=text, created_date=datetime.datetime(2023, 8, 1), word_count=1)
+    assert compress_posts(datetime.datetime(2023, 9, 1)).posts == 1
+
+    post = get_post_for_day(datetime.date(2023, 8, 1))
+    post.word_count = 80
+    post.save()
+
+    post = get_post_for_day(datetime.date(2023, 8, 1))
+    assert post.compressed_content is not None
+    assert (post.content, post.word_count) == (text, 80)
+
+
+def test_other_clients_can_write_compressed_posts(db, tmp_path):
+    first = Post.create(content="one fish two fish " * 20, created_date=datetime.datetime(2023, 8, 1), word_count=80)
+    second = Post.create(content="red fish blue fish " * 20, created_date=datetime.datetime(2023, 8, 2), word_count=80)
+    assert compress_posts(datetime.datetime(2023, 9, 1)).posts == 2
+
+    # A connection without the app's SQL functions
+    connection = sqlite3.connect(str(tmp_path / "words-tui.db"))
+    with connection:
+        connection.execute("UPDATE post SET content = 'green eggs' WHERE id = ?", (first.id,))
+        connection.execute("DELETE FROM post WHERE id = ?", (second.id,))
+        connection.execute("INSERT INTO post (content, created_date, word_count) VALUES ('and ham', '2023-08-03', 2)")
+    connection.close()
+
+    assert search_posts("fish") == []
+    assert [post.id for post in search_posts("eggs")] == [first.id]
+    assert [post.snippet for post in search_posts("ham", highlight=("[", "]"))] == ["and [ham]"]
+    assert db.execute_sql("SELECT count(*) FROM post_search_pending").fetchone() == (0,)
+
+
+def test_worker_connection_is_closed(db):
+    with pytest.raises(ValueError), worker_connection():
+        Post.create(content="", word_count=0)
+        assert not db.is_closed()
+        raise ValueError
+    assert db.is_closed()
+    assert Post.select().count() == 1
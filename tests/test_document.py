@@ -0,0 +1,76 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+import random
+
+import pytest
+
+from words_tui.tui.document import DocumentBuffer, DocumentLines, LineList, LineRope
+
+
+def random_lines(rng: random.Random, count: int) -> list[str]:
+    words = ["a", "bb", "ččč", "", " "]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(0, 6))) for _ in range(count)]
+
+
+def test_rope_matches_list():
+    rng = random.Random(1)
+    lines = random_lines(rng, 500)
+    rope, reference = LineRope(lines), LineList(lines)
+
+    for _ in range(2000):
+        start = rng.randint(0, reference.line_count)
+        stop = rng.randint(start, min(reference.line_count, start + rng.choice([0, 1, 2, 100])))
+        new_lines = random_lines(rng, rng.choice([0, 1, 1, 2, 200]))
+        rope.replace_lines(start, stop, new_lines)
+        reference.replace_lines(start, stop, new_lines)
+
+    assert list(rope.iter_lines()) == list(reference.iter_lines())
+    assert list(rope.iter_lines(10, 50)) == list(reference.iter_lines(10, 50))
+    assert [rope.get_line(index) for index in range(rope.line_count)] == list(reference.iter_lines())
+    assert rope.word_count == reference.word_count
+    assert rope.max_line_width == reference.max_line_width == max(map(len, reference.iter_lines()))
+    for index in rng.sample(range(reference.line_count), 50):
+        line_start = reference.line_start_byte(index)
+        assert rope.line_start_byte(index) == line_start
+        assert rope.line_at_byte(line_start) == reference.line_at_byte(line_start) == (index, line_start)
+
+
+def test_rope_stays_balanced():
+    rope = LineRope(["line"] * 10_000)
+    for index in range(5_000):
+        rope.replace_lines(index, index + 1, ["edited", "line"])
+    assert rope.line_count == 15_000
+    assert rope._root.height < 20
+
+
+def test_snapshot_is_immutable():
+    rope = LineRope(["one", "two"])
+    snapshot = rope.snapshot()
+    rope.replace_lines(0, 1, ["three", "four"])
+
+    assert snapshot.text == "one\ntwo"
+    assert rope.snapshot().text == "three\nfour\ntwo"
+
+
+def test_document_lines_view():
+    lines = DocumentLines(LineRope(["one", "two", "three"]))
+    assert len(lines) == 3
+    assert lines[-1] == "three"
+    assert lines[:2] == ["one", "two"]
+    assert lines == ["one", "two", "three"]
+    with pytest.raises(TypeError):
+        hash(lines)
+
+
+def test_buffers_implement_the_whole_interface():
+    with pytest.raises(TypeError):
+        DocumentBuffer()  # type: ignore[abstract]
+
+    class Incomplete(DocumentBuffer):
+        def get_line(self, index: int) -> str:
+            return ""
+
+    with pytest.raises(TypeError):
+        Incomplete()  # type: ignore[abstract]
+    assert LineList(["one"]).line_count == LineRope(["one"]).line_count == 1
@@ -0,0 +1,63 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+import datetime
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from words_tui.cli import words_tui
+from words_tui.tui.db import Post
+
+
+@pytest.fixture
+def posts(db):
+    start = datetime.datetime(2023, 8, 1, 10)
+    Post.insert_many(
+        [
+            {"content": "first ž", "created_date": start, "word_count": 2},
+            {"content": "second", "created_date": start + datetime.timedelta(days=1), "word_count": 1},
+            {"content": "again", "created_date": start + datetime.timedelta(days=1, hours=2), "word_count": 1},
+            {"content": "third", "created_date": start + datetime.timedelta(days=2), "word_count": 1},
+        ]
+    ).execute()
+    return db.database
+
+
+def export(db_path: str, *args: str) -> str:
+    result = CliRunner().invoke(words_tui, ["--db", db_path, "export", *args], catch_exceptions=False)
+    assert result.exit_code == 0
+    return result.stdout
+
+
+def test_export_ndjson(posts):
+    lines = export(posts, "ndjson").splitlines()
+    exported = [json.loads(line) for line in lines]
+    assert [post["content"] for post in exported] == ["first ž", "second", "again", "third"]
+    assert exported[0]["created_date"] == "2023-08-01T10:00:00"
+    assert exported[0]["word_count"] == 2
+
+
+def test_export_date_range(posts):
+    exported = [
+        json.loads(line)
+        for line in export(posts, "ndjson", "--since", "2023-08-02", "--until", "2023-08-02").splitlines()
+    ]
+    assert [post["content"] for post in exported] == ["second", "again"]
+
+
+def test_export_markdown(posts):
+    assert export(posts, "markdown", "--until", "2023-08-02") == (
+        "# 2023-08-01\n\nfirst ž\n\n# 2023-08-02\n\nsecond\n\n# 2023-08-02\n\nagain\n"
+    )
+
+
+def test_export_markdown_days(posts, tmp_path):
+    export(posts, "markdown-days", str(tmp_path / "days"))
+    assert sorted(path.name for path in (tmp_path / "days").iterdir()) == [
+        "2023-08-01.md",
+        "2023-08-02.md",
+        "2023-08-03.md",
+    ]
+    assert (tmp_path / "days" / "2023-08-02.md").read_text() == "# 2023-08-02\n\nsecond\n\n# 2023-08-02\n\nagain\n"
@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+import datetime
+import sqlite3
+
+from click.testing import CliRunner
+
+from words_tui.cli import importer, words_tui
+from words_tui.tui.db import Post, get_post_for_day
+
+
+def import_journal(db_path: str, *args: str) -> str:
+    result = CliRunner().invoke(words_tui, ["--db", db_path, "import", *args], catch_exceptions=False)
+    assert result.exit_code == 0
+    return result.stdout
+
+
+def write_journal(directory, files: dict):
+    for name, content in files.items():
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+    return str(directory)
+
+
+def test_parse_day():
+    assert importer.parse_day("2023-08-01.md") == datetime.date(2023, 8, 1)
+    assert importer.parse_day("2023/08/02.txt") == datetime.date(2023, 8, 2)
+    assert importer.parse_day("archive-2020/journal_20230803.md") == datetime.date(2023, 8, 3)
+    assert importer.parse_day("2023-13-01.md") is None
+    assert importer.parse_day("notes.md") is None
+
+
+def test_import(db, tmp_path):
+    journal = write_journal(
+        tmp_path / "journal",
+        {
+            "2023-08-01.md": "# 2023-08-01\n\nfirst ž day\n",
+            "2023/08/02.txt": "second",
+            "2023-08-02-evening.md": "and more",
+            "notes.md": "no date",
+            "2023-08-03.png": "not a journal",
+        },
+    )
+    assert import_journal(db.database, journal).splitlines() == [
+        "Imported 2 new posts from 4 files",
+        "Skipped notes.md, there's no date in its path",
+    ]
+
+    first = get_post_for_day(datetime.date(2023, 8, 1))
+    assert first.content == "first ž day"
+    assert first.word_count == 3
+    assert first.created_date == datetime.datetime(2023, 8, 1)
+    second = get_post_for_day(datetime.date(2023, 8, 2))
+    # Files of the same day are combined in path order:
+    assert second.content == "second\n\nand more"
+    assert second.word_count == 3
+
+
+def test_import_skips_or_merges_existing_days(db, tmp_path):
+    Post.create(content="already here", created_date=datetime.datetime(2023, 8, 1, 9), word_count=2)
+    journal = write_journal(tmp_path / "journal", {"2023-08-01.md": "imported", "2023-08-02.md": "new"})
+
+    assert "Would import 1 new posts from 2 files" in import_journal(db.database, journal, "--dry-run")
+    assert Post.select().count() == 1
+
+    output = import_journal(db.database, journal)
+    assert "Skipped 1 days that already have a post (use --existing merge)" in output
+    assert get_post_for_day(datetime.date(2023, 8, 1)).content == "already here"
+
+    output = import_journal(db.database, journal, "--existing", "merge")
+    assert "Imported 2 days into existing posts" in output
+    merged = get_post_for_day(datetime.date(2023, 8, 1))
+    assert merged.content == "already here\n\nimported"
+    assert merged.word_count == 3
+    assert get_post_for_day(datetime.date(2023, 8, 2)).content == "new\n\nnew"
+    assert Post.select().count() == 2
+
+
+def test_dry_run_does_not_touch_the_database(tmp_path):
+    journal = write_journal(tmp_path / "journal", {"2023-08-01.md": "imported"})
+    db_path = tmp_path / "words-tui.db"
+
+    assert "Would import 1 new posts from 1 files" in import_journal(str(db_path), journal, "--dry-run")
+    assert not db_path.exists()
+
+    connection = sqlite3.connect(db_path)
+    connection.execute("CREATE TABLE post (id INTEGER NOT NULL PRIMARY KEY, content TEXT, created_date DATETIME)")
+    connection.execute("INSERT INTO post (content, created_date) VALUES ('here', '2023-08-01 09:00:00')")
+    connection.commit()
+    assert "Would import 0 new posts from 1 files" in import_journal(str(db_path), journal, "--dry-run")
+    assert connection.execute("PRAGMA user_version").fetchone() == (0,)
+    assert [row[0] for row in connection.execute("SELECT name FROM sqlite_master")] == ["post"]
+    connection.close()
+
+
+def test_import_many_files_in_processes(db, tmp_path):
+    start = datetime.date(2000, 1, 1)
+    journal = write_journal(
+        tmp_path / "journal",
+        {f"{start + datetime.timedelta(days=day)}.md": f"day {day}" for day in range(1000)},
+    )
+    assert import_journal(db.database, journal, "--jobs", "2").startswith("Imported 1000 new posts")
+    assert Post.select().count() == 1000
+    assert get_post_for_day(start + datetime.timedelta(days=999)).content == "day 999"
@@ -0,0 +1,65 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+import random
+
+from words_tui.tui import profiler as profiler_module
+from words_tui.tui.profiler import LatencyHistogram, Profiler, timed, trace
+from words_tui.tui.text_editor import TextEditor
+
+
+def test_histogram_percentiles_are_close():
+    rng = random.Random(1)
+    latencies = sorted(int(rng.lognormvariate(12, 1.5)) for _ in range(10_000))
+    histogram = LatencyHistogram()
+    for latency in latencies:
+        histogram.record(latency)
+
+    for percent in (50, 95, 99):
+        expected = latencies[int(percent / 100 * len(latencies)) - 1]
+        assert abs(histogram.percentile(percent) - expected) <= expected / 16 + 1
+    assert histogram.max == latencies[-1]
+    assert len(histogram.counts) < 200
+
+
+def test_timed_only_records_while_enabled(monkeypatch):
+    profiler = Profiler()
+    monkeypatch.setattr(profiler_module, "profiler", profiler)
+
+    @timed("stage")
+    def stage(value):
+        return value * 2
+
+    assert stage(2) == 4
+    assert profiler.stages == {}
+
+    profiler.enable()
+    assert stage(3) == 6
+    assert profiler.summary()["stage"]["count"] == 1
+
+
+def test_edits_are_profiled(monkeypatch):
+    profiler = Profiler()
+    profiler.enable()
+    monkeypatch.setattr(profiler_module, "profiler", profiler)
+    editor = TextEditor()
+    editor.load_text("hello")
+    editor.insert_text(" world", (0, 5))
+    assert {"edit", "refresh_size"} <= set(profiler.stages)
+
+
+def test_trace_is_lazy(monkeypatch):
+    formatted = []
+
+    class Edit:
+        def __repr__(self):
+            formatted.append(self)
+            return "Edit()"
+
+    monkeypatch.setattr(profiler_module.profiler, "tracing", False)
+    trace("performing edit {!r}", Edit())
+    assert formatted == []
+
+    monkeypatch.setattr(profiler_module.profiler, "tracing", True)
+    trace("performing edit {!r}", Edit())
+    assert len(formatted) == 1
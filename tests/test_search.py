@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+import asyncio
+import datetime
+
+from click.testing import CliRunner
+from textual.app import App
+from textual.widgets import Input, OptionList
+
+from words_tui.cli import words_tui
+from words_tui.tui.app import WordsTui
+from words_tui.tui.db import Post
+from words_tui.tui.search import SearchScreen, highlight_snippet
+
+
+def add_posts():
+    Post.insert_many(
+        [
+            {"content": "Went to the market today", "created_date": datetime.datetime(2023, 8, 1, 10)},
+            {"content": "Nothing much happened", "created_date": datetime.datetime(2023, 8, 2, 10)},
+            {"content": "The market was closed\nso I went home", "created_date": datetime.datetime(2023, 8, 3, 10)},
+        ]
+    ).execute()
+
+
+def test_highlight_snippet():
+    text = highlight_snippet("a \x02match\x03 and\n\x02another\x03!")
+    assert text.plain == "a match and another!"
+    assert [text.plain[span.start : span.end] for span in text.spans] == ["match", "another"]
+
+
+def test_search_cli(db):
+    add_posts()
+    result = CliRunner().invoke(words_tui, ["--db", db.database, "search", "market", "went"], catch_exceptions=False)
+    assert result.exit_code == 0
+    assert sorted(result.stdout.splitlines()) == [
+        "2023-08-01  Went to the market today",
+        "2023-08-03  The market was closed so I went home",
+    ]
+
+    result = CliRunner().invoke(words_tui, ["--db", db.database, "search", "missing"], catch_exceptions=False)
+    assert result.stdout == ""
+    assert result.stderr == "No posts found\n"
+
+
+def test_search_screen(db):
+    add_posts()
+    searches = []
+
+    class SearchApp(App):
+        day = None
+
+        def on_mount(self):
+            def opened(day):
+                self.day = day
+
+            self.push_screen(SearchScreen(), opened)
+
+    async def run():
+        app = SearchApp()
+        async with app.run_test() as pilot:
+            screen = app.screen
+            original_search = screen.search
+            screen.search = lambda text: searches.append(text) or original_search(text)
+            await pilot.press(*"nothing")
+            for _ in range(50):
+                await pilot.pause(0.02)
+                if screen.results:
+                    break
+            # Typing quickly only searches once
+            assert searches == ["nothing"]
+            assert screen.query_one(Input).value == "nothing"
+            assert screen.query_one(OptionList).option_count == 1
+            await pilot.press("enter")
+            assert app.day == datetime.date(2023, 8, 2)
+
+    asyncio.run(run())
+
+
+def test_ctrl_f_opens_search_from_the_editor(db):
+    add_posts()
+
+    async def run():
+        app = WordsTui()
+        async with app.run_test() as pilot:
+            await pilot.pause()
+            app.editor.load_text("one two three")
+            assert app.focused is app.editor
+            await pilot.press("ctrl+f")
+            assert isinstance(app.screen, SearchScreen)
+            assert app.editor.text == "one two three"
+
+            # Pressing it again in the search doesn't open another one
+            await pilot.press("ctrl+f")
+            assert len(app.screen_stack) == 2
+            await pilot.press("escape")
+            assert app.screen_stack == [app.screen] and app.focused is app.editor
+
+    asyncio.run(run())
@@ -0,0 +1,110 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+import asyncio
+import datetime
+import random
+
+from textual.app import App
+from textual.widgets import Static
+
+from words_tui.tui.db import DailyStats, Post, PostStats, add_daily_stats
+from words_tui.tui.stats import get_statistics
+from words_tui.tui.stats_screen import StatsScreen
+
+TODAY = datetime.date(2023, 8, 10)
+
+
+def add_post(day: datetime.date, words: int, **stats) -> Post:
+    post = Post.create(
+        content="word " * words, word_count=words, created_date=datetime.datetime.combine(day, datetime.time(10))
+    )
+    if stats:
+        PostStats.create(post=post, **stats)
+    return post
+
+
+def daily_stats() -> list[tuple]:
+    return [
+        (row.day, row.post_count, row.word_count, row.words_written, row.words_deleted, row.pauses, row.time_writing)
+        for row in DailyStats.select().order_by(DailyStats.day)
+    ]
+
+
+def test_daily_stats_are_updated_on_save(db):
+    rng = random.Random(5)
+    posts = []
+    for _ in range(200):
+        action = rng.random()
+        if action < 0.3 or not posts:
+            day = TODAY - datetime.timedelta(days=rng.randrange(10))
+            posts.append(add_post(day, rng.randrange(500)))
+        elif action < 0.6:
+            post = rng.choice(posts)
+            post.word_count = rng.randrange(500)
+            post.save()
+        elif action < 0.9:
+            post = rng.choice(posts)
+            stats, _ = PostStats.get_or_create(post=post)
+            stats.words_written += rng.randrange(20)
+            stats.words_deleted += rng.randrange(5)
+            stats.pauses += 1
+            stats.time_writing += 1.5
+            stats.save()
+        else:
+            post = posts.pop(rng.randrange(len(posts)))
+            PostStats.delete().where(PostStats.post == post).execute()
+            post.delete_instance()
+
+    incremental = daily_stats()
+    add_daily_stats(db)
+    assert incremental == daily_stats()
+
+
+def test_statistics(db):
+    goal = 100
+    for days_ago, words in [(9, 150), (8, 120), (7, 10), (5, 100), (4, 300), (3, 200), (1, 100), (0, 20)]:
+        add_post(TODAY - datetime.timedelta(days=days_ago), words, words_written=words, time_writing=60)
+
+    statistics = get_statistics(goal, today=TODAY)
+    assert statistics.first_day == TODAY - datetime.timedelta(days=9)
+    assert statistics.days == 10
+    assert statistics.days_written == 8
+    assert statistics.total_words == 1000
+    assert statistics.average_words == 125
+    assert round(statistics.average_wpm, 2) == 125
+    assert statistics.best_day == TODAY - datetime.timedelta(days=4)
+    assert statistics.goal_days == 6
+    assert statistics.goal_hit_rate == 0.6
+    assert statistics.longest_streak == 3
+    # Today doesn't reach the goal yet, but yesterday did:
+    assert statistics.current_streak == 1
+    assert get_statistics(goal, today=TODAY + datetime.timedelta(days=1)).current_streak == 0
+
+
+def test_statistics_without_posts(db):
+    statistics = get_statistics(100, today=TODAY)
+    assert statistics.days == 0
+    assert statistics.average_wpm == 0
+    assert statistics.goal_hit_rate == 0
+
+
+def test_stats_screen(db):
+    add_post(TODAY, 300, words_written=300, time_writing=600)
+
+    class StatsApp(App):
+        def on_mount(self):
+            self.push_screen(StatsScreen(300))
+
+    async def run():
+        app = StatsApp()
+        async with app.run_test() as pilot:
+            for _ in range(50):
+                await pilot.pause(0.02)
+                if app.screen.query_one("#stats_table", Static).renderable != "Loading…":
+                    break
+            table = app.screen.query_one("#stats_table", Static).renderable
+            assert "Average WPM" in table.columns[0]._cells
+            assert "30.00" in table.columns[1]._cells
+
+    asyncio.run(run())
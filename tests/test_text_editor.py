@@ -0,0 +1,451 @@
+# SPDX-FileCopyrightText: 2023-present Anže Pečar <anze@pecar.me>
+#
+# SPDX-License-Identifier: MIT
+import asyncio
+import random
+
+from textual import events
+from textual.app import App
+
+from words_tui.tui import document, text_editor, wrap
+from words_tui.tui.document import LineList
+from words_tui.tui.text_editor import Selection, TextEditor, _merge_row_ranges, _merge_tree_edits
+
+
+def make_editor(text: str) -> TextEditor:
+    editor = TextEditor()
+    editor.load_text(text)
+    return editor
+
+
+def assert_word_count_matches(editor: TextEditor):
+    assert editor.word_count == len("\n".join(editor.document_lines).split())
+
+
+def test_word_count_on_load():
+    editor = make_editor("hello world\n\nthree more words")
+    assert editor.word_count == 5
+
+
+def test_word_count_after_inserts():
+    editor = make_editor("hello world")
+    editor.insert_text(" again", (0, 11))
+    assert editor.word_count == 3
+    editor.insert_text("\nnew line here\n", (0, 5))
+    assert_word_count_matches(editor)
+    editor.insert_text_range("X", (0, 0), (1, 3))
+    assert_word_count_matches(editor)
+
+
+def test_word_count_after_deletes():
+    editor = make_editor("one two\nthree four\nfive six")
+    editor.delete_range((0, 3), (0, 7))
+    assert editor.word_count == 5
+    editor.delete_range((0, 1), (2, 2))
+    assert_word_count_matches(editor)
+    editor.delete_range((0, 0), (0, len(editor.document_lines[0])))
+    assert editor.word_count == 0
+
+
+def test_editor_with_list_buffer():
+    editor = TextEditor(buffer_class=LineList)
+    editor.load_text("one two\nthree")
+    editor.insert_text(" four", (1, 5))
+    editor.delete_range((0, 3), (1, 0))
+    assert editor.text == "onethree four"
+    assert editor.word_count == 2
+
+
+def test_byte_offsets_are_utf8():
+    editor = make_editor("žaba\n\nčaj ☕")
+    assert editor._position_to_byte_offset((0, 1)) == 2
+    assert editor._position_to_byte_offset((2, 0)) == 7
+    assert editor._position_to_byte_offset((2, 5)) == 15
+    assert editor._position_to_point((2, 5)) == (2, 8)
+    assert editor._byte_offset_to_position(15) == (2, 5)
+    assert editor._byte_offset_to_position(2) == (0, 1)
+
+
+def test_read_callable_returns_lines():
+    editor = make_editor("žaba\nčaj")
+    assert editor._read_callable(0, (0, 0)) == "žaba\nčaj\n".encode()
+    assert editor._read_callable(2, (0, 2)) == "aba\nčaj\n".encode()
+    assert editor._read_callable(6, (1, 0)) == "čaj\n".encode()
+    assert editor._read_callable(11, (2, 0)) is None
+
+
+def test_read_callable_returns_chunks(monkeypatch):
+    monkeypatch.setattr(text_editor, "READ_CHUNK_SIZE", 10)
+    editor = make_editor("one\ntwo\nthree\nfour\nfive")
+    assert editor._read_callable(0, (0, 0)) == b"one\ntwo\nthree\n"
+    assert editor._read_callable(14, (3, 0)) == b"four\nfive\n"
+
+
+def iter_leaves(node):
+    if isinstance(node, document._Leaf):
+        yield node
+    else:
+        yield from iter_leaves(node.left)
+        yield from iter_leaves(node.right)
+
+
+def test_inserts_only_measure_the_lines_they_change(monkeypatch):
+    measured = []
+    monkeypatch.setattr(document, "cell_len", lambda line: measured.append(line) or len(line))
+    line_bytes = document._line_bytes
+    monkeypatch.setattr(document, "_line_bytes", lambda line: measured.append(line) or line_bytes(line))
+    paragraph = "All work and no play makes Jack a dull boy. " * 5
+    editor = make_editor("\n".join([paragraph] * 50_000))
+    assert editor._buffer.max_line_width == len(paragraph)
+    assert editor._buffer.line_start_byte(50_000) == (len(paragraph) + 1) * 50_000
+    old_leaves = set(iter_leaves(editor._buffer._root))
+
+    measured.clear()
+    for column in range(100):
+        editor.insert_text("a", (25_000, column))
+        assert editor._buffer.word_count
+    assert editor._buffer.word_count == sum(len(line.split()) for line in editor._buffer.iter_lines())
+    assert editor._buffer.max_line_width == len(paragraph) + 100
+    assert editor._buffer.line_start_byte(50_000) == (len(paragraph) + 1) * 50_000 + 100
+    # Each edited line was measured once and its bytes counted once
+    assert len(measured) == 200
+    # Only the leaf with the edited line was copied (and maybe split), the rest are shared
+    new_leaves = set(iter_leaves(editor._buffer._root)) - old_leaves
+    assert len(new_leaves) <= 2
+    assert sum(leaf.line_count for leaf in new_leaves) <= document.LEAF_MAX_LINES
+    assert all(leaf._words is not None for leaf in new_leaves)
+
+
+def test_merge_row_ranges():
+    assert _merge_row_ranges([(5, 6), (0, 1), (2, 2), (8, 10), (9, 9)]) == [(0, 2), (5, 6), (8, 10)]
+
+
+def test_large_paste_is_one_change(monkeypatch):
+    paragraph = "All work and no play makes Jack a dull boy. " * 5 + "\n"
+    pasted_text = paragraph * (text_editor.LARGE_EDIT_SIZE * 5 // len(paragraph))
+    splices = []
+
+    class EditorApp(App):
+        changes = 0
+
+        def compose(self):
+            yield make_editor("")
+
+        def on_text_editor_changed(self, _: TextEditor.Changed):
+            self.changes += 1
+
+    async def run():
+        app = EditorApp()
+        async with app.run_test() as pilot:
+            editor = app.query_one(TextEditor)
+            splice_text = editor._splice_text
+            monkeypatch.setattr(editor, "_splice_text", lambda *args: splices.append(args) or splice_text(*args))
+            await pilot.pause()
+            editor.post_message(events.Paste(pasted_text))
+            await pilot.press("x")
+
+            assert editor.text == pasted_text + "x"
+            assert len(splices) == len(list(text_editor._iter_chunks(pasted_text, text_editor.LARGE_EDIT_SIZE))) + 1
+            assert len(splices) > 5
+            assert app.changes == 2
+            editor.undo()
+            assert editor.text == pasted_text
+            editor.undo()
+            assert editor.text == ""
+
+    asyncio.run(run())
+
+
+def test_large_inserts_are_chunked():
+    text = "".join(f"line {row}\n" for row in range(1000))
+    editor = make_editor("before after")
+    editor.insert_text_range(text * 20, (0, 7), (0, 7))
+    assert editor.text == "before " + text * 20 + "after"
+    assert editor.selection.end == (20_000, 0)
+    assert list(text_editor._iter_chunks("ab\ncd\nef", 2)) == ["ab\n", "cd\n", "ef"]
+
+
+def test_rendered_lines_are_cached_until_they_change():
+    class EditorApp(App):
+        def compose(self):
+            yield make_editor("one\ntwo\nthree")
+
+    async def run():
+        app = EditorApp()
+        async with app.run_test() as pilot:
+            editor = app.query_one(TextEditor)
+            await pilot.pause()
+            first, second = editor.render_line(0), editor.render_line(1)
+            assert editor.render_line(0) is first
+            assert editor.render_line(1) is second
+
+            editor.insert_text("!", (1, 3))
+            # The cursor moved to the edited row, so the first row is different now too:
+            assert editor.render_line(0) is not first
+            assert editor.render_line(1) is not second
+            assert "two!" in editor.render_line(1).text
+
+            third = editor.render_line(2)
+            editor.notify_style_update()
+            assert editor.render_line(2) is third
+            # Switching themes changes the colors of the cursor, the gutter etc.
+            app.dark = not app.dark
+            await pilot.pause()
+            assert editor.render_line(2) is not third
+
+    asyncio.run(run())
+
+
+def type_text(editor: TextEditor, text: str):
+    for character in text:
+        editor.insert_text_range(character, *editor.selection)
+
+
+def test_undo_and_redo_restore_the_document():
+    rng = random.Random(7)
+    editor = make_editor("one two\nthree four\nfive six")
+    versions = [editor.text]
+    for _ in range(100):
+        lines = editor.document_lines
+        start_row = rng.randrange(len(lines))
+        end_row = rng.randrange(start_row, len(lines))
+        start = (start_row, rng.randint(0, len(lines[start_row])))
+        end = (end_row, rng.randint(0, len(lines[end_row])))
+        if rng.random() < 0.5:
+            editor.delete_range(*sorted([start, end]))
+        else:
+            editor.insert_text_range(rng.choice(["x", "new\nlines", "ž"]), *sorted([start, end]))
+        # Separate undo steps for every edit, edits that don't change anything aren't recorded:
+        editor._open_group = None
+        if len(editor._undo_stack) == len(versions):
+            versions.append(editor.text)
+
+    for version in reversed(versions[:-1]):
+        editor.undo()
+        assert editor.text == version
+    for version in versions[1:]:
+        editor.redo()
+        assert editor.text == version
+
+
+def test_typing_is_undone_a_word_at_a_time():
+    editor = make_editor("")
+    type_text(editor, "hello there world")
+    editor.undo()
+    assert editor.text == "hello there "
+    editor.undo()
+    assert editor.text == "hello "
+    editor.redo()
+    assert editor.text == "hello there "
+    assert editor.selection.end == (0, 12)
+
+    editor.action_delete_left()
+    editor.action_delete_left()
+    # "world" can't be redone after a new edit:
+    assert len(editor._redo_stack) == 0
+    editor.undo()
+    assert editor.text == "hello there "
+
+
+def test_pause_starts_a_new_undo_step(monkeypatch):
+    now = 0.0
+    monkeypatch.setattr(text_editor, "monotonic", lambda: now)
+    editor = make_editor("")
+    type_text(editor, "hel")
+    now += text_editor.UNDO_PAUSE + 1
+    type_text(editor, "lo")
+    editor.undo()
+    assert editor.text == "hel"
+
+
+def test_undo_history_is_bounded_in_bytes(monkeypatch):
+    monkeypatch.setattr(text_editor, "UNDO_HISTORY_SIZE", 10_000)
+    editor = make_editor("")
+    for _ in range(1000):
+        editor.insert_text("word\n", editor.selection.end)
+    assert editor._undo_size <= 10_000
+    assert len(editor._undo_stack) < 1000
+
+
+def point_at(text: str, byte: int) -> tuple[int, int]:
+    before = text[:byte]
+    return before.count("\n"), byte - (before.rfind("\n") + 1)
+
+
+def test_merged_tree_edits_cover_all_edits():
+    rng = random.Random(3)
+    for _ in range(500):
+        original = text = "".join(rng.choice("ab\n") for _ in range(rng.randint(0, 20)))
+        merged = None
+        for _ in range(rng.randint(1, 5)):
+            start = rng.randint(0, len(text))
+            old_end = rng.randint(start, len(text))
+            inserted = "".join(rng.choice("cd\n") for _ in range(rng.randint(0, 5)))
+            tree_edit = {
+                "start_byte": start,
+                "old_end_byte": old_end,
+                "new_end_byte": start + len(inserted),
+                "start_point": point_at(text, start),
+                "old_end_point": point_at(text, old_end),
+            }
+            text = text[:start] + inserted + text[old_end:]
+            tree_edit["new_end_point"] = point_at(text, start + len(inserted))
+            merged = _merge_tree_edits(merged, tree_edit)
+
+        assert original[: merged["start_byte"]] == text[: merged["start_byte"]]
+        assert original[merged["old_end_byte"] :] == text[merged["new_end_byte"] :]
+        assert merged["start_point"] == point_at(original, merged["start_byte"])
+        assert merged["old_end_point"] == point_at(original, merged["old_end_byte"])
+        assert merged["new_end_point"] == point_at(text, merged["new_end_byte"])
+
+
+def test_batch_is_a_single_change():
+    editor = make_editor("one two one")
+    refreshes = []
+    editor.watch__document_size = refreshes.append
+    with editor.batch():
+        editor.insert_text_range("three", (0, 8), (0, 11))
+        editor.insert_text_range("three", (0, 0), (0, 3))
+        editor.insert_text("\n", (0, 5))
+    assert editor.text == "three\n two three"
+    assert len(refreshes) == 1
+    assert editor.word_count == 3
+
+    editor.undo()
+    assert editor.text == "one two one"
+    editor.redo()
+    assert editor.text == "three\n two three"
+
+
+def make_wrapping_app(text: str) -> App:
+    class EditorApp(App):
+        def compose(self):
+            editor = TextEditor()
+            editor.show_line_numbers = False
+            editor.soft_wrap = True
+            editor.load_text(text)
+            yield editor
+
+    return EditorApp()
+
+
+def test_soft_wrap_renders_visual_rows():
+    app = make_wrapping_app(" ".join(["word"] * 30) + "\nshort")
+
+    async def run():
+        async with app.run_test(size=(40, 10)) as pilot:
+            editor = app.query_one(TextEditor)
+            await pilot.pause()
+            # 40 cells, without the scrollbar and a cell for the cursor at the end of a row
+            assert editor._wrap.width == 37
+            assert editor.virtual_size.height == 6
+            assert [editor.render_line(y).text.rstrip() for y in range(6)] == [
+                "word word word word word word word",
+                "word word word word word word word",
+                "word word word word word word word",
+                "word word word word word word word",
+                "word word",
+                "short",
+            ]
+
+    asyncio.run(run())
+
+
+def test_soft_wrap_moves_the_cursor_by_visual_rows():
+    app = make_wrapping_app(" ".join(["word"] * 30) + "\nshort\n" + "\n".join(["line"] * 50))
+
+    async def run():
+        async with app.run_test(size=(40, 10)) as pilot:
+            editor = app.query_one(TextEditor)
+            await pilot.pause()
+            await pilot.press("right", "right", "down")
+            assert editor.selection.end == (0, 37)
+            await pilot.press("down", "down")
+            assert editor.selection.end == (0, 107)
+            await pilot.press("down", "down")
+            assert editor.selection.end == (1, 2)
+            await pilot.press("up")
+            assert editor.selection.end == (0, 142)
+            await pilot.press("up")
+            assert editor.selection.end == (0, 107)
+
+            # Scrolling follows the visual row of the cursor
+            for _ in range(20):
+                await pilot.press("down")
+            assert editor.selection.end == (19, 2)
+            assert editor.scroll_y == 23 - 9
+
+    asyncio.run(run())
+
+
+def test_soft_wrap_only_rewraps_edited_lines(monkeypatch):
+    app = make_wrapping_app("\n".join(f"{row} " + "lorem ipsum dolor " * 8 for row in range(200)))
+    wrapped = []
+    wrap_offsets = wrap.wrap_offsets
+
+    def counting_wrap_offsets(line: str, width: int) -> tuple[int, ...]:
+        wrapped.append(line)
+        return wrap_offsets(line, width)
+
+    async def run():
+        async with app.run_test(size=(80, 10)) as pilot:
+            editor = app.query_one(TextEditor)
+            await pilot.pause()
+            monkeypatch.setattr(wrap, "wrap_offsets", counting_wrap_offsets)
+            editor.selection = Selection.cursor((100, 0))
+            editor.insert_text("new ", (100, 0))
+            editor.insert_text("\n", (100, 4))
+            # The second half of the split line is the same as the line before the edits, it's still cached
+            assert wrapped == ["new 100 " + "lorem ipsum dolor " * 8, "new "]
+            assert editor._wrap.visual_row_count == editor._wrap.line_count * 2 - 1
+
+    asyncio.run(run())
+
+
+def test_soft_wrap_rewraps_lazily_after_a_resize(monkeypatch):
+    monkeypatch.setattr(text_editor, "REWRAP_CHUNK_LINES", 100)
+    app = make_wrapping_app("\n".join(f"{row} " + "lorem ipsum dolor " * 8 for row in range(2000)))
+
+    async def run():
+        async with app.run_test(size=(80, 10)) as pilot:
+            editor = app.query_one(TextEditor)
+            await pilot.pause()
+            editor.scroll_to(y=editor._wrap.visual_row(1000), animate=False)
+            await pilot.pause()
+            assert editor._wrap.locate(int(editor.scroll_y)) == (1000, 0)
+
+            editor.styles.width = 50
+            await pilot.pause()
+            assert editor._wrap.width == 47
+            # The line at the top stays at the top while the rest of the document is rewrapped
+            while editor._wrap.pending:
+                assert editor._wrap.locate(int(editor.scroll_y)) == (1000, 0)
+                await pilot.pause()
+            assert editor._wrap.locate(int(editor.scroll_y)) == (1000, 0)
+            assert editor.virtual_size.height == 2000 * 4
+
+    asyncio.run(run())
+
+
+def test_soft_wrap_is_up_to_date_before_rendering(monkeypatch):
+    app = make_wrapping_app("\n".join("lorem ipsum dolor " * 8 for _ in range(50)))
+    render_wrapped_line = TextEditor._render_wrapped_line
+    stale = []
+
+    def checking_render_wrapped_line(self, widget_y: int):
+        if self._wrap.width != self._wrap_width:
+            stale.append((self._wrap.width, self.size.width))
+        return render_wrapped_line(self, widget_y)
+
+    monkeypatch.setattr(TextEditor, "_render_wrapped_line", checking_render_wrapped_line)
+
+    async def run():
+        async with app.run_test(size=(80, 10)) as pilot:
+            editor = app.query_one(TextEditor)
+            await pilot.pause()
+            editor.styles.width = 50
+            await pilot.pause()
+            assert editor._wrap.width == 47
+            assert stale == []
+
+    asyncio.run(run())
@@ -1,2 +1,46 @@
+from words_tui.tui import app
+from words_tui.tui.app import WordsPerMinuteCounter
+from words_tui.tui.db import MinuteStats, Post, get_settings
+
+
 def test_tui():
     assert True
+
+
+def test_checkpoints_are_inserted_once_a_minute(db, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(app.time, "monotonic", lambda: now)
+    post = Post.create(content="", word_count=0)
+    counter = WordsPerMinuteCounter(post, words_per_day=get_settings())
+
+    for second in range(150):
+        now += 1
+        counter.type_character(second // 5)
+        counter.update_words()
+    # Minutes 0 and 1 are done, minute 2 is still being written:
+    assert [checkpoint.minute for checkpoint in MinuteStats.select()] == [0, 1]
+
+    now += 5
+    counter.update_words()
+    assert [checkpoint.minute for checkpoint in MinuteStats.select()] == [0, 1, 2]
+    assert counter.stats.per_minute["2"]["words_written"] == 29
+
+
+def test_stats_are_saved_on_a_schedule(db, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(app.time, "monotonic", lambda: now)
+    post = Post.create(content="", word_count=0)
+    counter = WordsPerMinuteCounter(post, words_per_day=get_settings())
+    saves = []
+    monkeypatch.setattr(counter.stats, "save", lambda: saves.append(now))
+
+    for second in range(30):
+        now += 1
+        counter.type_character(second)
+        counter.update_words()
+    assert len(saves) == 3
+
+    now += 5
+    counter.update_words()
+    assert len(saves) == 4
+    assert "Paused" in counter.get_wpm()
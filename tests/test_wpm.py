@@ -0,0 +1,53 @@
+import random
+
+from words_tui.tui.wpm import KeystrokeRing
+
+
+def test_rolling_windows_match_recomputing():
+    rng = random.Random(11)
+    windows = (60, 300, 900)
+    ring = KeystrokeRing(windows)
+    changes = []
+    now = 0.0
+    for _ in range(1500):
+        now += rng.choice([0.1, 0.3, 1.0, 5.0, 120.0])
+        delta = rng.choice([0, 0, 1, 1, 2, -1])
+        ring.add(now, delta)
+        changes.append((int(now), delta))
+
+        written = [sum(d for second, d in changes if d > 0 and second > int(now) - window) for window in windows]
+        deleted = [sum(-d for second, d in changes if d < 0 and second > int(now) - window) for window in windows]
+        assert ring.words_written(now) == written
+        assert ring.words_deleted(now) == deleted
+
+
+def test_memory_is_fixed():
+    ring = KeystrokeRing((2, 4))
+    for second in range(100):
+        ring.add(second, 1)
+    assert len(ring._seconds) == 4
+    assert ring.words_written(99.5) == [2, 4]
+    assert ring.words_written(1000) == [0, 0]
+
+
+def test_rates_pauses_and_bursts():
+    ring = KeystrokeRing((60, 900))
+    assert ring.is_paused(0)
+    assert ring.rates(0) == [0.0, 0.0]
+
+    # 20 words per minute for 15 minutes
+    for second in range(0, 900, 3):
+        ring.add(second, 1)
+    assert [round(rate) for rate in ring.rates(899.5)] == [20, 20]
+    assert not ring.is_burst(899.5)
+    assert ring.is_paused(905)
+
+    # Then 60 words per minute for a minute
+    for second in range(900, 960):
+        ring.add(second, 1)
+    assert [round(rate) for rate in ring.rates(959.5)] == [60, 23]
+    assert ring.is_burst(959.5)
+
+    # A change within a word isn't a pause
+    ring.add(962, 0)
+    assert not ring.is_paused(963)
@@ -0,0 +1,85 @@
+import random
+
+from textual._cells import cell_len
+
+from words_tui.tui import wrap
+from words_tui.tui.wrap import WrapLayout, wrap_offsets
+
+
+def test_lines_wrap_between_words():
+    assert wrap_offsets("hello world foo", 6) == (0, 6, 12)
+    assert wrap_offsets("short", 10) == (0,)
+    assert wrap_offsets("", 10) == (0,)
+    # Words wider than a row are broken anywhere
+    assert wrap_offsets("abcdefghij", 4) == (0, 4, 8)
+    assert wrap_offsets("a bcdefg", 5) == (0, 2, 7)
+    # Wide characters take up two cells
+    assert wrap_offsets("中文 中文", 4) == (0, 3)
+
+
+def test_rows_fit_the_width():
+    rng = random.Random(2)
+    for _ in range(2000):
+        line = "".join(rng.choice("ab  中x") for _ in range(rng.randint(0, 40)))
+        width = rng.randint(1, 12)
+        offsets = wrap_offsets(line, width)
+        assert offsets[0] == 0
+        assert list(offsets) == sorted(set(offsets))
+        for start, end in zip(offsets, [*offsets[1:], len(line)]):
+            # Only spaces hang over the edge, and they never start a row
+            text = line[start:end].rstrip(" ")
+            assert cell_len(text) <= width or len(text) == 1
+            assert start == 0 or line[start] != " "
+
+
+def test_layout_matches_recomputing(monkeypatch):
+    monkeypatch.setattr(wrap, "BLOCK_LINES", 4)
+    rng = random.Random(1)
+
+    def random_line() -> str:
+        return " ".join("x" * rng.randint(1, 9) for _ in range(rng.randint(0, 8)))
+
+    for _ in range(100):
+        lines = [random_line() for _ in range(rng.randint(1, 30))]
+        layout = WrapLayout(len(lines), 10)
+        for _ in range(30):
+            choice = rng.random()
+            if choice < 0.5:
+                start = rng.randrange(len(lines))
+                stop = rng.randint(start + 1, min(len(lines), start + 5))
+                new_lines = [random_line() for _ in range(rng.randint(int(stop - start == len(lines)), 12))]
+                lines[start:stop] = new_lines
+                layout.replace(start, stop, len(new_lines))
+            elif choice < 0.8:
+                start = rng.randrange(len(lines))
+                layout.wrap_lines(start, lines[start : start + rng.randint(1, 10)])
+            else:
+                row = rng.randrange(len(lines))
+                layout.wrap(row, lines[row])
+
+            counts = [count for block in layout._counts for count in block]
+            assert layout.line_count == len(counts) == len(lines)
+            assert all(count in (0, len(wrap_offsets(line, 10))) for count, line in zip(counts, lines))
+            assert layout.pending == counts.count(0)
+            assert layout.first_pending() == (counts.index(0) if 0 in counts else None)
+
+            rows = [count or 1 for count in counts]
+            assert layout.visual_row_count == sum(rows)
+            visual_row = 0
+            for row, row_count in enumerate(rows):
+                assert layout.visual_row(row) == visual_row
+                for sub_row in range(row_count):
+                    assert layout.locate(visual_row + sub_row) == (row, sub_row)
+                visual_row += row_count
+            assert layout.locate(visual_row + 5) == (len(rows) - 1, rows[-1] - 1)
+
+
+def test_resetting_leaves_lines_unwrapped():
+    layout = WrapLayout(3, 5)
+    layout.wrap_lines(0, ["one two three", "four", "five six seven"])
+    assert (layout.visual_row_count, layout.pending) == (7, 0)
+
+    layout.reset(3, 10)
+    assert (layout.visual_row_count, layout.pending) == (3, 3)
+    assert layout.wrap(2, "five six seven") == (0, 9)
+    assert (layout.visual_row_count, layout.pending) == (4, 2)